@@ -0,0 +1,184 @@
+# The academic calendar: terms, breaks and holidays, compiled into sorted date arrays.
+#
+# Terms are kept sorted by their first day, so the term of any date is one
+# np.searchsorted over the start dates (O(log n) per date, a whole column per
+# call). Breaks and holidays are expanded into a sorted array of days without
+# classes; the EXDATEs of every meeting in a table come from one mask of
+# meetings against the closed days inside the table's date range
+# (see recurrence.excluded_dates).
+#
+# The built-in table below can be replaced by a CSV with kind,name,start,end
+# columns (kind is term, break or holiday; end is inclusive), named in
+# CALENDAR_ACADEMIC_CALENDAR or passed to load_calendar().
+#
+#   python academic_calendar.py [calendar.csv]
+import csv
+import logging
+import os
+import sys
+from datetime import date
+
+import numpy as np
+
+from recurrence import excluded_dates
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('term', 'break', 'holiday')
+
+# Keep in step with the registrar's published calendar. A term runs from its
+# first day of classes to its last day of exams.
+CARLETON_CALENDAR = [
+    ('term', '2024 Fall Term', '2024-09-16', '2024-11-26'),
+    ('break', 'Fall Midterm Break', '2024-10-18', '2024-10-21'),
+    ('term', '2025 Winter Term', '2025-01-06', '2025-03-17'),
+    ('holiday', 'Martin Luther King Jr. Day', '2025-01-20', '2025-01-20'),
+    ('break', 'Winter Midterm Break', '2025-02-07', '2025-02-10'),
+    ('term', '2025 Spring Term', '2025-03-31', '2025-06-09'),
+    ('break', 'Spring Midterm Break', '2025-05-02', '2025-05-05'),
+    ('term', '2025 Fall Term', '2025-09-15', '2025-11-25'),
+    ('break', 'Fall Midterm Break', '2025-10-17', '2025-10-20'),
+    ('term', '2026 Winter Term', '2026-01-05', '2026-03-16'),
+    ('holiday', 'Martin Luther King Jr. Day', '2026-01-19', '2026-01-19'),
+    ('break', 'Winter Midterm Break', '2026-02-06', '2026-02-09'),
+    ('term', '2026 Spring Term', '2026-03-30', '2026-06-08'),
+    ('break', 'Spring Midterm Break', '2026-05-01', '2026-05-04'),
+    ('term', '2026 Fall Term', '2026-09-14', '2026-11-24'),
+    ('break', 'Fall Midterm Break', '2026-10-16', '2026-10-19'),
+    ('term', '2027 Winter Term', '2027-01-04', '2027-03-15'),
+    ('holiday', 'Martin Luther King Jr. Day', '2027-01-18', '2027-01-18'),
+    ('break', 'Winter Midterm Break', '2027-02-05', '2027-02-08'),
+    ('term', '2027 Spring Term', '2027-03-29', '2027-06-07'),
+    ('break', 'Spring Midterm Break', '2027-04-30', '2027-05-03'),
+]
+
+
+class AcademicCalendar:
+    # Terms as parallel arrays sorted by start date, and the sorted days without
+    # classes with the break or holiday each belongs to
+
+    __slots__ = ('term_name', 'term_start', 'term_end', 'closed_day', 'closed_name', '_term_position')
+
+    def __init__(self, rows):
+        terms = []
+        closed = []
+        for kind, name, start, end in rows:
+            if kind not in KINDS:
+                raise ValueError(f"Unknown academic calendar entry kind: '{kind}'")
+            start = np.datetime64(start, 'D')
+            end = np.datetime64(end, 'D')
+            if end < start:
+                raise ValueError(f"'{name}' ends before it starts")
+            if kind == 'term':
+                terms.append((start, end, name))
+            else:
+                closed.append((start, end, name))
+
+        terms.sort(key=lambda term: term[0])
+        self.term_start = np.array([start for start, _, _ in terms], dtype='datetime64[D]')
+        self.term_end = np.array([end for _, end, _ in terms], dtype='datetime64[D]')
+        self.term_name = np.array([name for _, _, name in terms], dtype=object)
+        if (self.term_start[1:] <= self.term_end[:-1]).any():
+            raise ValueError("Academic calendar terms overlap")
+        self._term_position = {name: position for position, name in enumerate(self.term_name)}
+
+        # Every closed day once, for the first break or holiday that covers it
+        days = [np.arange(start, end + 1) for start, end, _ in closed]
+        names = [np.full(len(span), name, dtype=object) for span, (_, _, name) in zip(days, closed)]
+        all_days = np.concatenate(days) if days else np.empty(0, dtype='datetime64[D]')
+        self.closed_day, first = np.unique(all_days, return_index=True)
+        self.closed_name = np.concatenate(names)[first] if names else np.empty(0, dtype=object)
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return cls((row['kind'].strip().lower(), row['name'].strip(), row['start'].strip(), row['end'].strip())
+                       for row in csv.DictReader(f))
+
+    def term_positions(self, dates):
+        # Position of the term containing each date, -1 where none does
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        positions = np.searchsorted(self.term_start, dates, side='right') - 1
+        inside = positions >= 0
+        inside[inside] = dates[inside] <= self.term_end[positions[inside]]
+        inside &= ~np.isnat(dates)
+        return np.where(inside, positions, -1)
+
+    def term_of(self, dates):
+        # Name of the term containing each date, None outside every term
+        positions = self.term_positions(dates)
+        names = np.append(self.term_name, None)
+        return names[positions]
+
+    def term_dates(self, name):
+        # (first, last day) of a term by name, or None
+        position = self._term_position.get(name)
+        if position is None:
+            return None
+        return self.term_start[position], self.term_end[position]
+
+    def current_term(self, today=None):
+        # The term in progress, else the next one; None once the table's last
+        # term is over (the calendar needs updating) or without terms
+        today = np.datetime64(today or date.today(), 'D')
+        position = np.searchsorted(self.term_end, today, side='left')
+        if position == len(self.term_name):
+            return None
+        return self.term_name[position]
+
+    def out_of_date(self, today=None):
+        # True once today is past the last term: new terms, breaks and holidays
+        # are missing, so current_term() finds nothing and nothing is skipped
+        today = np.datetime64(today or date.today(), 'D')
+        return not len(self.term_end) or today > self.term_end[-1]
+
+    def stale_message(self):
+        if not len(self.term_name):
+            return "The academic calendar has no terms."
+        return (f"The academic calendar ends with the {self.term_name[-1]}, so later breaks and "
+                f"holidays are not skipped and missing dates are not filled in.")
+
+    def closed_between(self, start, end):
+        # The closed days from start to end, inclusive
+        lo = np.searchsorted(self.closed_day, np.datetime64(start, 'D'), side='left')
+        hi = np.searchsorted(self.closed_day, np.datetime64(end, 'D'), side='right')
+        return self.closed_day[lo:hi]
+
+    def exdates(self, meetings):
+        # Per meeting, the closed days it would otherwise meet on (see MeetingTable.exdates)
+        if meetings.empty:
+            return np.empty(0, dtype=object)
+        dated = ~np.isnat(meetings.start_date) & ~np.isnat(meetings.end_date)
+        if not dated.any():
+            return excluded_dates(meetings, self.closed_day[:0])
+        closed = self.closed_between(meetings.start_date[dated].min(), meetings.end_date[dated].max())
+        return excluded_dates(meetings, closed)
+
+
+def load_calendar(path=None):
+    # The calendar in a CSV, or the built-in one
+    path = path or os.environ.get('CALENDAR_ACADEMIC_CALENDAR')
+    if path:
+        return AcademicCalendar.from_csv(path)
+    return AcademicCalendar(CARLETON_CALENDAR)
+
+
+default_calendar = load_calendar()
+if default_calendar.out_of_date():
+    logger.warning("%s Add the next academic year to CARLETON_CALENDAR or CALENDAR_ACADEMIC_CALENDAR.",
+                   default_calendar.stale_message())
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    calendar = load_calendar(argv[0] if argv else None)
+    for name, start, end in zip(calendar.term_name, calendar.term_start, calendar.term_end):
+        closed = calendar.closed_between(start, end)
+        print(f"{name:<20} {start} .. {end}  {len(closed)} days without classes")
+        for day in closed:
+            print(f"    {day}  {calendar.closed_name[np.searchsorted(calendar.closed_day, day)]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# HTTP conversion service for other tools (advising portal, chat bots).
+#
+#   python api.py --port 8502 --workers 4 --queue-size 16
+#
+#   curl -F file=@schedule.xlsx http://127.0.0.1:8502/convert -o schedule.ics
+#   curl --data-binary @schedule.xlsx http://127.0.0.1:8502/convert -o schedule.ics
+#
+# Conversions run on a bounded worker pool so the event loop never blocks. When
+# every worker is busy and the queue is full, requests get 429 Too Many Requests.
+#
+# With --store DIR every converted schedule is also kept in a course store and
+# served as a subscription feed at /feeds/<key>.ics (the Link header of the
+# /convert response), which calendar apps can subscribe to as webcal://.
+import argparse
+import io
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import tornado.ioloop
+import tornado.web
+
+from feeds import FeedCache, feed_path
+from layout_cache import layouts
+from result_cache import ResultCache, MessageLog, upload_key
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+def accepts_gzip(header):
+    # Whether an Accept-Encoding header allows gzip: listed (or covered by *)
+    # with a q-value above 0, so "gzip;q=0" turns it off
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+
+def convert_bytes(data, backend='icalendar', store_root=None):
+    # Runs on a worker; returns (ics bytes or None, [(level, message), ...]).
+    # With a store the parsed table is kept there for the feed.
+    from converter import process_excel, create_ics_file
+    log = MessageLog()
+    ics_bytes = None
+    if store_root is not None:
+        from course_store import CourseStore
+        _, courses = CourseStore(store_root).load_or_parse(data, ui=log)
+    else:
+        courses = process_excel(io.BytesIO(data), ui=log)
+    if courses is not None and not courses.empty:
+        ics_bytes = create_ics_file(courses, ui=log, backend=backend)
+    return ics_bytes, log.messages
+
+
+class ConversionQueue:
+    # Bounded executor: at most `workers` running plus `queue_size` waiting
+
+    def __init__(self, workers=4, queue_size=16, processes=False, backend='icalendar', store_root=None):
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = pool(max_workers=workers)
+        self.capacity = workers + queue_size
+        self.workers = workers
+        self.backend = backend
+        self.store_root = store_root
+        self.pending = 0
+        self.rejected = 0
+
+    def is_full(self):
+        return self.pending >= self.capacity
+
+    async def submit(self, data):
+        # Only called from the event loop thread, so the counter needs no lock
+        self.pending += 1
+        try:
+            loop = tornado.ioloop.IOLoop.current()
+            return await loop.run_in_executor(self.executor, convert_bytes, data, self.backend, self.store_root)
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'rejected': self.rejected,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class APIHandler(tornado.web.RequestHandler):
+
+    def initialize(self, queue, cache, feeds):
+        self.queue = queue
+        self.cache = cache
+        self.feeds = feeds
+
+    def send_json_error(self, status, message, **extra):
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps({'error': message, **extra}))
+
+
+class ConvertHandler(APIHandler):
+
+    def upload_bytes(self):
+        # multipart/form-data with a "file" field, or the workbook as the raw body
+        files = self.request.files.get('file')
+        if files:
+            return files[0]['body']
+        return self.request.body
+
+    async def post(self):
+        data = self.upload_bytes()
+        if not data:
+            return self.send_json_error(400, "No .xlsx upload found; send it as the 'file' form field or the request body.")
+
+        key = upload_key(data)
+        result = self.cache.get(key)
+        if result is None:
+            if self.queue.is_full():
+                self.queue.rejected += 1
+                self.set_header('Retry-After', '1')
+                return self.send_json_error(429, "Too many conversions in progress, try again shortly.")
+            result = await self.queue.submit(data)
+            self.cache.put(key, result)
+
+        ics_bytes, messages = result
+        if ics_bytes is None:
+            return self.send_json_error(
+                422, "Could not extract course data from the file.",
+                messages=[body for level, body in messages if level in ('error', 'warning', 'info')],
+            )
+        self.set_header('Content-Type', 'text/calendar; charset=utf-8')
+        self.set_header('Content-Disposition', 'attachment; filename="myCarletonSchedule.ics"')
+        if self.feeds is not None:
+            self.set_header('Link', f'<{feed_path(key)}>; rel="alternate"; type="text/calendar"')
+        self.finish(ics_bytes)
+
+
+class FeedHandler(APIHandler):
+    # A stored schedule as a subscription feed. Every representation is
+    # rendered ahead of the poll, and a poll with a matching If-None-Match gets 304.
+
+    async def get(self, key):
+        feed, stamp = self.feeds.lookup(key)
+        if stamp is None:
+            return self.send_json_error(404, "No schedule is stored under this feed.")
+        if feed is None:
+            # New or changed table: render off the event loop, once
+            loop = tornado.ioloop.IOLoop.current()
+            feed = await loop.run_in_executor(None, self.feeds.render, key)
+            if feed is None:
+                return self.send_json_error(404, "This schedule has no calendar to serve.")
+
+        gzip_ok = accepts_gzip(self.request.headers.get('Accept-Encoding', ''))
+        body, etag, encoding = feed.representation(gzip_ok)
+        self.set_header('Content-Type', 'text/calendar; charset=utf-8')
+        self.set_header('Vary', 'Accept-Encoding')
+        # Clients may keep the feed but must check back before using it
+        self.set_header('Cache-Control', 'no-cache')
+        self.set_header('Etag', etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            return self.finish()
+        if encoding is not None:
+            self.set_header('Content-Encoding', encoding)
+        self.finish(body)
+
+
+class HealthHandler(APIHandler):
+
+    def get(self):
+        health = {'queue': self.queue.stats(), 'cache': self.cache.stats(), 'layouts': layouts.stats()}
+        if self.feeds is not None:
+            health['feeds'] = self.feeds.stats()
+        self.finish(health)
+
+
+def make_app(queue, cache=None, feeds=None):
+    # feeds: a FeedCache over the store the queue writes to, to serve /feeds
+    if cache is None:
+        cache = ResultCache(max_entries=256, ttl=60 * 60)
+    handler_args = {'queue': queue, 'cache': cache, 'feeds': feeds}
+    routes = [
+        (r'/convert', ConvertHandler, handler_args),
+        (r'/healthz', HealthHandler, handler_args),
+    ]
+    if feeds is not None:
+        routes.append((r'/feeds/([0-9a-f]{64})\.ics', FeedHandler, handler_args))
+    return tornado.web.Application(routes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Excel to ICS conversions over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--workers', type=int, default=4, help="Conversions running at once (default: 4)")
+    parser.add_argument('--queue-size', type=int, default=16, help="Conversions allowed to wait before returning 429 (default: 16)")
+    parser.add_argument('--processes', action='store_true', help="Use worker processes instead of threads")
+    parser.add_argument('--backend', choices=['icalendar', 'stream'], default='icalendar')
+    parser.add_argument('--store', help="Keep converted schedules in this course store and serve them at /feeds")
+    parser.add_argument('--feed-cache-size', type=int, default=1024,
+                        help="Rendered feeds kept in memory; 0 renders on every poll (default: 1024)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    feeds = None
+    if args.store:
+        from course_store import CourseStore
+        feeds = FeedCache(CourseStore(args.store), max_entries=args.feed_cache_size)
+    queue = ConversionQueue(args.workers, args.queue_size, args.processes, args.backend, args.store)
+    app = make_app(queue, feeds=feeds)
+    app.listen(args.port, args.host, max_body_size=MAX_UPLOAD_BYTES)
+    logger.info("Listening on http://%s:%s/convert", args.host, args.port)
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    finally:
+        queue.shutdown()
+
+
+if __name__ == '__main__':
+    main()
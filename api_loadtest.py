@@ -0,0 +1,129 @@
+# Local load test for api.py: latency percentiles at increasing concurrency.
+#
+#   python api_loadtest.py                      # starts api.py on a free port
+#   python api_loadtest.py --url http://127.0.0.1:8502/convert --levels 1 8 32
+#
+# Every request uploads a different synthetic workbook, so the server's
+# result cache never short-circuits a conversion.
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+from workday_fixtures import workbook_bytes
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def run_level(url, uploads, concurrency):
+    client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(body):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.fetch(url, method='POST', body=body, request_timeout=120)
+                code = response.code
+            except HTTPClientError as e:
+                code = e.code
+            elapsed = time.perf_counter() - started
+            statuses[code] = statuses.get(code, 0) + 1
+            if code == 200:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in uploads))
+    wall = time.perf_counter() - started
+    client.close()
+    return {
+        'concurrency': concurrency,
+        'requests': len(uploads),
+        'statuses': statuses,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'throughput': statuses.get(200, 0) / wall if wall else None,
+    }
+
+
+async def wait_until_up(url, timeout=30):
+    client = AsyncHTTPClient()
+    health = url.rsplit('/', 1)[0] + '/healthz'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.fetch(health, request_timeout=1)
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+def fmt_ms(seconds):
+    return f"{seconds * 1000:8.1f}" if seconds is not None else '       -'
+
+
+async def main_async(args):
+    url = args.url
+    server = None
+    if url is None:
+        port = free_port()
+        url = f'http://127.0.0.1:{port}/convert'
+        api_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api.py')
+        server = subprocess.Popen([
+            sys.executable, api_script, '--port', str(port), '--workers', str(args.workers),
+            '--queue-size', str(args.queue_size),
+        ] + (['--processes'] if args.processes else []), stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_up(url)
+        print(f"{'conc':>5} {'reqs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}  statuses")
+        seed = 0
+        for level in args.levels:
+            requests = max(args.requests, level * 2)
+            uploads = []
+            for _ in range(requests):
+                seed += 1
+                uploads.append(workbook_bytes(sections=args.sections, seed=seed))
+            result = await run_level(url, uploads, level)
+            print(f"{level:>5} {requests:>5} {fmt_ms(result['p50'])} {fmt_ms(result['p95'])} "
+                  f"{fmt_ms(result['p99'])} {result['throughput']:7.1f}  {result['statuses']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the conversion API.")
+    parser.add_argument('--url', help="Existing /convert endpoint; by default api.py is started locally")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--requests', type=int, default=40, help="Requests per level (at least 2x the concurrency)")
+    parser.add_argument('--sections', type=int, default=12, help="Sections per generated workbook")
+    parser.add_argument('--workers', type=int, default=4, help="Workers for the locally started server")
+    parser.add_argument('--queue-size', type=int, default=16, help="Queue size for the locally started server")
+    parser.add_argument('--processes', action='store_true', help="Start the local server with worker processes")
+    asyncio.run(main_async(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,13 @@
+import io
+import logging
+import os
 import streamlit as st
 from streamlit_option_menu import option_menu
-import pandas as pd
-from icalendar import Calendar, Event, vRecur
-from datetime import datetime, timedelta
+from result_cache import ResultCache, MessageLog, upload_key
+from instrumentation import collect_spans, serve_metrics
+from job_queue import JobQueue, QueueFull
+
+logger = logging.getLogger(__name__)
 
 # Title for browser tab
 st.set_page_config(
@@ -12,278 +17,125 @@ st.set_page_config(
     initial_sidebar_state="auto" 
 )
 
-def process_excel(file):
+@st.cache_resource
+def get_result_cache():
+    # One cache per server process, shared by all sessions
+    return ResultCache(max_entries=256, ttl=60 * 60)
+
+@st.cache_resource
+def start_metrics_exporter():
+    # Set CALENDAR_METRICS_PORT to expose per-stage timings at http://127.0.0.1:<port>/metrics
+    port = os.environ.get('CALENDAR_METRICS_PORT')
+    return serve_metrics(int(port)) if port else None
+
+# Widest image Streamlit displays; anything larger gets resized on every rerun
+MAX_IMAGE_WIDTH = 1460
+
+@st.cache_resource(show_spinner=False)
+def load_image(path):
+    # Read each tutorial image once per process. Oversized JPEGs are shrunk here,
+    # once, so st.image can send the bytes as they are on every rerun.
+    from PIL import Image
+    with open(path, 'rb') as f:
+        data = f.read()
+    image = Image.open(io.BytesIO(data))
+    if image.format == 'JPEG' and image.width > MAX_IMAGE_WIDTH:
+        height = int(image.height * MAX_IMAGE_WIDTH / image.width)
+        buffer = io.BytesIO()
+        image.resize((MAX_IMAGE_WIDTH, height), resample=Image.BILINEAR).save(buffer, format='JPEG', quality=90)
+        data = buffer.getvalue()
+    return data
+
+@st.cache_resource
+def get_pdf_executor():
+    # Worker processes for parsing PDF pages, shared by all sessions
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=2)
+
+@st.cache_resource
+def get_job_queue():
+    # Conversions from every session share a few workers and wait their turn;
+    # size it with CALENDAR_WORKERS and CALENDAR_QUEUE_SIZE
+    return JobQueue(workers=int(os.environ.get('CALENDAR_WORKERS', 2)),
+                    queue_size=int(os.environ.get('CALENDAR_QUEUE_SIZE', 8)))
+
+def run_conversion(job, file_name, upload, cache):
+    # Runs on a conversion worker, so it reports through the job instead of st.*
+    # pandas, openpyxl and icalendar are only imported once someone uploads a file
+    from converter import process_excel
+    from exports import export_schedule, bundle_bytes
+    from schedule_analysis import schedule_conflicts
+    from academic_calendar import default_calendar
+
+    parse_log = MessageLog()
+    if default_calendar.out_of_date():
+        # Shown with every result until someone adds the next academic year
+        parse_log.warning(f"{default_calendar.stale_message()} Please let gautamaj@carleton.edu know.")
+    ics_log = MessageLog()
+    ics_bytes = None
+    conflicts = None
+    exports = {}
+    bundle = None
+    data = None
+    log = parse_log
+    with collect_spans() as spans:
+        try:
+            job.report("Reading your schedule...", 0.1)
+            if file_name.lower().endswith('.pdf'):
+                from pdf_ingest import process_pdf
+                data = process_pdf(upload, ui=parse_log, workers=2, executor=get_pdf_executor())
+            else:
+                data = process_excel(io.BytesIO(upload), ui=parse_log)
+            if data is not None and not data.empty:
+                log = ics_log
+                job.report("Building your calendar...", 0.6)
+                # The meeting patterns are parsed once for every download format
+                meetings, exports = export_schedule(data, ui=ics_log)
+                ics_bytes = exports.get('ics')
+                bundle = bundle_bytes(exports) if exports else None
+                job.report("Checking for time conflicts...", 0.9)
+                conflicts = schedule_conflicts(meetings)
+        except Exception as e:
+            # A bug shouldn't reach the student as a traceback, nor be retried on every
+            # rerun: report it like a bad file and cache the failed result
+            logger.exception("Conversion of %s failed", file_name)
+            log.error(f"Something went wrong while converting your schedule: {e}")
+            log.info("Please try again later, or send your file to gautamaj@carleton.edu so we can fix it.")
+            ics_bytes, conflicts, exports, bundle = None, None, {}, None
+
+    result = (data, ics_bytes, parse_log, ics_log, spans, conflicts, exports, bundle)
+    # Cached here so the result is kept even if the student closed the tab while waiting
+    cache.put(job.key, result)
+    return result
+
+def convert_upload(uploaded_file):
+    # Reruns and repeated uploads of the same export only cost a hash lookup
+    cache = get_result_cache()
+    upload = uploaded_file.getvalue()
+    key = upload_key(upload)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    queue = get_job_queue()
     try:
-        # Read the Excel file with header=None to get raw data
-        df = pd.read_excel(file, header=None)
-        
-        # Display debug info
-        # with st.expander("Excel file content (for debugging)"):
-        #     st.dataframe(df)
-        #     st.write(f"Excel file has {df.shape[0]} rows and {df.shape[1]} columns")
-        
-        # Check if the Excel file might have multiple sheets merged into one with just the name
-        if df.shape[0] <= 2 and df.shape[1] <= 2:
-            st.error("The Excel file appears to only contain the name 'View My Courses' without actual course data.")
-            st.info("Please make sure you're exporting the full data from Workday → Academics and Registration → Registration Planning → View My Courses")
-            return None
-            
-        # Find the index of "My Enrolled Courses" - be more flexible
-        enrolled_index = None
-        for idx, row in df.iterrows():
-            for col in range(min(5, df.shape[1])):  # Check first few columns
-                if pd.notna(row[col]) and isinstance(row[col], str) and "Enrolled Courses" in row[col]:
-                    enrolled_index = idx
-                    # st.success(f"Found 'My Enrolled Courses' at row {idx+1}")
-                    break
-            if enrolled_index is not None:
-                break
-                
-        if enrolled_index is None:
-            st.error("Could not find 'My Enrolled Courses' in the file.")
-            st.info("Please ensure you're using the correct Excel file from 'View My Courses' in Workday.")
-            return None
-            
-        # Find the index of "My Waitlisted/Dropped/Withdrawn Courses" - check multiple columns
-        end_index = None
-        search_terms = ["Waitlisted", "Completed", "Dropped", "Withdrawn"]
-        
-        for idx, row in df.iloc[enrolled_index+1:].iterrows():
-            for col in range(min(5, df.shape[1])):  # Check first few columns
-                if pd.notna(row[col]) and isinstance(row[col], str):
-                    cell_text = row[col]
-                    if any(term in cell_text for term in search_terms):
-                        end_index = idx
-                        # st.success(f"Found end section at row {idx+1}: '{cell_text}'")
-                        break
-            if end_index is not None:
-                break
-                
-        if end_index is None:
-            # Use the rest of the file if we can't find an end marker
-            end_index = df.shape[0]
-            st.warning("Could not find end of enrolled courses section. Using the rest of the file.")
-            
-        # Find the header row, usually 1-3 rows after the "My Enrolled Courses" row
-        header_index = None
-        header_candidates = []
-        
-        # Look in the next few rows after enrolled_index for column headers
-        for i in range(1, 4):
-            if enrolled_index + i < end_index:
-                header_row = df.iloc[enrolled_index + i]
-                # Check if this row has multiple non-null values and looks like a header
-                if header_row.notna().sum() >= 3:
-                    header_candidates.append((enrolled_index + i, header_row))
-        
-        if header_candidates:
-            # Use the first candidate as our header row
-            header_index = header_candidates[0][0]
-            header_row = header_candidates[0][1]
-            # st.success(f"Found header row at row {header_index+1}")
-            
-            # Show the detected headers
-            # with st.expander("Detected Header Row"):
-            #     st.write(header_row.to_dict())
-        else:
-            st.warning("Could not identify header row. Using row after 'My Enrolled Courses'.")
-            header_index = enrolled_index + 1
-        
-        # Extract data rows between header and end index
-        data_start = header_index + 1
-        data_end = end_index
-        
-        if data_start >= data_end:
-            st.error("No data rows found between header and end section.")
-            return None
-        
-        # Get columns for required fields
-        # First, identify which columns contain the key data
-        section_col = None
-        meeting_pattern_col = None
-        start_date_col = None
-        end_date_col = None
-        
-        header_row = df.iloc[header_index]
-        for col, value in enumerate(header_row):
-            if pd.notna(value):
-                value_str = str(value).lower()
-                if 'section' in value_str or 'course' in value_str:
-                    section_col = col
-                elif 'meeting' in value_str and 'pattern' in value_str:
-                    meeting_pattern_col = col
-                elif 'start' in value_str and 'date' in value_str:
-                    start_date_col = col
-                elif 'end' in value_str and 'date' in value_str:
-                    end_date_col = col
-        
-        # If we couldn't find the columns by name, use the fixed positions from original code
-        if section_col is None:
-            section_col = min(5, df.shape[1]-1)
-            st.warning(f"Could not find Section column. Using column {section_col+1}.")
-        if meeting_pattern_col is None:
-            meeting_pattern_col = min(9, df.shape[1]-1)
-            st.warning(f"Could not find Meeting Pattern column. Using column {meeting_pattern_col+1}.")
-        if start_date_col is None:
-            start_date_col = min(11, df.shape[1]-1)
-            st.warning(f"Could not find Start Date column. Using column {start_date_col+1}.")
-        if end_date_col is None:
-            end_date_col = min(12, df.shape[1]-1)
-            st.warning(f"Could not find End Date column. Using column {end_date_col+1}.")
-        
-        # Extract only the needed columns
-        relevant_df = df.iloc[data_start:data_end, [section_col, meeting_pattern_col, start_date_col, end_date_col]].copy()
-        
-        # Set column headers
-        relevant_df.columns = ['Section', 'Meeting Patterns', 'Start Date', 'End Date']
-        
-        # Filter out rows without section data
-        relevant_df = relevant_df[relevant_df['Section'].notna()]
-        
-        # Convert date columns to datetime
-        relevant_df['Start Date'] = pd.to_datetime(relevant_df['Start Date'], errors='coerce')
-        relevant_df['End Date'] = pd.to_datetime(relevant_df['End Date'], errors='coerce')
-        
-        # If dates are missing, use default term dates
-        if relevant_df['Start Date'].isna().any() or relevant_df['End Date'].isna().any():
-            st.warning("Some date fields are missing. Using default term dates.")
-            # Set default term dates (adjust as needed)
-            term_start = pd.Timestamp('2025-03-31')  # Spring term start
-            term_end = pd.Timestamp('2025-06-09')    # Spring term end
-            
-            # Fill missing dates
-            relevant_df['Start Date'] = relevant_df['Start Date'].fillna(term_start)
-            relevant_df['End Date'] = relevant_df['End Date'].fillna(term_end)
-        
-        # Drop rows with NaN in both dates
-        relevant_df = relevant_df.dropna(subset=['Start Date', 'End Date'], how='all')
-        
-        # Show final data
-        # st.success(f"Successfully extracted {len(relevant_df)} courses.")
-        return relevant_df
-        
-    except Exception as e:
-        st.error(f"Error processing Excel file: {str(e)}")
-        st.info("Make sure you're uploading the Excel file from 'View My Courses' in Workday.")
+        job = queue.submit(key, run_conversion, uploaded_file.name, upload, cache)
+    except QueueFull:
         return None
 
-def create_ics_file(events, filename='schedule.ics'):
-    cal = Calendar()
-
-    def parse_time(t):
-        return datetime.strptime(t.strip(), '%I:%M %p').time()
-
-    def add_recurring_event(event, first_start_datetime, first_end_datetime, location, recurrence_days, end_date):
-        ics_event = Event()
-        ics_event.add('summary', event['Section'])
-        ics_event.add('location', location)
-        ics_event.add('dtstart', first_start_datetime)
-        ics_event.add('dtend', first_end_datetime)
-        
-        # Set recurrence rule
-        recur_rule = vRecur()
-        recur_rule['FREQ'] = 'WEEKLY'
-        recur_rule['UNTIL'] = end_date.date()
-        recur_rule['BYDAY'] = recurrence_days
-        ics_event.add('rrule', recur_rule)
-        
-        cal.add_component(ics_event)
-
-    def clean_location(location_str):
-        return location_str.strip().replace('\n', ', ')
-        
-    # Define day mappings for recurrence rules
-    day_to_rrule = {
-        'Monday': 'MO',
-        'Tuesday': 'TU',
-        'Wednesday': 'WE', 
-        'Thursday': 'TH',
-        'Friday': 'FR'
-    }
-
-    for _, row in events.iterrows():
-        processed_patterns = set()
-
-        # Check if 'Meeting Patterns' is valid (not NaN and is a string)
-        if pd.notna(row['Meeting Patterns']) and isinstance(row['Meeting Patterns'], str):
-            for pattern in row['Meeting Patterns'].split('\n'):
-                # Skip empty patterns
-                if not pattern.strip():
-                    continue
-                    
-                parts = pattern.split(' | ')
-                if len(parts) < 3:
-                    # Try to handle different format
-                    st.warning(f"Unusual meeting pattern format: '{pattern}' - attempting to parse")
-                    continue
-
-                day_code, time_range, location = parts
-                # Check if time range has the expected format
-                if ' - ' not in time_range:
-                    st.warning(f"Invalid time range format: '{time_range}'")
-                    continue
-                    
-                start_time, end_time = time_range.split(' - ')
-                
-                # Skip if we've already processed this pattern
-                pattern_key = (day_code, time_range)
-                if pattern_key in processed_patterns:
-                    continue
-                processed_patterns.add(pattern_key)
-
-                days_mapping = {
-                    'M': ['Monday'],
-                    'T': ['Tuesday'],
-                    'W': ['Wednesday'],
-                    'TH': ['Thursday'],
-                    'F': ['Friday'],
-                    'MW': ['Monday', 'Wednesday'],
-                    'TTH': ['Tuesday', 'Thursday'],
-                    'MWF': ['Monday', 'Wednesday', 'Friday'],
-                }
-
-                days = days_mapping.get(day_code.strip().upper(), [])
-                if not days:
-                    continue
-                
-                # Convert days to RRULE format (MO,WE,FR)
-                recurrence_days = [day_to_rrule[day] for day in days]
-                
-                # Find the first occurrence of each day to start the recurring event
-                start_date = row['Start Date']
-                end_date = row['End Date']
-                current_date = start_date
-
-                # Find the first date that matches one of our days
-                first_date = None
-                while current_date <= end_date and first_date is None:
-                    if current_date.strftime('%A') in days:
-                        first_date = current_date
-                    current_date += timedelta(days=1)
-                
-                if first_date:
-                    try:
-                        start_datetime = datetime.combine(first_date, parse_time(start_time))
-                        end_datetime = datetime.combine(first_date, parse_time(end_time))
-                        add_recurring_event(
-                            row, 
-                            start_datetime, 
-                            end_datetime, 
-                            clean_location(location),
-                            recurrence_days,
-                            end_date
-                        )
-                    except Exception as e:
-                        st.warning(f"Could not add event for pattern '{pattern}': {e}")
-
-    try:
-        with open(filename, 'wb') as f:
-            f.write(cal.to_ical())
-        st.success("Calendar file created successfully!")
-    except Exception as e:
-        st.error(f"Failed to create ICS file: {e}")
+    status = st.empty()
+    while not job.wait(0.25):
+        position = queue.position(job)
+        if position:
+            status.info(f"Lots of people are converting right now - you're number {position} in line.")
+        else:
+            message, fraction = job.progress
+            status.progress(fraction, text=message)
+    status.empty()
+    return job.result()
 
 def main():
+    start_metrics_exporter()
     
     st.title('Carleton Calendar Converter')
     
@@ -298,26 +150,97 @@ def main():
         st.write("2. Ensure you're uploading the Excel file (.xlsx) directly without modifying it")
         st.write("3. If you still have issues, try taking a screenshot of your Excel file and send it to gautamaj@carleton.edu for help")
 
-    uploaded_file = st.file_uploader("Upload your Carleton course schedule (.xlsx)", type=["xlsx"])
-
-    if uploaded_file:
-        with st.spinner("Processing your schedule..."):
-            data = process_excel(uploaded_file)
+    uploaded_file = st.file_uploader("Upload your Carleton course schedule (.xlsx, or the .pdf printout)", type=["xlsx", "pdf"])
+
+    result = convert_upload(uploaded_file) if uploaded_file else None
+    if uploaded_file and result is None:
+        # Every worker is busy and the queue is full
+        st.error("The converter is busy right now, so your schedule wasn't converted.")
+        st.info("Please try again in a minute - nothing is lost, just press the button below.")
+        st.button("Try again")
+
+    if result is not None:
+        data, ics_bytes, parse_log, ics_log, spans, conflicts, exports, bundle = result
+        parse_log.replay(st)
+
+        # Per-stage breakdown for this upload, shown with ?debug=1 in the URL
+        if st.query_params.get('debug'):
+            with st.expander("Conversion timings (for debugging)"):
+                st.dataframe([
+                    {'stage': f"{s['pipeline']}.{s['stage']}", 'ms': round(s['seconds'] * 1000, 2),
+                     'rows': s['rows'], 'RSS after (KB)': s['rss_kb'], 'RSS growth (KB)': s['rss_growth_kb'],
+                     # Only there when tracemalloc is running; the true peak within the stage
+                     'traced peak (KB)': s.get('peak_traced_kb')}
+                    for s in spans
+                ])
             
         if data is not None and not data.empty:
             # st.success("Successfully processed your schedule!")
             st.write("Your Courses for The Term:")
-            st.write(data)
+            st.write(data.to_frame())
             
-            create_ics_file(data)
+            ics_log.replay(st)
+
+            if conflicts is not None and not conflicts.empty:
+                from schedule_analysis import describe_conflict
+                for conflict in conflicts.itertuples(index=False):
+                    st.warning(describe_conflict(conflict))
             
-            with open('schedule.ics', 'rb') as f:
+            if ics_bytes is not None:
                 st.download_button(
                     label="Download the `.ics` Calendar File",
-                    data=f,
+                    data=ics_bytes,
                     file_name='myCarletonSchedule.ics',
                     mime='text/calendar'
                 )
+
+                with st.expander("Other formats (Outlook, JSON, jCal)"):
+                    from exports import FORMATS, file_name
+                    for name, export in exports.items():
+                        if name == 'ics':
+                            continue
+                        st.download_button(
+                            label=f"Download {FORMATS[name]['label']}",
+                            data=export,
+                            file_name=file_name(name),
+                            mime=FORMATS[name]['mime'],
+                            key=f"export_{name}"
+                        )
+                    st.download_button(
+                        label="Download every format (.zip)",
+                        data=bundle,
+                        file_name='myCarletonSchedule.zip',
+                        mime='application/zip',
+                        key="export_bundle"
+                    )
+
+                # Events keep their UIDs between conversions, so a re-import only
+                # needs what changed since the student's last download. Nothing is
+                # kept here between visits: the update files they imported carry the
+                # SEQUENCE numbers, so each change is numbered one past the last.
+                with st.expander("Already imported an earlier version? Get just the changes"):
+                    previous_files = st.file_uploader(
+                        "Your previous `.ics` file, and any update files you imported since",
+                        type="ics", key="previous_ics", accept_multiple_files=True)
+                    if previous_files:
+                        import calendar_diff
+                        try:
+                            previous = calendar_diff.previous_from_ics(*(f.getvalue() for f in previous_files))
+                        except ValueError as e:
+                            st.error(f"Could not read the previous calendar file: {e}")
+                        else:
+                            diff = calendar_diff.diff_events(previous, calendar_diff.current_events(data, MessageLog()))
+                            counts = calendar_diff.summarize(diff)
+                            if counts['added'] + counts['changed'] + counts['cancelled'] == 0:
+                                st.info("Nothing changed since your previous file.")
+                            else:
+                                st.write(f"{counts['added']} new, {counts['changed']} changed and {counts['cancelled']} cancelled events.")
+                                st.download_button(
+                                    label="Download the update `.ics` file",
+                                    data=calendar_diff.render_update(diff),
+                                    file_name='myCarletonScheduleUpdate.ics',
+                                    mime='text/calendar'
+                                )
         else:
             st.error("Could not extract course data from the file.")
             st.info("The Excel format from Workday may have changed. Please make sure you're downloading from 'View My Courses' and not 'View My Saved Schedules'.")
@@ -335,30 +258,30 @@ def main():
     if selected == "MacBook":
         st.write("## How It Works / Tutorial for MacBook")
         st.write("1. **Download Your Schedule as an Excel `.xlsx` file on Workday**: Go to `Academics and Registration` -> `Registration Planning` -> `View My Courses` (DONT CLICK View My Saved Schedules!)")
-        st.image("img/DownloadExcel/1.gif")
+        st.image(load_image("img/DownloadExcel/1.gif"))
         st.write("2. **Upload Your Schedule**: Choose your Excel `.xlsx` file that contains your course schedule.")
         st.write("3. **Generate the Calendar**: Click `Download the .ics Calendar File`, which processes your file and generates an `.ics` file.")
         st.write("4. **Download and Import**: Download the `.ics` file and import it into your Apple Calendar.")
-        st.image("img/HowItWorks/1.gif")
+        st.image(load_image("img/HowItWorks/1.gif"))
         st.write("5. **Voila**: Click on The Download and Press Ok.")
-        st.image("img/HowItWorks/2.gif")
+        st.image(load_image("img/HowItWorks/2.gif"))
 
     elif selected == "Google Calendar":
         st.write("## How It Works / Tutorial for Google Calendar")
         st.write("1. **Download Your Schedule as an Excel `.xlsx` file on Workday**: Go to `Academics and Registration` -> `Registration Planning` -> `View My Courses` (DONT CLICK View My Saved Schedules!)")
-        st.image("img/DownloadExcel/1.gif")
+        st.image(load_image("img/DownloadExcel/1.gif"))
         st.write("2. **Upload Your Schedule**: Choose your Excel `.xlsx` file that contains your course schedule.")
         st.write("3. **Generate the Calendar**: Click `Download the .ics Calendar File`, which processes your file and generates an `.ics` file.")
         st.write("4. **Download the `.ics` file**.")
-        st.image("img/HowItWorks/1.gif")
+        st.image(load_image("img/HowItWorks/1.gif"))
         st.write('5. **Open Google Calendar**: In the top right, click on the Settings icon, then select "Settings."')
-        st.image("img/HowItWorks/Google/1.jpg")
+        st.image(load_image("img/HowItWorks/Google/1.jpg"))
         st.write('6. **Click on Import & Export**: Within the Settings menu, locate and click on "Import & Export."')
-        st.image("img/HowItWorks/Google/2.jpg")
+        st.image(load_image("img/HowItWorks/Google/2.jpg"))
         st.write('7. **Import the `.ics` file**: Click "Select file from your computer," and choose the `.ics` file you downloaded earlier.')
-        st.image("img/HowItWorks/Google/3.jpg")
+        st.image(load_image("img/HowItWorks/Google/3.jpg"))
         st.write('8. **Choose Your Calendar**: Select which calendar to add the imported events to—by default, events will be imported into your primary calendar. Click "Import" to finalize.')
-        st.image("img/HowItWorks/Google/4.jpg")
+        st.image(load_image("img/HowItWorks/Google/4.jpg"))
         st.write("9. **Voila**: Your course schedule is now successfully imported into your Google Calendar, ready for you to view and manage.")
 
     st.markdown("---")
@@ -0,0 +1,311 @@
+# Concurrent-session load test for the Streamlit app, in process.
+#
+#   python app_loadtest.py --users 1 4 8 16 --rounds 3 --max-p95 5 --max-rss-mb 1500
+#
+# Every simulated student is an AppTest session running app.py: it uploads a
+# generated workbook (so process_excel and the exports run on the app's shared
+# job queue), switches between the tutorial tabs and fetches the .ics the
+# download button serves. All sessions share one process, like the students of
+# one server, and so share its result cache, job queue and media files.
+#
+# AppTest cannot upload files or click custom components, so the file uploader
+# and the tutorial menu are replaced by stand-ins that read the session's state.
+# It also swaps a process-wide runtime on every run and gives every session the
+# same id, so concurrent sessions would trample each other's media files;
+# install_shared_runtime() gives them one runtime for the whole test, as a
+# server has, and an id per session. Both rely on Streamlit 1.37 internals.
+# Streamlit caches the page list process-wide too, so every session runs the
+# same script file (AppTest.from_function would write one per session).
+#
+# Exits 1 when a level breaks one of the --max-* budgets.
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from unittest.mock import MagicMock
+
+from api_loadtest import fmt_ms, percentile
+from workday_fixtures import workbook_bytes
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+UPLOAD_KEY = '_loadtest_upload'
+TAB_KEY = '_loadtest_tab'
+TABS = ['MacBook', 'Google Calendar']
+BUSY_MESSAGE = "The converter is busy right now"
+# Seconds between RSS samples
+SAMPLE_INTERVAL = 0.05
+
+
+def rss_kb():
+    # Current resident set size of this process
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+class RSSSampler:
+    # Peak RSS over a stretch of the test, sampled on a background thread
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_kb = rss_kb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, rss_kb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, rss_kb())
+
+
+def install_stand_ins():
+    # File uploader and tutorial menu that answer from the running session's state
+    import streamlit as st
+    import streamlit_option_menu
+
+    class Upload(io.BytesIO):
+        name = 'schedule.xlsx'
+
+    def file_uploader(label, type=None, key=None, **kwargs):
+        # Only the main upload; the "previous .ics" uploader stays empty
+        data = st.session_state.get(UPLOAD_KEY)
+        if key is not None or data is None:
+            return None
+        return Upload(data)
+
+    st.file_uploader = file_uploader
+    streamlit_option_menu.option_menu = lambda *args, **kwargs: st.session_state.get(TAB_KEY, TABS[0])
+
+
+@contextmanager
+def install_shared_runtime():
+    # One runtime (and media file store) for every AppTest session
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    from streamlit.testing.v1.util import patch_config_options
+
+    storage = MemoryMediaFileStorage('/mock/media')
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(storage)
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+
+    class PerRunRuntime:
+        # What AppTest sets up and tears down on each run; left unused
+        _instance = None
+
+    class SessionScriptRunner(LocalScriptRunner):
+        # Media files are tracked per session id; each student thread gets its own
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._session_id = threading.current_thread().name
+
+    saved = (app_test.Runtime, app_test.patch_config_options, app_test.LocalScriptRunner, Runtime._instance)
+    Runtime._instance = runtime
+    app_test.Runtime = PerRunRuntime
+    app_test.patch_config_options = lambda options: nullcontext()
+    app_test.LocalScriptRunner = SessionScriptRunner
+    try:
+        with patch_config_options({'global.appTest': True}):
+            yield storage
+    finally:
+        app_test.Runtime, app_test.patch_config_options, app_test.LocalScriptRunner, Runtime._instance = saved
+
+
+def run_script():
+    # What each session's script runs: app.py after the stand-ins are in place
+    import runpy
+    install_stand_ins()
+    runpy.run_path(APP_PATH, run_name='__main__')
+
+
+@contextmanager
+def session_script():
+    # Path of the one script file every session runs
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.py')
+        with open(path, 'w') as f:
+            f.write('import app_loadtest\napp_loadtest.run_script()\n')
+        yield path
+
+
+def fetch_download(at, storage):
+    # Bytes behind the page's first download button, as the browser would fetch them
+    buttons = at.get('download_button')
+    if not buttons:
+        return None
+    file_name = buttons[0].proto.url.rsplit('/', 1)[-1]
+    return storage.get_file(file_name).content
+
+
+def student(script, uploads, storage, timeout):
+    # One session: per upload, convert it, flip through the tutorials and download
+    from streamlit.testing.v1 import AppTest
+
+    record = {'convert': [], 'tabs': [], 'download': [], 'errors': [], 'rejected': 0}
+    at = AppTest.from_file(script, default_timeout=timeout)
+    for upload in uploads:
+        try:
+            at.session_state[UPLOAD_KEY] = upload
+            at.session_state[TAB_KEY] = TABS[0]
+            started = time.perf_counter()
+            at.run()
+            record['convert'].append(time.perf_counter() - started)
+            if at.exception:
+                record['errors'].append(f"script raised: {at.exception[0].message}")
+                continue
+            if any(BUSY_MESSAGE in element.value for element in at.error):
+                record['rejected'] += 1
+                continue
+
+            for tab in TABS[1:] + TABS[:1]:
+                at.session_state[TAB_KEY] = tab
+                started = time.perf_counter()
+                at.run()
+                record['tabs'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            ics = fetch_download(at, storage)
+            record['download'].append(time.perf_counter() - started)
+            if not ics or not ics.startswith(b'BEGIN:VCALENDAR'):
+                record['errors'].append(f"no calendar to download: {[element.value for element in at.error]}")
+        except Exception as e:
+            record['errors'].append(f"{type(e).__name__}: {e}")
+    return record
+
+
+def run_level(script, users, rounds, sections, seed, storage, timeout):
+    # `users` concurrent sessions of `rounds` uploads each; every upload is a
+    # different workbook, so the result cache never answers for the converter
+    uploads = [
+        [workbook_bytes(sections=sections, seed=seed + user * rounds + r) for r in range(rounds)]
+        for user in range(users)
+    ]
+    records = [None] * users
+
+    def run(user):
+        records[user] = student(script, uploads[user], storage, timeout)
+
+    threads = [threading.Thread(target=run, args=(user,), name=f'student-{user}') for user in range(users)]
+    rss_before = rss_kb()
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    with RSSSampler() as sampler:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+    cpu = cpu_seconds() - cpu_before
+
+    convert = [s for r in records for s in r['convert']]
+    tabs = [s for r in records for s in r['tabs']]
+    download = [s for r in records for s in r['download']]
+    flows = users * rounds
+    return {
+        'users': users,
+        'uploads': flows,
+        'errors': sum(len(r['errors']) for r in records),
+        'failures': sorted({message for r in records for message in r['errors']}),
+        'rejected': sum(r['rejected'] for r in records),
+        'convert_p50': percentile(convert, 50),
+        'convert_p95': percentile(convert, 95),
+        'convert_p99': percentile(convert, 99),
+        'tab_p95': percentile(tabs, 95),
+        'download_p95': percentile(download, 95),
+        'wall_seconds': wall,
+        'cpu_seconds_per_session': cpu / users,
+        'cpu_utilization': cpu / wall if wall else None,
+        'peak_rss_mb': sampler.peak_kb / 1024,
+        'rss_growth_mb_per_session': max(0, sampler.peak_kb - rss_before) / 1024 / users,
+    }
+
+
+def over_budget(result, args):
+    # The budgets a level broke, as messages
+    broken = []
+    if result['errors'] > args.max_errors:
+        broken.append(f"{result['errors']} failed uploads (budget {args.max_errors})")
+    if args.max_p95 is not None and (result['convert_p95'] or 0) > args.max_p95:
+        broken.append(f"p95 upload-to-calendar {result['convert_p95']:.2f}s (budget {args.max_p95}s)")
+    if args.max_rss_mb is not None and result['peak_rss_mb'] > args.max_rss_mb:
+        broken.append(f"peak RSS {result['peak_rss_mb']:.0f} MB (budget {args.max_rss_mb} MB)")
+    if args.max_cpu is not None and result['cpu_seconds_per_session'] > args.max_cpu:
+        broken.append(f"{result['cpu_seconds_per_session']:.2f} CPU s per session (budget {args.max_cpu}s)")
+    if args.max_rejected is not None and result['rejected'] > args.max_rejected:
+        broken.append(f"{result['rejected']} uploads turned away (budget {args.max_rejected})")
+    return broken
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test app.py with concurrent in-process sessions.")
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help="Concurrent sessions per level (one level per value)")
+    parser.add_argument('--rounds', type=int, default=2, help="Uploads per session")
+    parser.add_argument('--sections', type=int, default=12, help="Sections per generated workbook")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds one script run may take")
+    parser.add_argument('--max-p95', type=float, help="Budget: p95 seconds from upload to calendar")
+    parser.add_argument('--max-rss-mb', type=float, help="Budget: peak RSS of the process")
+    parser.add_argument('--max-cpu', type=float, help="Budget: CPU seconds per session")
+    parser.add_argument('--max-rejected', type=int, help="Budget: uploads turned away by a full queue")
+    parser.add_argument('--max-errors', type=int, default=0, help="Budget: failed uploads (default: 0)")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Streamlit warns about every thread it doesn't own
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    logging.disable(logging.WARNING)
+
+    results = []
+    failed = False
+    print(f"{'users':>5} {'uploads':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'tab p95':>8} "
+          f"{'CPU s/ses':>9} {'peak MB':>8} {'MB/ses':>7} {'reject':>6} {'errors':>6}")
+    with session_script() as script, install_shared_runtime() as storage:
+        # Warm imports and the app's shared resources outside the timings
+        run_level(script, 1, 1, args.sections, 10 ** 6, storage, args.timeout)
+        seed = 0
+        for users in args.users:
+            result = run_level(script, users, args.rounds, args.sections, seed, storage, args.timeout)
+            seed += users * args.rounds
+            result['over_budget'] = over_budget(result, args)
+            results.append(result)
+            print(f"{users:>5} {result['uploads']:>7} {fmt_ms(result['convert_p50'])} {fmt_ms(result['convert_p95'])} "
+                  f"{fmt_ms(result['convert_p99'])} {fmt_ms(result['tab_p95'])} "
+                  f"{result['cpu_seconds_per_session']:9.2f} {result['peak_rss_mb']:8.0f} "
+                  f"{result['rss_growth_mb_per_session']:7.1f} {result['rejected']:>6} {result['errors']:>6}")
+            for message in result['failures']:
+                print(f"      failed: {message}")
+            for message in result['over_budget']:
+                print(f"      over budget: {message}")
+                failed = True
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# Headless batch conversion of Workday "View My Courses" exports (.xlsx, or .pdf printouts).
+#
+#   python batch.py exports/ "spring/*.xlsx" -o calendars/ -j 8
+#
+# Writes one .ics per input workbook plus summary.json into the output directory.
+# --formats adds the other export formats (see exports.py), from the same parse.
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from converter import process_excel
+from exports import FORMATS, export_schedule
+from pdf_ingest import process_pdf
+from course_store import CourseStore
+from result_cache import MessageLog
+from schedule_analysis import combine_schedules, schedule_conflicts, room_clashes, room_occupancy
+
+
+def collect_inputs(patterns):
+    # Expand directories and glob patterns into a sorted, de-duplicated list of exports
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, '*.xlsx')))
+            paths.update(glob.glob(os.path.join(pattern, '*.pdf')))
+        else:
+            paths.update(p for p in glob.glob(pattern) if p.lower().endswith(('.xlsx', '.pdf')))
+    # Skip the lock files Excel leaves next to open workbooks
+    return sorted(p for p in paths if not os.path.basename(p).startswith('~$'))
+
+
+# Written into the output directory by the run itself, so no input's outputs may take these names
+SUMMARY_FILE = 'summary.json'
+ANALYSIS_FILES = {'conflicts': 'conflicts.csv', 'room_clashes': 'room_clashes.csv', 'room_occupancy': 'room_occupancy.csv'}
+RESERVED_NAMES = (SUMMARY_FILE, *ANALYSIS_FILES.values())
+
+
+def output_names(paths, formats=('ics',)):
+    # One .ics per input, named after the workbook; a stem whose file in any of the
+    # formats clashes with an earlier input or a run file gets a numeric suffix.
+    # Names are compared case-insensitively, as macOS and Windows do.
+    extensions = [FORMATS[name]['extension'] for name in formats] or ['.ics']
+    names = {}
+    used = {name.lower() for name in RESERVED_NAMES}
+    for path in paths:
+        base = os.path.splitext(os.path.basename(path))[0]
+        stem = base
+        n = 1
+        while any(f"{stem}{extension}".lower() in used for extension in extensions):
+            n += 1
+            stem = f"{base}-{n}"
+        used.update(f"{stem}{extension}".lower() for extension in extensions)
+        names[path] = f"{stem}.ics"
+    return names
+
+
+def convert_file(path, output_path, backend='icalendar', store_root=None, analyze=False, formats=('ics',)):
+    # Runs in a worker process; returns a plain dict so it pickles cheaply.
+    # Every format is written next to output_path, with its own extension.
+    started = time.perf_counter()
+    log = MessageLog()
+    result = {'input': path, 'output': None, 'ok': False, 'courses': 0}
+    if store_root is not None:
+        # Reuse the stored course table when this exact file was parsed before
+        with open(path, 'rb') as f:
+            source = f.read()
+        suffix = os.path.splitext(path)[1].lower()
+        result['key'], data = CourseStore(store_root).load_or_parse(source, suffix, ui=log)
+    elif path.lower().endswith('.pdf'):
+        # Files are already spread over the pool, so parse the pages inline
+        data = process_pdf(path, ui=log, workers=1)
+    else:
+        data = process_excel(path, ui=log)
+    if data is not None and not data.empty:
+        result['courses'] = len(data)
+        meetings, exports = export_schedule(data, ui=log, formats=formats, ics_backend=backend)
+        stem = os.path.splitext(output_path)[0]
+        outputs = {}
+        for name, export in exports.items():
+            outputs[name] = stem + FORMATS[name]['extension']
+            with open(outputs[name], 'wb') as f:
+                f.write(export)
+        if outputs:
+            result['output'] = outputs.get('ics', next(iter(outputs.values())))
+            result['outputs'] = outputs
+            result['ok'] = len(outputs) == len(formats)
+        if analyze:
+            result['meetings'] = meetings
+    result['messages'] = [f"{level}: {body}" for level, body in log.messages if level != 'success']
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def convert_batch(paths, output_dir, workers=None, backend='icalendar', store_root=None, analyze=False,
+                  formats=('ics',)):
+    os.makedirs(output_dir, exist_ok=True)
+    names = output_names(paths, formats)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(convert_file, path, os.path.join(output_dir, names[path]), backend, store_root, analyze,
+                            formats)
+            for path in paths
+        ]
+        for path, future in zip(paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # A crashed worker should only fail its own file
+                results.append({'input': path, 'output': None, 'ok': False, 'courses': 0,
+                                'messages': [f"error: {e}"], 'seconds': None})
+    return results
+
+
+def write_analysis(results, output_dir):
+    # Conflicts per student and room usage across every converted schedule;
+    # returns the counts for summary.json
+    meetings = combine_schedules({
+        r['input']: r.pop('meetings') for r in results if r.get('meetings') is not None
+    })
+    if meetings.empty:
+        return {'conflicts': 0, 'room_clashes': 0, 'rooms': 0}
+    conflicts = schedule_conflicts(meetings)
+    clashes = room_clashes(meetings)
+    occupancy = room_occupancy(meetings)
+    conflicts.to_csv(os.path.join(output_dir, ANALYSIS_FILES['conflicts']), index=False)
+    clashes.to_csv(os.path.join(output_dir, ANALYSIS_FILES['room_clashes']), index=False)
+    occupancy.to_csv(os.path.join(output_dir, ANALYSIS_FILES['room_occupancy']), index=False)
+    return {'conflicts': len(conflicts), 'room_clashes': len(clashes), 'rooms': len(occupancy)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Workday 'View My Courses' exports to .ics files.")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of .xlsx/.pdf files")
+    parser.add_argument('-o', '--output-dir', default='calendars', help="Where to write the .ics files (default: calendars)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--backend', choices=['icalendar', 'stream'], default='icalendar',
+                        help="ICS serializer; 'stream' skips icalendar objects and is faster on large batches")
+    parser.add_argument('--store', help="Course-table store directory; files parsed before are not re-parsed")
+    parser.add_argument('--formats', nargs='+', choices=list(FORMATS), default=['ics'],
+                        help="Formats to write for every input (default: ics); the input is read once for all of them")
+    parser.add_argument('--analysis', action='store_true',
+                        help="Also write conflicts.csv, room_clashes.csv and room_occupancy.csv for the whole batch")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("No .xlsx or .pdf files found.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    results = convert_batch(paths, args.output_dir, args.workers, args.backend, args.store, args.analysis,
+                            args.formats)
+    elapsed = time.perf_counter() - started
+    analysis = write_analysis(results, args.output_dir) if args.analysis else None
+
+    failures = [r for r in results if not r['ok']]
+    summary = {
+        'files': len(results),
+        'succeeded': len(results) - len(failures),
+        'failed': len(failures),
+        'seconds': round(elapsed, 3),
+        'files_per_second': round(len(results) / elapsed, 2) if elapsed else None,
+        'results': results,
+    }
+    if analysis is not None:
+        summary['analysis'] = analysis
+    with open(os.path.join(args.output_dir, SUMMARY_FILE), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    for r in failures:
+        print(f"FAILED {r['input']}: {'; '.join(r['messages'])}", file=sys.stderr)
+    print(f"Converted {summary['succeeded']}/{summary['files']} files in {elapsed:.2f}s "
+          f"({summary['files_per_second']} files/sec)")
+    if analysis is not None:
+        print(f"{analysis['conflicts']} schedule conflicts, {analysis['room_clashes']} room clashes "
+              f"across {analysis['rooms']} rooms")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
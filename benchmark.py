@@ -0,0 +1,181 @@
+# Repeatable timings for the conversion pipeline on synthetic Workday exports.
+#
+#   python benchmark.py -o bench.json
+#   python benchmark.py --sizes 10 100 1000 --compare bench.json
+#
+# Results are saved as JSON so runs from different commits can be compared.
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from academic_calendar import default_calendar
+from converter import process_excel, create_ics_file, parse_meeting_patterns
+from exports import FORMATS, bundle_bytes, export_schedule
+from recurrence import first_occurrence_dates
+from result_cache import MessageLog
+from workday_fixtures import combined_workbook_bytes, workbook_bytes
+
+# 3 is a typical single-student upload
+DEFAULT_SIZES = [3, 10, 100, 1000, 5000]
+# The larger synthetic workbooks are well past the caps real uploads are held to
+LIMITS = {'max_rows': 10 ** 6, 'max_bytes': 1 << 30, 'max_uncompressed_bytes': 1 << 31}
+# Terms in the combined workbooks, one sheet (or block) each, and the workers reading them
+TERMS = 4
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def pipeline_benchmarks(size, noise_rows, executor=None):
+    # (name, callable) pairs for one workbook size; combined workbooks have
+    # `size` sections in each term
+    raw = workbook_bytes(sections=size, noise_rows=noise_rows, seed=size)
+    sheets = combined_workbook_bytes(terms=TERMS, per='sheet', sections=size, noise_rows=noise_rows, seed=size)
+    blocks = combined_workbook_bytes(terms=TERMS, per='block', sections=size, noise_rows=noise_rows, seed=size)
+    data = process_excel(io.BytesIO(raw), ui=MessageLog(), limits=LIMITS)
+
+    def upload_to_bytes(backend):
+        courses = process_excel(io.BytesIO(raw), ui=MessageLog(), limits=LIMITS)
+        return create_ics_file(courses, ui=MessageLog(), backend=backend)
+
+    # Each export format on its own, from an already parsed meeting table
+    meetings = parse_meeting_patterns(data, MessageLog())
+    first_dates = first_occurrence_dates(meetings)
+    exports = export_schedule(data, ui=MessageLog())[1]
+
+    stamp = datetime.now(timezone.utc)
+
+    def serialize(write):
+        return lambda: b''.join(write(meetings, first_dates, stamp))
+
+    formats = [(f'export[{name}]', serialize(spec['write'])) for name, spec in FORMATS.items()]
+
+    return formats + [
+        ('export_schedule[all]', lambda: export_schedule(data, ui=MessageLog())[1]),
+        ('export_bundle', lambda: bundle_bytes(exports)),
+        ('process_excel', lambda: process_excel(io.BytesIO(raw), ui=MessageLog(), limits=LIMITS)),
+        # Sheets one after another, then spread over worker processes (started once, outside the timings)
+        ('process_excel[sheets]', lambda: process_excel(io.BytesIO(sheets), ui=MessageLog(), limits=LIMITS)),
+        ('process_excel[sheets,par]',
+         lambda: process_excel(io.BytesIO(sheets), ui=MessageLog(), limits=LIMITS, executor=executor)),
+        ('process_excel[blocks]', lambda: process_excel(io.BytesIO(blocks), ui=MessageLog(), limits=LIMITS)),
+        # The breaks and holidays every meeting skips, for the whole table at once
+        ('academic_calendar.exdates', lambda: default_calendar.exdates(meetings)),
+        ('create_ics_file', lambda: create_ics_file(data, ui=MessageLog())),
+        ('create_ics_file[stream]', lambda: create_ics_file(data, ui=MessageLog(), backend='stream')),
+        ('upload_to_bytes', lambda: upload_to_bytes('icalendar')),
+        ('upload_to_bytes[stream]', lambda: upload_to_bytes('stream')),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, noise_rows, suites):
+    results = []
+    executor = ProcessPoolExecutor(max_workers=TERMS)
+    for size in sizes:
+        for name, func in pipeline_benchmarks(size, noise_rows, executor):
+            if suites and not any(name.startswith(s) for s in suites):
+                continue
+            # One untimed call to warm imports and caches
+            output = func()
+            timings = time_call(func, repeat)
+            result = {
+                'name': name,
+                'size': size,
+                'repeat': repeat,
+                'best': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.fmean(timings),
+            }
+            # Output size, for the throughput of the serializers
+            if isinstance(output, dict):
+                output = b''.join(output.values())
+            throughput = ''
+            if isinstance(output, bytes):
+                result['bytes'] = len(output)
+                throughput = f"  {len(output) / result['median'] / 2 ** 20:8.1f} MB/s"
+            results.append(result)
+            print(f"{name:<26} {size:>6} sections  best {result['best']*1000:9.2f} ms  "
+                  f"median {result['median']*1000:9.2f} ms{throughput}")
+    executor.shutdown()
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'noise_rows': noise_rows,
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, previous, threshold):
+    # Print the change in median time per benchmark; returns the regressions
+    baseline = {(r['name'], r['size']): r for r in previous['results']}
+    regressions = []
+    print(f"\nCompared with {previous['meta'].get('revision')}:")
+    for result in current['results']:
+        old = baseline.get((result['name'], result['size']))
+        if old is None:
+            continue
+        ratio = result['median'] / old['median'] if old['median'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(result)
+        print(f"{result['name']:<26} {result['size']:>6} sections  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Excel to ICS conversion pipeline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Enrolled sections per workbook")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark (default: 5)")
+    parser.add_argument('--noise-rows', type=int, default=100, help="Filler rows around the enrolled section")
+    parser.add_argument('--only', nargs='+', default=None, help="Only run benchmarks whose name starts with these")
+    parser.add_argument('-o', '--output', help="Write results to this JSON file")
+    parser.add_argument('--compare', help="JSON results from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Slowdown ratio counted as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    report = run(args.sizes, args.repeat, args.noise_rows, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(report, previous, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+# Event-level updates between two conversions of the same schedule.
+#
+# Every VEVENT has a stable UID (see converter.meeting_uid), so a new course
+# table can be compared with what a student already imported - their previous
+# .ics download or a snapshot saved by this module - and only the added,
+# changed and cancelled events need to be sent:
+#
+#   python calendar_diff.py schedule.xlsx --previous myCarletonSchedule.ics -o update.ics
+#   python calendar_diff.py schedule.xlsx --previous myCarletonSchedule.ics update.ics -o update-2.ics
+#   python calendar_diff.py schedule.xlsx --previous state.json --snapshot state.json -o update.ics
+#
+# Changed events get SEQUENCE + 1, dropped ones are sent as STATUS:CANCELLED, so
+# calendar clients update the events they have instead of duplicating them.
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+
+from icalendar import Calendar, Event
+
+from converter import LogReporter, build_calendar, parse_meeting_patterns, process_excel
+from recurrence import first_occurrence_dates
+
+SNAPSHOT_VERSION = 1
+PRODID = '-//Carleton Calendar Converter//EN'
+
+# What an event looks like to the student; UID, DTSTAMP, SEQUENCE and STATUS are bookkeeping
+CONTENT_PROPERTIES = ['SUMMARY', 'DTSTART', 'DTEND', 'RRULE', 'EXDATE', 'LOCATION']
+
+
+def property_text(value):
+    if value is None:
+        return ''
+    # A property given on several lines (EXDATE can be) comes back as a list
+    if isinstance(value, list):
+        return ','.join(item.to_ical().decode('utf-8') for item in value)
+    return value.to_ical().decode('utf-8')
+
+
+def event_fingerprint(event):
+    parts = []
+    for name in CONTENT_PROPERTIES:
+        parts.append(f"{name}:{property_text(event.get(name))}")
+    return '\n'.join(parts)
+
+
+def previous_from_ics(*documents):
+    # {uid: (sequence, Event)} for the events still live after an earlier download
+    # and the updates imported since. The full download carries no SEQUENCE, so
+    # per UID the version with the highest one wins and the next change goes one
+    # past it; a cancellation wins over the event it cancels.
+    latest = {}
+    for ics_bytes in documents:
+        for event in Calendar.from_ical(ics_bytes).walk('VEVENT'):
+            uid = event.get('UID')
+            if uid is None:
+                continue
+            uid = str(uid)
+            sequence = int(event.get('SEQUENCE', 0))
+            if uid not in latest or sequence >= latest[uid][0]:
+                latest[uid] = (sequence, event)
+    return {
+        uid: (sequence, event) for uid, (sequence, event) in latest.items()
+        if str(event.get('STATUS', '')).upper() != 'CANCELLED'
+    }
+
+
+def previous_from_snapshot(snapshot):
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {snapshot.get('version')}")
+    return {
+        uid: (entry['sequence'], Event.from_ical(entry['vevent']))
+        for uid, entry in snapshot['events'].items()
+    }
+
+
+def load_previous(paths):
+    # A snapshot .json, or an .ics download and the update files sent since
+    documents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            documents.append(f.read())
+    if any(path.lower().endswith('.json') for path in paths):
+        if len(paths) > 1:
+            raise ValueError("A snapshot already holds every event; pass it on its own")
+        return previous_from_snapshot(json.loads(documents[0]))
+    return previous_from_ics(*documents)
+
+
+def current_events(courses, ui):
+    # {uid: Event} for a course table, built exactly like create_ics_file builds them
+    meetings = parse_meeting_patterns(courses, ui)
+    calendar = build_calendar(meetings, first_occurrence_dates(meetings), ui)
+    return {str(event['UID']): event for event in calendar.walk('VEVENT')}
+
+
+def diff_events(previous, current):
+    # Returns {'added': [...], 'changed': [...], 'cancelled': [...], 'unchanged': [...]}
+    # of (sequence, Event) pairs, with the sequence each one should be sent with
+    diff = {'added': [], 'changed': [], 'cancelled': [], 'unchanged': []}
+    for uid, event in current.items():
+        if uid not in previous:
+            diff['added'].append((0, event))
+            continue
+        sequence, old_event = previous[uid]
+        if event_fingerprint(event) == event_fingerprint(old_event):
+            diff['unchanged'].append((sequence, event))
+        else:
+            diff['changed'].append((sequence + 1, event))
+    for uid, (sequence, old_event) in previous.items():
+        if uid not in current:
+            diff['cancelled'].append((sequence + 1, old_event))
+    return diff
+
+
+def stamped(event, sequence, stamp, status=None):
+    # A copy of the event carrying the scheduling fields for an update document
+    copy = Event()
+    for name, value in event.items():
+        if name not in ('DTSTAMP', 'SEQUENCE', 'STATUS'):
+            copy.add(name, value)
+    copy.add('dtstamp', stamp)
+    copy.add('sequence', sequence)
+    if status is not None:
+        copy.add('status', status)
+    return copy
+
+
+def render_update(diff, method='PUBLISH', stamp=None):
+    # METHOD:PUBLISH carries the added, changed and cancelled events;
+    # METHOD:CANCEL only the cancelled ones
+    stamp = stamp or datetime.now(timezone.utc)
+    cal = Calendar()
+    cal.add('prodid', PRODID)
+    cal.add('version', '2.0')
+    cal.add('method', method)
+    if method == 'PUBLISH':
+        for sequence, event in diff['added'] + diff['changed']:
+            cal.add_component(stamped(event, sequence, stamp))
+    for sequence, event in diff['cancelled']:
+        cal.add_component(stamped(event, sequence, stamp, status='CANCELLED'))
+    return cal.to_ical()
+
+
+def snapshot(diff):
+    # State to diff the next conversion against; cancelled events are left out
+    events = {}
+    for sequence, event in diff['added'] + diff['changed'] + diff['unchanged']:
+        events[str(event['UID'])] = {'sequence': sequence, 'vevent': event.to_ical().decode('utf-8')}
+    return {'version': SNAPSHOT_VERSION, 'events': events}
+
+
+def summarize(diff):
+    return {kind: len(events) for kind, events in diff.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write only the calendar events that changed since an earlier conversion.")
+    parser.add_argument('input', help="New 'View My Courses' export (.xlsx or .pdf)")
+    parser.add_argument('--previous', required=True, nargs='+',
+                        help="Earlier .ics download and any update files since, or a snapshot .json")
+    parser.add_argument('-o', '--output', default='update.ics', help="Update file to write (default: update.ics)")
+    parser.add_argument('--cancel-output', help="Also write a METHOD:CANCEL file with just the cancelled events")
+    parser.add_argument('--snapshot', help="Write the new state here for the next diff")
+    args = parser.parse_args(argv)
+
+    ui = LogReporter()
+    if args.input.lower().endswith('.pdf'):
+        from pdf_ingest import process_pdf
+        courses = process_pdf(args.input, ui=ui, workers=1)
+    else:
+        courses = process_excel(args.input, ui=ui)
+    if courses is None or courses.empty:
+        print(f"Could not extract course data from {args.input}")
+        return 1
+
+    diff = diff_events(load_previous(args.previous), current_events(courses, ui))
+    with open(args.output, 'wb') as f:
+        f.write(render_update(diff))
+    if args.cancel_output:
+        with open(args.cancel_output, 'wb') as f:
+            f.write(render_update(diff, method='CANCEL'))
+    if args.snapshot:
+        with open(args.snapshot, 'w') as f:
+            json.dump(snapshot(diff), f)
+    counts = summarize(diff)
+    print(f"{counts['added']} added, {counts['changed']} changed, {counts['cancelled']} cancelled, "
+          f"{counts['unchanged']} unchanged -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,716 @@
+import hashlib
+import io
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from itertools import chain, islice
+from icalendar import Calendar, Event, vRecur
+from datetime import datetime, timezone
+from academic_calendar import default_calendar
+from recurrence import first_occurrence_dates
+from ics_writer import UNTIL_TIME, iter_ics
+from instrumentation import Stopwatch
+from preflight import banner_counts, preflight_xlsx, capped_rows
+from records import CourseTable, MeetingTable, object_array
+from layout_cache import layouts
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change to the parsing code can change the course table, so
+# stored tables (see course_store.py) get rebuilt
+PARSER_VERSION = 6
+
+class LogReporter:
+    # Default message sink when running without Streamlit (batch jobs, scripts)
+
+    def error(self, body):
+        logger.error(body)
+
+    def warning(self, body):
+        logger.warning(body)
+
+    def info(self, body):
+        logger.info(body)
+
+    def success(self, body):
+        logger.info(body)
+
+# Banner above each block of enrolled courses; a sheet can have several
+BANNER_TERMS = ["Enrolled Courses"]
+# Section titles that close the "My Enrolled Courses" block (so does the next banner)
+END_SECTION_TERMS = ["Waitlisted", "Completed", "Dropped", "Withdrawn"] + BANNER_TERMS
+
+# "2025 Spring Term", "Spring 2025", "Fall Term 2024", ...
+TERM_RE = re.compile(
+    r'\b(?:(?P<year>\d{4})\s+(?P<season>Fall|Winter|Spring|Summer)'
+    r'|(?P<season_first>Fall|Winter|Spring|Summer)(?:\s+Term)?\s+(?P<year_last>\d{4}))\b',
+    re.IGNORECASE,
+)
+# Season of a term by the month its classes start, on Carleton's trimester calendar
+SEASON_BY_MONTH = {1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring', 6: 'Summer',
+                   7: 'Summer', 8: 'Fall', 9: 'Fall', 10: 'Fall', 11: 'Fall', 12: 'Fall'}
+
+def term_label(value):
+    # Workday's name for the term a cell or title mentions ('2025 Spring Term'), or None
+    if not isinstance(value, str):
+        return None
+    match = TERM_RE.search(value)
+    if match is None:
+        return None
+    season = (match['season'] or match['season_first']).title()
+    return f"{match['year'] or match['year_last']} {season} Term"
+
+def normalize_term(value):
+    # An "Academic Period" cell: the term it names, else its text as written
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return term_label(value) or value.strip()
+
+def terms_from_dates(start_dates):
+    # Term of each course from its start date, for sheets that name no term: the
+    # academic calendar's term containing it, else a season from its month
+    start_dates = np.asarray(start_dates, dtype='datetime64[D]')
+    terms = default_calendar.term_of(start_dates)
+    unknown = np.array([term is None for term in terms], dtype=bool) & ~np.isnat(start_dates)
+    if unknown.any():
+        months = start_dates[unknown].astype('datetime64[M]')
+        labels = {}
+        for month in np.unique(months):
+            day = month.astype(object)
+            labels[month] = f"{day.year} {SEASON_BY_MONTH[day.month]} Term"
+        terms[unknown] = [labels[month] for month in months]
+    return terms
+
+def tag_terms(courses, *titles):
+    # Fill in the term of every course the sheet left untagged: the term the
+    # block's banner or the sheet title names, otherwise one from its start date
+    named = next(filter(None, map(term_label, titles)), None)
+    if named is not None:
+        fallback = np.full(len(courses), named, dtype=object)
+    else:
+        fallback = terms_from_dates(courses.start_date)
+    if courses.term is None:
+        courses.term = fallback
+    else:
+        missing = np.array([term is None for term in courses.term], dtype=bool)
+        courses.term[missing] = fallback[missing]
+    return courses
+
+def row_has_marker(row, terms):
+    # Check the first few columns of a sheet row for any of the given terms
+    for value in row[:5]:
+        if isinstance(value, str) and any(term in value for term in terms):
+            return True
+    return False
+
+def rows_until_marker(rows, terms, state):
+    # Yield (index, row) pairs until a row containing one of the terms shows up
+    for idx, row in rows:
+        if row_has_marker(row, terms):
+            state['end_index'] = idx
+            state['end_row'] = (idx, row)
+            return
+        yield idx, row
+
+def find_banner(rows, width):
+    # Scan (index, row) pairs up to the next "Enrolled Courses" banner; returns the
+    # banner's (index, row) or None, the rows scanned and the widest row seen
+    rows_seen = 0
+    for idx, row in rows:
+        rows_seen += 1
+        width = max(width, len(row))
+        if row_has_marker(row, BANNER_TERMS):
+            return (idx, row), rows_seen, width
+    return None, rows_seen, width
+
+def report_missing_banner(ui, rows_seen, width):
+    # Check if the Excel file might have multiple sheets merged into one with just the name
+    if rows_seen <= 2 and width <= 2:
+        ui.error("The Excel file appears to only contain the name 'View My Courses' without actual course data.")
+        ui.info("Please make sure you're exporting the full data from Workday → Academics and Registration → Registration Planning → View My Courses")
+        return
+    ui.error("Could not find 'My Enrolled Courses' in the file.")
+    ui.info("Please ensure you're using the correct Excel file from 'View My Courses' in Workday.")
+
+def extract_courses(rows, width, ui, stopwatch):
+    # Pull the enrolled courses out of a sequence of sheet rows (tuples of cell
+    # values). Shared by the Excel and PDF readers; stops reading at the end marker.
+    rows = enumerate(rows)
+    banner, rows_seen, width = find_banner(rows, width)
+    stopwatch.lap('enrolled_scan', rows=rows_seen)
+    if banner is None:
+        report_missing_banner(ui, rows_seen, width)
+        return None
+    courses, _ = read_block(rows, width, ui, stopwatch)
+    return courses
+
+def extract_blocks(rows, width, ui, stopwatch, max_blocks=None):
+    # Every "Enrolled Courses" block in a sequence of sheet rows, each read as
+    # extract_courses reads the first, stopping after max_blocks blocks. Returns
+    # ([(banner row, CourseTable or None)], rows scanned outside the blocks, widest
+    # row); a sheet without any banner is left to the caller to report, as other
+    # sheets may have one.
+    rows = enumerate(rows)
+    blocks = []
+    rows_scanned = 0
+    while True:
+        banner, rows_seen, width = find_banner(rows, width)
+        rows_scanned += rows_seen
+        stopwatch.lap('enrolled_scan', rows=rows_seen)
+        if banner is None:
+            return blocks, rows_scanned, width
+        courses, end_row = read_block(rows, width, ui, stopwatch)
+        blocks.append((banner[1], courses))
+        if max_blocks is not None and len(blocks) >= max_blocks:
+            return blocks, rows_scanned, width
+        if end_row is not None and row_has_marker(end_row[1], BANNER_TERMS):
+            # The block ran straight into the next one; start the next scan at its banner
+            rows = chain([end_row], rows)
+
+def read_block(rows, width, ui, stopwatch):
+    # The courses of one block, from the (index, row) pairs after its banner.
+    # Returns (CourseTable or None, the (index, row) that ended the block or None).
+    # Everything up to "My Waitlisted/Dropped/Withdrawn Courses" belongs to the enrolled section
+    state = {'end_index': None, 'end_row': None}
+    section_rows = rows_until_marker(rows, END_SECTION_TERMS, state)
+
+    # Find the header row, usually 1-3 rows after the "My Enrolled Courses" row
+    leading_rows = list(islice(section_rows, 3))
+    header_offset = None
+    for i, (idx, row) in enumerate(leading_rows):
+        # Check if this row has multiple non-null values and looks like a header
+        if sum(value is not None for value in row) >= 3:
+            header_offset = i
+            break
+
+    header_found = header_offset is not None
+    if not header_found:
+        ui.warning("Could not identify header row. Using row after 'My Enrolled Courses'.")
+        header_offset = 0
+    header_row = leading_rows[header_offset][1] if leading_rows else ()
+
+    # Data rows are whatever follows the header until the end marker
+    data_rows = chain(leading_rows[header_offset + 1:], section_rows)
+    first_data_row = next(data_rows, None)
+    if first_data_row is None:
+        ui.error("No data rows found between header and end section.")
+        return None, state['end_row']
+
+    # Get columns for required fields. Exports mostly share a few layouts, so the
+    # column plan is looked up by the layout's fingerprint and only worked out
+    # from the header cells the first time a layout shows up. A row standing in
+    # for a header that wasn't found is no layout, so it is not cached.
+    section_col, meeting_pattern_col, start_date_col, end_date_col, term_col = layouts.plan(
+        header_offset, header_row, cache=header_found)
+
+    # If we couldn't find the columns by name, use the fixed positions from original code
+    width = max(width, len(header_row), len(first_data_row[1]))
+    if section_col is None:
+        section_col = min(5, width-1)
+        ui.warning(f"Could not find Section column. Using column {section_col+1}.")
+    if meeting_pattern_col is None:
+        meeting_pattern_col = min(9, width-1)
+        ui.warning(f"Could not find Meeting Pattern column. Using column {meeting_pattern_col+1}.")
+    if start_date_col is None:
+        start_date_col = min(11, width-1)
+        ui.warning(f"Could not find Start Date column. Using column {start_date_col+1}.")
+    if end_date_col is None:
+        end_date_col = min(12, width-1)
+        ui.warning(f"Could not find End Date column. Using column {end_date_col+1}.")
+
+    stopwatch.lap('header_detection', rows=len(leading_rows))
+
+    # Keep only the needed columns from each remaining row
+    columns = ['Section', 'Meeting Patterns', 'Start Date', 'End Date']
+    wanted_cols = [section_col, meeting_pattern_col, start_date_col, end_date_col]
+    if term_col is not None:
+        columns.append('Term')
+        wanted_cols.append(term_col)
+    index = []
+    records = []
+    for idx, row in chain([first_data_row], data_rows):
+        index.append(idx)
+        # Empty cells go in as NaN, the missing-value marker of the columns built from them
+        values = [row[col] if col < len(row) else None for col in wanted_cols]
+        records.append([np.nan if value is None else value for value in values])
+
+    stopwatch.lap('end_marker_scan', rows=len(records))
+
+    if state['end_index'] is None:
+        # Use the rest of the file if we can't find an end marker
+        ui.warning("Could not find end of enrolled courses section. Using the rest of the file.")
+
+    # Set column headers
+    relevant_df = pd.DataFrame(records, index=index, columns=columns)
+
+    # Filter out rows without section data
+    relevant_df = relevant_df[relevant_df['Section'].notna()]
+    
+    # Convert date columns to datetime
+    relevant_df['Start Date'] = pd.to_datetime(relevant_df['Start Date'], errors='coerce')
+    relevant_df['End Date'] = pd.to_datetime(relevant_df['End Date'], errors='coerce')
+    if term_col is not None:
+        relevant_df['Term'] = relevant_df['Term'].map(normalize_term)
+    
+    # If dates are missing, use the dates of the course's term
+    if relevant_df['Start Date'].isna().any() or relevant_df['End Date'].isna().any():
+        fill_term_dates(relevant_df, ui)
+    
+    # Drop rows with NaN in both dates
+    relevant_df = relevant_df.dropna(subset=['Start Date', 'End Date'], how='all')
+    stopwatch.lap('date_coercion', rows=len(relevant_df))
+    
+    # Show final data
+    # ui.success(f"Successfully extracted {len(relevant_df)} courses.")
+    # Hand back plain column arrays; the DataFrame is only needed for the steps above
+    return CourseTable.from_frame(relevant_df), state['end_row']
+
+def fill_term_dates(relevant_df, ui):
+    # Fill missing start/end dates from the academic calendar: the term in the
+    # row's Academic Period, else the term most of the block's dated courses fall
+    # in, else the current or next one. With none of those (the calendar has run
+    # out of terms) the dates stay missing rather than taking a past term's.
+    known = default_calendar.term_of(relevant_df['Start Date'].dropna().to_numpy())
+    known = pd.Series(known, dtype=object).dropna()
+    default = known.mode().iloc[0] if not known.empty else default_calendar.current_term()
+    terms = pd.Series(default, index=relevant_df.index, dtype=object)
+    if 'Term' in relevant_df:
+        named = relevant_df['Term'].map(lambda term: default_calendar.term_dates(term) is not None)
+        terms[named] = relevant_df.loc[named, 'Term']
+    missing = relevant_df['Start Date'].isna() | relevant_df['End Date'].isna()
+    if (missing & terms.isna()).any():
+        ui.warning("Some date fields are missing and the academic calendar has no current or upcoming "
+                   "term to take them from.")
+    for term in terms[missing & terms.notna()].unique():
+        ui.warning(f"Some date fields are missing. Using the dates of the {term}.")
+    terms = terms.dropna()
+    spans = {term: default_calendar.term_dates(term) for term in terms.unique()}
+    relevant_df['Start Date'] = relevant_df['Start Date'].fillna(
+        terms.map(lambda term: pd.Timestamp(spans[term][0])))
+    relevant_df['End Date'] = relevant_df['End Date'].fillna(
+        terms.map(lambda term: pd.Timestamp(spans[term][1])))
+
+def banner_text(row):
+    return ' '.join(value for value in row if isinstance(value, str))
+
+def sheet_courses(sheet, limits, ui, stopwatch, max_blocks=None):
+    # The term-tagged CourseTable of each enrolled block on one worksheet (None
+    # for a block that had no rows), the rows scanned and the widest row
+    rows = capped_rows(sheet.iter_rows(values_only=True), limits)
+    blocks, rows_seen, width = extract_blocks(rows, sheet.max_column or 0, ui, stopwatch, max_blocks)
+    tables = [None if courses is None else tag_terms(courses, banner_text(banner), sheet.title)
+              for banner, courses in blocks]
+    return tables, rows_seen, width
+
+def read_sheet(source, index, limits, max_blocks=None):
+    # Worker entry point: sheet_courses for one sheet of an .xlsx passed as bytes,
+    # plus the messages it reported
+    from result_cache import MessageLog
+    log = MessageLog()
+    workbook = load_workbook(io.BytesIO(source), read_only=True, data_only=True)
+    try:
+        tables, rows_seen, width = sheet_courses(workbook.worksheets[index], limits, log, Stopwatch('process_excel'),
+                                                  max_blocks)
+    finally:
+        workbook.close()
+    return tables, rows_seen, width, log
+
+def file_bytes(file):
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return f.read()
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+def merge_blocks(tables):
+    # One table for the whole workbook. A course listed in several blocks (the
+    # same class on two students' sheets) is kept once, so its events aren't doubled.
+    # Row numbers restart on every sheet, so the merged table is numbered afresh.
+    courses = CourseTable.concat(tables)
+    seen = set()
+    keep = []
+    for position, key in enumerate(zip(courses.section, map(str, courses.pattern),
+                                       courses.start_date, courses.end_date)):
+        if key not in seen:
+            seen.add(key)
+            keep.append(position)
+    if len(keep) < len(courses):
+        courses = courses.take(np.asarray(keep, dtype='int64'))
+    courses.row = np.arange(len(courses), dtype='int64')
+    return courses
+
+def process_excel(file, ui=None, limits=None, workers=1, executor=None):
+    # limits overrides preflight.DEFAULT_LIMITS (upload size, rows, columns, ...).
+    # Reads every "Enrolled Courses" block on every sheet into one term-tagged
+    # table (split it with CourseTable.by_term). A workbook with several sheets
+    # is read by worker processes when workers > 1 or an executor is passed;
+    # pass a shared executor to avoid starting processes for every file.
+    ui = ui or LogReporter()
+    workbook = None
+    own_executor = False
+    stopwatch = Stopwatch('process_excel')
+    try:
+        # Reject oversized, malformed or non-Workday files from the zip directory
+        # and the first rows, before openpyxl inflates anything
+        if not preflight_xlsx(file, ui, limits):
+            return None
+        stopwatch.lap('preflight')
+
+        # Stream the sheets row by row in read-only mode instead of building
+        # a DataFrame of the whole export just to throw most of it away
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        stopwatch.lap('read_excel')
+        # Most exports are one block followed by the dropped/waitlisted sections and
+        # other sheets that never mention the banner. Counting banners in the sheet
+        # XML lets the parse skip those sheets and stop after a sheet's last block;
+        # when nothing is counted, every sheet is read for the error report.
+        counts = banner_counts(file, limits) or {}
+        sheets = [(index, sheet, counts.get(sheet.title)) for index, sheet in enumerate(workbook.worksheets)]
+        sheets = [(index, sheet, count) for index, sheet, count in sheets if count != 0]
+        if not sheets:
+            sheets = [(index, sheet, None) for index, sheet in enumerate(workbook.worksheets)]
+        stopwatch.lap('banner_count')
+        if len(sheets) > 1 and (executor is not None or workers > 1):
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=min(workers, len(sheets)))
+                own_executor = True
+            source = file_bytes(file)
+            futures = [executor.submit(read_sheet, source, index, limits, count) for index, _, count in sheets]
+            results = []
+            # Messages are replayed in sheet order, as the sequential read reports them
+            for future in futures:
+                tables, rows_seen, width, log = future.result()
+                log.replay(ui)
+                results.append((tables, rows_seen, width))
+            stopwatch.lap('sheets', rows=len(sheets))
+        else:
+            results = [sheet_courses(sheet, limits, ui, stopwatch, count) for _, sheet, count in sheets]
+
+        blocks = [table for tables, _, _ in results for table in tables]
+        if not blocks:
+            _, rows_seen, width = results[0] if results else ((), 0, 0)
+            report_missing_banner(ui, rows_seen, width)
+            return None
+        # A block without rows has already been reported
+        tables = [table for table in blocks if table is not None]
+        if not tables:
+            return None
+        return tables[0] if len(tables) == 1 else merge_blocks(tables)
+
+    except Exception as e:
+        ui.error(f"Error processing Excel file: {str(e)}")
+        ui.info("Make sure you're uploading the Excel file from 'View My Courses' in Workday.")
+        return None
+    finally:
+        # Read-only workbooks keep the underlying file open until closed
+        if workbook is not None:
+            workbook.close()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+# One line of a "Meeting Patterns" cell: "MWF | 8:30 AM - 9:40 AM | Hulings Hall 120"
+PATTERN_RE = re.compile(r'^(?P<day_code>.*?) \| (?P<time_range>.*?) \| (?P<location>.*)$')
+TIME_RANGE_RE = re.compile(r'^(?P<start_time>.*?) - (?P<end_time>.*)$')
+# Any run of day letters, e.g. M, TTH, MWF, MTWTHF (TH must be tried before T)
+DAY_CODE_RE = re.compile(r'^(?:TH|M|T|W|F)+$')
+DAY_TOKEN_RE = re.compile(r'TH|M|T|W|F')
+
+# Day tokens to RRULE BYDAY codes
+DAY_TO_RRULE = {
+    'M': 'MO',
+    'T': 'TU',
+    'W': 'WE',
+    'TH': 'TH',
+    'F': 'FR'
+}
+
+UID_DOMAIN = 'carleton-calendar-converter'
+
+def tokenize_day_code(day_code):
+    # "MTWTHF" -> ('MO', 'TU', 'WE', 'TH', 'FR'); empty tuple for anything unrecognized
+    code = day_code.strip().upper()
+    if not DAY_CODE_RE.match(code):
+        return ()
+    return tuple(dict.fromkeys(DAY_TO_RRULE[token] for token in DAY_TOKEN_RE.findall(code)))
+
+def meeting_uid(section, days, start_time, end_time, start_date, end_date, term=None):
+    # Same course meeting in the same term -> same UID on every run, so calendar
+    # clients update events on re-import instead of duplicating them. Keyed by the
+    # term's name, so a term date the registrar moves keeps the UID; by the dates
+    # only when the academic calendar has no term for them.
+    key = '|'.join([
+        str(section).strip(),
+        ','.join(days),
+        f"{start_time:%H%M}-{end_time:%H%M}",
+        term if term is not None else f"{start_date:%Y%m%d}-{end_date:%Y%m%d}",
+    ])
+    return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]}@{UID_DOMAIN}"
+
+def clean_location(location_str):
+    return location_str.strip().replace('\n', ', ')
+
+# Tables with fewer courses than this are parsed a line at a time in plain
+# Python; the pandas pipeline costs several milliseconds per call before the
+# first line, which is most of a single student's upload
+SMALL_TABLE_COURSES = 150
+
+def clock_minutes(text):
+    # "8:30 AM" -> 510, the way pd.to_datetime(format='%I:%M %p') reads it; None if unreadable
+    try:
+        value = datetime.strptime(text.strip(), '%I:%M %p')
+    except ValueError:
+        return None
+    return value.hour * 60 + value.minute
+
+def parse_meeting_patterns(courses, ui=None, calendar=None):
+    # Explode every "Meeting Patterns" cell into one meeting per line in a single
+    # pass. Takes the CourseTable from process_excel (or the same columns as a
+    # DataFrame) and returns a MeetingTable, with the breaks and holidays of the
+    # academic calendar (default_calendar unless given) each meeting skips.
+    ui = ui or LogReporter()
+    calendar = calendar or default_calendar
+    if isinstance(courses, pd.DataFrame):
+        courses = CourseTable.from_frame(courses)
+    if len(courses) < SMALL_TABLE_COURSES:
+        table = parse_meeting_lines(courses, ui)
+    else:
+        table = parse_meeting_frame(courses, ui)
+    if table is None:
+        return MeetingTable.empty_table()
+    # A meeting without both dates has no weekly rule to give (nor a UID)
+    undated = np.isnat(table.start_date) | np.isnat(table.end_date)
+    if undated.any():
+        for pattern in table.pattern[undated]:
+            ui.warning(f"Could not add event for pattern '{pattern}': the course has no start or end date")
+        table = table.take(np.flatnonzero(~undated))
+    assign_uids(table, calendar)
+    table.exdates = calendar.exdates(table)
+    return table
+
+def parse_meeting_lines(courses, ui):
+    # parse_meeting_frame for a small table, one line at a time: the same
+    # meetings, and the same warnings in the same order. None without any lines.
+    unusual, bad_ranges, bad_times = [], [], []
+    day_warnings = {}
+    day_tokens = {}
+    seen = set()
+    meetings = []
+    has_lines = False
+    for position, pattern in enumerate(courses.pattern):
+        if not isinstance(pattern, str):
+            continue
+        for line in pattern.split('\n'):
+            # Skip empty patterns
+            if line.strip() == '':
+                continue
+            has_lines = True
+            match = PATTERN_RE.search(line)
+            if match is None:
+                unusual.append(line)
+                continue
+            day_code, time_range, location = match.group('day_code', 'time_range', 'location')
+            times = TIME_RANGE_RE.search(time_range)
+            if times is None:
+                bad_ranges.append(time_range)
+                continue
+            # Skip patterns already seen for the same course
+            key = (position, day_code, time_range)
+            if key in seen:
+                continue
+            seen.add(key)
+            if day_code not in day_tokens:
+                day_tokens[day_code] = tokenize_day_code(day_code)
+            days = day_tokens[day_code]
+            if not days:
+                day_warnings.setdefault(day_code, None)
+                continue
+            meetings.append((position, line, days, location, times['start_time'], times['end_time']))
+    if not has_lines:
+        return None
+
+    for pattern in unusual:
+        ui.warning(f"Unusual meeting pattern format: '{pattern}' - attempting to parse")
+    for time_range in bad_ranges:
+        ui.warning(f"Invalid time range format: '{time_range}'")
+    for day_code in day_warnings:
+        ui.warning(f"Unrecognized day code: '{day_code.strip()}'")
+
+    kept = []
+    for meeting in meetings:
+        start_minute = clock_minutes(meeting[4])
+        end_minute = clock_minutes(meeting[5])
+        if start_minute is None or end_minute is None:
+            bad_times.append(meeting[1])
+        else:
+            kept.append(meeting[:4] + (start_minute, end_minute))
+    for pattern in bad_times:
+        ui.warning(f"Could not add event for pattern '{pattern}': unrecognized time")
+
+    positions = np.array([meeting[0] for meeting in kept], dtype='int64')
+    return MeetingTable(
+        courses.section[positions],
+        object_array(meeting[2] for meeting in kept),
+        [meeting[4] for meeting in kept],
+        [meeting[5] for meeting in kept],
+        [clean_location(meeting[3]) for meeting in kept],
+        courses.start_date[positions],
+        courses.end_date[positions],
+        [meeting[1] for meeting in kept],
+    )
+
+def parse_meeting_frame(courses, ui):
+    # All lines of all patterns at once with pandas string methods, for large
+    # tables; None without any lines
+    patterns = pd.Series(courses.pattern, dtype=object)
+    patterns = patterns[patterns.map(lambda value: isinstance(value, str))]
+    if patterns.empty:
+        return None
+    lines = patterns.str.split('\n').explode()
+    # Skip empty patterns
+    lines = lines[lines.str.strip() != '']
+    if lines.empty:
+        return None
+
+    parts = lines.str.extract(PATTERN_RE)
+    for pattern in lines[parts['day_code'].isna()]:
+        ui.warning(f"Unusual meeting pattern format: '{pattern}' - attempting to parse")
+    times = parts['time_range'].str.extract(TIME_RANGE_RE)
+    for time_range in parts['time_range'][parts['time_range'].notna() & times['start_time'].isna()]:
+        ui.warning(f"Invalid time range format: '{time_range}'")
+
+    meetings = pd.concat([lines.rename('pattern'), parts, times], axis=1)
+    meetings = meetings.dropna(subset=['start_time'])
+
+    # Skip patterns already seen for the same course
+    meetings['row'] = meetings.index
+    meetings = meetings.drop_duplicates(subset=['row', 'day_code', 'time_range'])
+
+    # Tokenize each distinct day code once
+    day_codes = meetings['day_code'].unique()
+    meetings['days'] = meetings['day_code'].map(dict(zip(day_codes, map(tokenize_day_code, day_codes))))
+    for day_code in meetings.loc[meetings['days'].map(len) == 0, 'day_code'].unique():
+        ui.warning(f"Unrecognized day code: '{day_code.strip()}'")
+    meetings = meetings[meetings['days'].map(len) > 0]
+
+    start_times = pd.to_datetime(meetings['start_time'].str.strip(), format='%I:%M %p', errors='coerce')
+    end_times = pd.to_datetime(meetings['end_time'].str.strip(), format='%I:%M %p', errors='coerce')
+    bad_times = start_times.isna() | end_times.isna()
+    for pattern in meetings.loc[bad_times, 'pattern']:
+        ui.warning(f"Could not add event for pattern '{pattern}': unrecognized time")
+    meetings = meetings[~bad_times]
+    start_times = start_times[~bad_times]
+    end_times = end_times[~bad_times]
+
+    # Position of each meeting's course in the course table
+    positions = meetings.index.to_numpy()
+    return MeetingTable(
+        courses.section[positions],
+        object_array(meetings['days'].to_numpy()),
+        (start_times.dt.hour * 60 + start_times.dt.minute).to_numpy(),
+        (end_times.dt.hour * 60 + end_times.dt.minute).to_numpy(),
+        meetings['location'].map(clean_location).to_numpy(dtype=object),
+        courses.start_date[positions],
+        courses.end_date[positions],
+        meetings['pattern'].to_numpy(dtype=object),
+    )
+
+def assign_uids(table, calendar=None):
+    # The term of each meeting is the one its start date falls in, else its end date
+    calendar = calendar or default_calendar
+    terms = calendar.term_of(table.start_date)
+    unknown = np.array([term is None for term in terms], dtype=bool)
+    terms[unknown] = calendar.term_of(table.end_date[unknown])
+    uids = []
+    repeats = {}
+    for m, term in zip(table.records(), terms):
+        uid = meeting_uid(m.section, m.days, m.start_time, m.end_time, m.start_date, m.end_date, term)
+        # Identical meetings listed twice still need distinct UIDs
+        repeat = repeats.get(uid, 0)
+        repeats[uid] = repeat + 1
+        if repeat:
+            uid = f"{uid.split('@')[0]}-{repeat + 1}@{UID_DOMAIN}"
+        uids.append(uid)
+    table.uid = np.array(uids, dtype=object)
+
+def make_event(meeting, first_start_datetime, first_end_datetime, stamp=None):
+    ics_event = Event()
+    ics_event.add('summary', meeting.section)
+    ics_event.add('location', meeting.location)
+    ics_event.add('dtstart', first_start_datetime)
+    ics_event.add('dtend', first_end_datetime)
+    if stamp is not None:
+        ics_event.add('dtstamp', stamp)
+    ics_event.add('uid', meeting.uid)
+    
+    # Set recurrence rule
+    recur_rule = vRecur()
+    recur_rule['FREQ'] = 'WEEKLY'
+    recur_rule['UNTIL'] = datetime.combine(meeting.end_date, UNTIL_TIME)
+    recur_rule['BYDAY'] = list(meeting.days)
+    ics_event.add('rrule', recur_rule)
+    if meeting.exdates:
+        # Same time of day as DTSTART, as RFC 5545 requires
+        ics_event.add('exdate', [datetime.combine(day, first_start_datetime.time()) for day in meeting.exdates])
+    return ics_event
+
+def build_calendar(meetings, first_dates, ui, stamp=None):
+    # stamp is every event's DTSTAMP, the time of the export (now unless given)
+    cal = Calendar()
+    stamp = (stamp or datetime.now(timezone.utc)).astimezone(timezone.utc).replace(microsecond=0)
+
+    def add_recurring_event(meeting, first_start_datetime, first_end_datetime):
+        cal.add_component(make_event(meeting, first_start_datetime, first_end_datetime, stamp))
+
+    # One pass over the flat meeting table
+    for meeting, first_date in zip(meetings.records(), first_dates):
+        if not np.isnat(first_date):
+            try:
+                first_date = first_date.astype(object)
+                start_datetime = datetime.combine(first_date, meeting.start_time)
+                end_datetime = datetime.combine(first_date, meeting.end_time)
+                add_recurring_event(meeting, start_datetime, end_datetime)
+            except Exception as e:
+                ui.warning(f"Could not add event for pattern '{meeting.pattern}': {e}")
+
+    return cal
+
+def create_ics_file(events, ui=None, backend='icalendar', by_term=False, calendar=None, stamp=None):
+    # backend='stream' writes the text directly with ics_writer instead of
+    # building icalendar objects; both produce the same calendar.
+    # by_term=True returns {term: ics bytes}, one calendar per term of the table.
+    # calendar is the academic_calendar.AcademicCalendar whose breaks and holidays
+    # become EXDATEs (default_calendar unless given). stamp is the DTSTAMP of
+    # every event, now unless given.
+    ui = ui or LogReporter()
+    stamp = stamp or datetime.now(timezone.utc)
+    if by_term:
+        if isinstance(events, pd.DataFrame):
+            events = CourseTable.from_frame(events)
+        return {term: create_ics_file(courses, ui, backend, calendar=calendar, stamp=stamp)
+                for term, courses in events.by_term().items()}
+    stopwatch = Stopwatch('create_ics_file')
+    meetings = parse_meeting_patterns(events, ui, calendar)
+    stopwatch.lap('pattern_parsing', rows=len(meetings))
+    # First matching weekday of each meeting, computed in closed form for the whole table
+    first_dates = first_occurrence_dates(meetings)
+
+    # Serialize in memory so concurrent sessions never share a file on disk
+    try:
+        if backend == 'stream':
+            stopwatch.lap('event_building', rows=len(meetings))
+            ics_bytes = b''.join(iter_ics(meetings, first_dates, stamp))
+        else:
+            cal = build_calendar(meetings, first_dates, ui, stamp)
+            stopwatch.lap('event_building', rows=len(meetings))
+            ics_bytes = cal.to_ical()
+        stopwatch.lap('to_ical', rows=len(meetings))
+        ui.success("Calendar file created successfully!")
+        return ics_bytes
+    except Exception as e:
+        ui.error(f"Failed to create ICS file: {e}")
+        return None
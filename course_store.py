@@ -0,0 +1,172 @@
+# On-disk store of parsed course tables, so batch jobs can skip Excel/PDF parsing.
+#
+# Each entry is keyed by the content hash of the original upload and saved as an
+# uncompressed Arrow IPC file, which is memory-mapped on reload. The original
+# upload is kept next to it so every entry can be re-parsed when PARSER_VERSION
+# changes (see rebuild()).
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+
+import pyarrow as pa
+
+from converter import PARSER_VERSION, LogReporter, process_excel
+from records import CourseTable
+from result_cache import upload_key
+
+SCHEMA_VERSION = 2
+
+COURSE_SCHEMA = pa.schema([
+    ('Section', pa.string()),
+    ('Meeting Patterns', pa.string()),
+    ('Start Date', pa.timestamp('ns')),
+    ('End Date', pa.timestamp('ns')),
+    ('row', pa.int64()),
+    ('Term', pa.string()),
+])
+
+
+def parse_source(data, suffix, ui=None):
+    if suffix == '.pdf':
+        from pdf_ingest import process_pdf
+        return process_pdf(data, ui=ui, workers=1)
+    return process_excel(io.BytesIO(data), ui=ui)
+
+
+class CourseStore:
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _table_path(self, key):
+        return os.path.join(self.root, f'{key}.arrow')
+
+    def _source_path(self, key, suffix):
+        return os.path.join(self.root, f'{key}.source{suffix}')
+
+    def keys(self):
+        return sorted(os.path.basename(p)[:-len('.arrow')] for p in glob.glob(os.path.join(self.root, '*.arrow')))
+
+    def metadata(self, key):
+        path = self._table_path(key)
+        if not os.path.exists(path):
+            return None
+        with pa.memory_map(path, 'r') as source:
+            raw = pa.ipc.open_file(source).schema.metadata or {}
+        return {k.decode(): json.loads(v) for k, v in raw.items()}
+
+    def stamp(self, key):
+        # Changes whenever the entry's table is written again; None when missing
+        try:
+            stat = os.stat(self._table_path(key))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def is_current(self, key):
+        meta = self.metadata(key)
+        return (meta is not None
+                and meta.get('schema_version') == SCHEMA_VERSION
+                and meta.get('parser_version') == PARSER_VERSION)
+
+    def get_table(self, key):
+        # The Arrow table, memory-mapped; None when missing or written by an older parser
+        if not self.is_current(key):
+            return None
+        with pa.memory_map(self._table_path(key), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def get(self, key):
+        # The CourseTable as process_excel returns it
+        table = self.get_table(key)
+        if table is None:
+            return None
+        return CourseTable(
+            table.column('Section').to_numpy(zero_copy_only=False),
+            table.column('Meeting Patterns').to_numpy(zero_copy_only=False),
+            table.column('Start Date').to_numpy(),
+            table.column('End Date').to_numpy(),
+            table.column('row').to_numpy(),
+            table.column('Term').to_numpy(zero_copy_only=False),
+        )
+
+    def put(self, key, courses, source_bytes=None, suffix='.xlsx'):
+        if source_bytes is not None:
+            source_path = self._source_path(key, suffix)
+            if not os.path.exists(source_path):
+                self._write_atomic(source_path, source_bytes)
+        patterns = [None if pattern is None or pattern != pattern else pattern for pattern in courses.pattern]
+        table = pa.Table.from_arrays([
+            pa.array([str(section) for section in courses.section], pa.string()),
+            pa.array(patterns, pa.string()),
+            pa.array(courses.start_date, pa.timestamp('ns')),
+            pa.array(courses.end_date, pa.timestamp('ns')),
+            pa.array(courses.row, pa.int64()),
+            pa.array([None] * len(courses) if courses.term is None else list(courses.term), pa.string()),
+        ], schema=COURSE_SCHEMA)
+        table = table.replace_schema_metadata({
+            'schema_version': json.dumps(SCHEMA_VERSION),
+            'parser_version': json.dumps(PARSER_VERSION),
+            'source_suffix': json.dumps(suffix),
+        })
+        sink = io.BytesIO()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        self._write_atomic(self._table_path(key), sink.getvalue())
+
+    def load_or_parse(self, data, suffix='.xlsx', ui=None):
+        # (key, courses) for an upload, parsing it only when the store has no current entry
+        key = upload_key(data)
+        courses = self.get(key)
+        if courses is None:
+            courses = parse_source(data, suffix, ui)
+            if courses is not None and not courses.empty:
+                self.put(key, courses, data, suffix)
+        return key, courses
+
+    def rebuild(self, force=False, ui=None):
+        # Re-parse every entry written by another parser/schema version from its
+        # stored source; returns (rebuilt keys, keys that could not be rebuilt)
+        ui = ui or LogReporter()
+        rebuilt, failed = [], []
+        for key in self.keys():
+            if not force and self.is_current(key):
+                continue
+            sources = glob.glob(os.path.join(self.root, f'{key}.source*'))
+            courses = None
+            if sources:
+                suffix = sources[0][len(os.path.join(self.root, f'{key}.source')):]
+                with open(sources[0], 'rb') as f:
+                    courses = parse_source(f.read(), suffix, ui)
+            if courses is None or courses.empty:
+                failed.append(key)
+                continue
+            self.put(key, courses, suffix=suffix)
+            rebuilt.append(key)
+        return rebuilt, failed
+
+    def _write_atomic(self, path, data):
+        tmp = f'{path}.tmp{os.getpid()}'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain a store of parsed course tables.")
+    parser.add_argument('root', help="Store directory")
+    parser.add_argument('--force', action='store_true', help="Rebuild every entry, not just outdated ones")
+    args = parser.parse_args(argv)
+    rebuilt, failed = CourseStore(args.root).rebuild(force=args.force)
+    print(f"Rebuilt {len(rebuilt)} entries; {len(failed)} could not be rebuilt")
+    for key in failed:
+        print(f"FAILED {key}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
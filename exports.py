@@ -0,0 +1,187 @@
+# Every download format, written from one parse of the course table.
+#
+# export_schedule() parses the meeting patterns once and hands the same
+# MeetingTable and first-occurrence dates to each registered serializer. A
+# serializer yields byte chunks; register_format() adds a new one. write_bundle()
+# streams several formats into one ZIP.
+#
+#   ics   RFC 5545 calendar, the same bytes create_ics_file writes
+#   jcal  RFC 7265 JSON calendar, for web widgets
+#   csv   one row per class meeting, in the columns Outlook imports (none on breaks and holidays)
+#   json  one object per weekly meeting, for the advising portal
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+from converter import LogReporter, build_calendar, parse_meeting_patterns
+from ics_writer import UNTIL_TIME, iter_ics
+from instrumentation import Stopwatch
+from recurrence import expand_occurrences, first_occurrence_dates
+
+BASENAME = 'myCarletonSchedule'
+PRODID = '-//Carleton Calendar Converter//EN'
+
+# name -> {'extension', 'mime', 'label', 'write'}, in the order they are offered
+FORMATS = {}
+
+
+def register_format(name, extension, mime, label):
+    # Decorator for write(meetings, first_dates, stamp) -> iterable of bytes, where
+    # stamp is the UTC time of the export (the calendar formats' DTSTAMP)
+    def register(write):
+        FORMATS[name] = {'extension': extension, 'mime': mime, 'label': label, 'write': write}
+        return write
+    return register
+
+
+def first_dates_as_objects(first_dates):
+    # datetime64[D] -> datetime.date, None for meetings that never occur
+    return [None if np.isnat(day) else day.item() for day in first_dates]
+
+
+@register_format('ics', '.ics', 'text/calendar', 'Calendar (.ics)')
+def write_ics(meetings, first_dates, stamp):
+    return iter_ics(meetings, first_dates, stamp)
+
+
+def jcal_event(meeting, first_date, dtstamp):
+    start = datetime.combine(first_date, meeting.start_time)
+    end = datetime.combine(first_date, meeting.end_time)
+    properties = [
+        ['summary', {}, 'text', meeting.section],
+        ['dtstart', {}, 'date-time', start.isoformat()],
+        ['dtend', {}, 'date-time', end.isoformat()],
+        ['dtstamp', {}, 'date-time', dtstamp],
+        ['uid', {}, 'text', meeting.uid],
+        ['rrule', {}, 'recur', {'freq': 'WEEKLY', 'until': datetime.combine(meeting.end_date, UNTIL_TIME).isoformat(), 'byday': list(meeting.days)}],
+    ]
+    if meeting.exdates:
+        # A multi-valued property lists its values one after another (RFC 7265 section 3.4.2)
+        properties.append(['exdate', {}, 'date-time',
+                           *(datetime.combine(day, meeting.start_time).isoformat() for day in meeting.exdates)])
+    properties.append(['location', {}, 'text', meeting.location])
+    return ['vevent', properties, []]
+
+
+@register_format('jcal', '.jcal.json', 'application/calendar+json', 'jCal (.jcal.json)')
+def write_jcal(meetings, first_dates, stamp):
+    dtstamp = stamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    events = [
+        jcal_event(meeting, first_date, dtstamp)
+        for meeting, first_date in zip(meetings.records(), first_dates_as_objects(first_dates))
+        if first_date is not None
+    ]
+    calendar = ['vcalendar', [
+        ['version', {}, 'text', '2.0'],
+        ['prodid', {}, 'text', PRODID],
+    ], events]
+    yield json.dumps(calendar, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Outlook's calendar import matches these column names
+CSV_COLUMNS = ['Subject', 'Start Date', 'Start Time', 'End Date', 'End Time', 'All day event', 'Location', 'Description']
+
+
+def date_labels(values):
+    # mm/dd/yyyy for datetime64 values, formatting each distinct day only once
+    days, inverse = np.unique(values.astype('datetime64[D]'), return_inverse=True)
+    labels = np.array([f'{day:%m/%d/%Y}' for day in days.astype(object)], dtype=object)
+    return labels[inverse]
+
+
+@register_format('csv', '.csv', 'text/csv', 'Outlook (.csv)')
+def write_csv(meetings, first_dates, stamp):
+    # CSV imports have no recurrence, so every class meeting is its own row,
+    # expanded for the whole table at once. Dates and times are formatted per
+    # distinct day and per meeting, then spread over the occurrences.
+    occurrences = expand_occurrences(meetings)
+    meeting = occurrences['meeting'].to_numpy()
+    start_times = np.array([f'{value:%I:%M %p}' for value in meetings.start_times()], dtype=object)
+    end_times = np.array([f'{value:%I:%M %p}' for value in meetings.end_times()], dtype=object)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\r\n')
+    writer.writerow(CSV_COLUMNS)
+    writer.writerows(zip(
+        meetings.section[meeting],
+        date_labels(occurrences['start'].to_numpy()),
+        start_times[meeting],
+        date_labels(occurrences['end'].to_numpy()),
+        end_times[meeting],
+        ['False'] * len(meeting),
+        meetings.location[meeting],
+        meetings.pattern[meeting],
+    ))
+    # With a byte order mark Excel and Outlook read the file as UTF-8
+    yield buffer.getvalue().encode('utf-8-sig')
+
+
+@register_format('json', '.json', 'application/json', 'JSON')
+def write_json(meetings, first_dates, stamp):
+    first = first_dates_as_objects(first_dates)
+    records = [
+        {
+            'section': meeting.section,
+            'days': list(meeting.days),
+            'start_time': f'{meeting.start_time:%H:%M}',
+            'end_time': f'{meeting.end_time:%H:%M}',
+            'location': meeting.location,
+            'start_date': meeting.start_date.isoformat(),
+            'end_date': meeting.end_date.isoformat(),
+            'first_date': None if first_date is None else first_date.isoformat(),
+            'skipped_dates': [day.isoformat() for day in meeting.exdates],
+            'uid': meeting.uid,
+            'pattern': meeting.pattern,
+        }
+        for meeting, first_date in zip(meetings.records(), first)
+    ]
+    yield json.dumps({'meetings': records}, ensure_ascii=False, indent=1).encode('utf-8')
+
+
+def export_schedule(courses, ui=None, formats=None, ics_backend='stream', calendar=None, stamp=None):
+    # (MeetingTable, {format: bytes}) for a CourseTable. The patterns are parsed
+    # once whatever the number of formats; a format that fails is reported and left out.
+    # ics_backend='icalendar' builds the .ics with icalendar objects, as create_ics_file does;
+    # calendar is the academic calendar whose breaks and holidays are skipped;
+    # stamp is the time of the export, now unless given.
+    ui = ui or LogReporter()
+    stamp = stamp or datetime.now(timezone.utc)
+    formats = list(FORMATS) if formats is None else formats
+    stopwatch = Stopwatch('export_schedule')
+    meetings = parse_meeting_patterns(courses, ui, calendar)
+    first_dates = first_occurrence_dates(meetings)
+    stopwatch.lap('pattern_parsing', rows=len(meetings))
+
+    exports = {}
+    for name in formats:
+        spec = FORMATS[name]
+        try:
+            if name == 'ics' and ics_backend == 'icalendar':
+                exports[name] = build_calendar(meetings, first_dates, ui, stamp).to_ical()
+            else:
+                exports[name] = b''.join(spec['write'](meetings, first_dates, stamp))
+        except Exception as e:
+            ui.error(f"Failed to create the {spec['label']} file: {e}")
+        stopwatch.lap(name, rows=len(meetings))
+    if 'ics' in exports:
+        ui.success("Calendar file created successfully!")
+    return meetings, exports
+
+
+def file_name(name, basename=BASENAME):
+    return basename + FORMATS[name]['extension']
+
+
+def write_bundle(exports, file, basename=BASENAME):
+    # Writes the exports into a ZIP on any writable file object, one member at a time
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in exports.items():
+            archive.writestr(file_name(name, basename), data)
+    return file
+
+
+def bundle_bytes(exports, basename=BASENAME):
+    return write_bundle(exports, io.BytesIO(), basename).getvalue()
@@ -0,0 +1,138 @@
+# Poll-storm benchmark for the /feeds endpoint of api.py, with and without the feed cache.
+#
+#   python feed_loadtest.py
+#   python feed_loadtest.py --feeds 200 --subscribers 2000 --polls 5000 --concurrency 64
+#
+# Fills a course store with generated schedules, starts api.py on it twice (with
+# the feed cache, then with --feed-cache-size 0 so every poll renders the
+# calendar again) and has subscribers poll their feed the way calendar apps do:
+# the first poll is plain, later ones send back the ETag they got. Half of the
+# subscribers accept gzip. Reports latency, the server's CPU time per poll, the
+# bytes sent per poll and how many times the server rendered a calendar.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from tornado.httpclient import AsyncHTTPClient
+
+from api_loadtest import fmt_ms, free_port, percentile, wait_until_up
+from workday_fixtures import workbook_bytes
+
+MODES = {'cached': 1024, 'uncached': 0}
+
+
+def fill_store(root, feeds, sections):
+    # Keys of `feeds` stored schedules
+    from course_store import CourseStore
+    from result_cache import MessageLog
+    store = CourseStore(root)
+    return [store.load_or_parse(workbook_bytes(sections=sections, seed=seed), ui=MessageLog())[0]
+            for seed in range(feeds)]
+
+
+def server_cpu_seconds(pid):
+    # utime + stime of another process, from /proc
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def poll_storm(base, keys, subscribers, polls, concurrency, seed):
+    rng = random.Random(seed)
+    # Each subscriber follows one feed and remembers the last ETag it was sent
+    followers = [{'key': rng.choice(keys), 'gzip': i % 2 == 0, 'etag': None} for i in range(subscribers)]
+    schedule = [rng.choice(followers) for _ in range(polls)]
+    client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+    sent = 0
+
+    async def poll(follower):
+        nonlocal sent
+        async with semaphore:
+            headers = {'Accept-Encoding': 'gzip' if follower['gzip'] else 'identity'}
+            if follower['etag']:
+                headers['If-None-Match'] = follower['etag']
+            started = time.perf_counter()
+            response = await client.fetch(f"{base}/feeds/{follower['key']}.ics", headers=headers, raise_error=False,
+                                          decompress_response=False, request_timeout=120)
+            elapsed = time.perf_counter() - started
+        statuses[response.code] = statuses.get(response.code, 0) + 1
+        if response.code not in (200, 304):
+            return
+        latencies.append(elapsed)
+        sent += len(response.body or b'')
+        follower['etag'] = response.headers.get('Etag', follower['etag'])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(poll(follower) for follower in schedule))
+    wall = time.perf_counter() - started
+    client.close()
+    return {
+        'polls': polls,
+        'statuses': statuses,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'throughput': len(latencies) / wall if wall else None,
+        'bytes_per_poll': sent / polls,
+    }
+
+
+async def run_mode(store_root, keys, cache_size, args):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    api_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api.py')
+    server = subprocess.Popen([
+        sys.executable, api_script, '--port', str(port), '--store', store_root,
+        '--feed-cache-size', str(cache_size),
+    ], stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_up(f'{base}/convert')
+        # Warm the converter's imports outside the timings
+        await AsyncHTTPClient().fetch(f'{base}/feeds/{keys[0]}.ics', request_timeout=120)
+        cpu_before = server_cpu_seconds(server.pid)
+        result = await poll_storm(base, keys, args.subscribers, args.polls, args.concurrency, args.seed)
+        result['server_cpu_ms_per_poll'] = (server_cpu_seconds(server.pid) - cpu_before) * 1000 / args.polls
+        health = await AsyncHTTPClient().fetch(f'{base}/healthz')
+        # Less the warm-up poll
+        result['renders'] = json.loads(health.body)['feeds']['renders'] - 1
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as store_root:
+        keys = fill_store(store_root, args.feeds, args.sections)
+        print(f"{len(keys)} feeds, {args.subscribers} subscribers, {args.polls} polls, concurrency {args.concurrency}")
+        print(f"{'mode':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'polls/s':>8} {'CPU ms/poll':>11} {'B/poll':>7} {'renders':>7}  statuses")
+        for mode in args.modes:
+            result = await run_mode(store_root, keys, MODES[mode], args)
+            print(f"{mode:>9} {fmt_ms(result['p50'])} {fmt_ms(result['p95'])} {fmt_ms(result['p99'])} "
+                  f"{result['throughput']:8.1f} {result['server_cpu_ms_per_poll']:11.2f} "
+                  f"{result['bytes_per_poll']:7.0f} {result['renders']:>7}  {result['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll-storm benchmark for the subscription feeds.")
+    parser.add_argument('--feeds', type=int, default=100, help="Stored schedules")
+    parser.add_argument('--subscribers', type=int, default=1000, help="Calendar apps polling them")
+    parser.add_argument('--polls', type=int, default=3000, help="Polls per mode")
+    parser.add_argument('--concurrency', type=int, default=32, help="Polls in flight at once")
+    parser.add_argument('--sections', type=int, default=12, help="Sections per generated schedule")
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(main_async(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
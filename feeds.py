@@ -0,0 +1,140 @@
+# Subscription feeds: each stored schedule's calendar at a stable URL.
+#
+# Calendar clients poll a subscribed feed every few minutes to hours, and nearly
+# every poll is for bytes they already have. FeedCache renders a feed once from
+# the course store, keeping the .ics, its gzip and a strong ETag for each, and
+# renders it again only when the entry's course table is rewritten (a re-upload
+# or course_store.rebuild()). A poll then costs a stat() and a dict lookup, and a
+# poll that sends back the ETag gets a 304 with no body.
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+CALENDAR_NAME = 'Carleton Schedule'
+# How often clients should poll: REFRESH-INTERVAL is RFC 7986, Outlook reads X-PUBLISHED-TTL
+REFRESH_INTERVAL = 'PT6H'
+FEED_PROPERTIES = (
+    f'X-WR-CALNAME:{CALENDAR_NAME}\r\n'
+    f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}\r\n'
+    f'X-PUBLISHED-TTL:{REFRESH_INTERVAL}\r\n'
+).encode('ascii')
+
+
+def feed_path(key):
+    return f'/feeds/{key}.ics'
+
+
+def feed_bytes(courses, ui=None, stamp=None):
+    # The download's calendar plus the feed's name and polling interval
+    from converter import create_ics_file
+    ics_bytes = create_ics_file(courses, ui=ui, backend='stream', stamp=stamp)
+    if ics_bytes is None:
+        return None
+    return ics_bytes.replace(b'BEGIN:VCALENDAR\r\n', b'BEGIN:VCALENDAR\r\n' + FEED_PROPERTIES, 1)
+
+
+def strong_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class Feed:
+    # One rendered feed; `stamp` is the store stamp of the table it came from
+    __slots__ = ('key', 'stamp', 'body', 'etag', 'gzipped', 'gzip_etag', 'rendered_at')
+
+    def __init__(self, key, stamp, body):
+        self.key = key
+        self.stamp = stamp
+        self.body = body
+        self.etag = strong_etag(body)
+        # mtime=0 keeps the gzip, and so its ETag, the same on every render
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        # A strong ETag names one representation, so the gzip gets its own
+        self.gzip_etag = self.etag[:-1] + '-gzip"'
+        self.rendered_at = time.time()
+
+    def representation(self, gzip_ok):
+        # (body, etag, content encoding or None)
+        if gzip_ok:
+            return self.gzipped, self.gzip_etag, 'gzip'
+        return self.body, self.etag, None
+
+
+class FeedCache:
+    # Bounded LRU of key -> Feed over a CourseStore; max_entries=0 keeps nothing,
+    # so every poll renders the calendar again
+
+    def __init__(self, store, max_entries=1024):
+        self.store = store
+        self.max_entries = max_entries
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+        # Renders one feed at a time, so a poll storm after a change renders it once
+        self._render_lock = threading.Lock()
+
+    def lookup(self, key):
+        # (feed or None, stamp); the feed is None when it has to be rendered and
+        # the stamp is None when the store has no such schedule
+        stamp = self.store.stamp(key)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if stamp is None or feed is None or feed.stamp != stamp:
+                return None, stamp
+            self._feeds.move_to_end(key)
+            self.hits += 1
+            return feed, stamp
+
+    def render(self, key, ui=None):
+        # Feed for the stored table, or None when it has no calendar to give
+        with self._render_lock:
+            # Another poll may have rendered it while this one waited
+            feed, stamp = self.lookup(key)
+            if feed is not None or stamp is None:
+                return feed
+            courses = self.store.get(key)
+            if courses is None or courses.empty:
+                return None
+            # DTSTAMP is when the table was written, so rendering it again (after an
+            # eviction or a restart) gives the same bytes and ETag
+            written = datetime.fromtimestamp(stamp[0] / 1e9, timezone.utc)
+            body = feed_bytes(courses, ui=ui, stamp=written)
+            if body is None:
+                return None
+            feed = Feed(key, stamp, body)
+            with self._lock:
+                self.renders += 1
+                self._feeds[key] = feed
+                self._feeds.move_to_end(key)
+                while len(self._feeds) > self.max_entries:
+                    self._feeds.popitem(last=False)
+                    self.evictions += 1
+            return feed
+
+    def get(self, key):
+        feed, stamp = self.lookup(key)
+        if feed is None and stamp is not None:
+            feed = self.render(key)
+        return feed
+
+    def clear(self):
+        with self._lock:
+            self._feeds.clear()
+
+    def __len__(self):
+        return len(self._feeds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'feeds': len(self._feeds),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'renders': self.renders,
+                'evictions': self.evictions,
+                'bytes': sum(len(feed.body) + len(feed.gzipped) for feed in self._feeds.values()),
+            }
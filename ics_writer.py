@@ -0,0 +1,100 @@
+# Streaming RFC 5545 serializer for the meeting table from converter.parse_meeting_patterns.
+# Writes the same VEVENTs as the icalendar backend in create_ics_file, but as
+# UTF-8 byte chunks straight from the table, without building Event/vRecur
+# objects or holding the whole document in memory.
+import numpy as np
+from datetime import datetime, time, timezone
+
+CRLF = b'\r\n'
+FOLD = b'\r\n '
+# Content octets per physical line; a folded continuation adds one leading space
+LINE_OCTETS = 74
+# UNTIL is given as the last second of the end date: a bare DATE against a
+# DATE-TIME DTSTART is read as midnight by dateutil and some clients, dropping a
+# class on the last day. Floating like DTSTART, as RFC 5545 requires.
+UNTIL_TIME = time(23, 59, 59)
+
+
+def escape_text(value):
+    # TEXT escaping (RFC 5545 section 3.3.11); the backslash has to go first
+    return str(value).replace('\\', '\\\\') \
+                     .replace(';', '\\;') \
+                     .replace(',', '\\,') \
+                     .replace('\r\n', '\\n') \
+                     .replace('\n', '\\n')
+
+
+def fold_line(line):
+    # Encode and fold a content line so no physical line exceeds 75 octets,
+    # never splitting a multi-byte UTF-8 sequence
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_OCTETS:
+        return encoded
+    pieces = []
+    start = 0
+    while start < len(encoded):
+        end = min(start + LINE_OCTETS, len(encoded))
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        pieces.append(encoded[start:end])
+        start = end
+    return FOLD.join(pieces)
+
+
+def format_datetime(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def format_stamp(value):
+    # DTSTAMP is always in UTC
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def vevent(summary, location, start, end, until, days, uid, exdates=(), dtstamp=None):
+    # One VEVENT, properties in the same order icalendar writes them;
+    # dtstamp is the DTSTAMP value already formatted with format_stamp
+    lines = [
+        b'BEGIN:VEVENT',
+        fold_line(f'SUMMARY:{escape_text(summary)}'),
+        f'DTSTART:{format_datetime(start)}'.encode('ascii'),
+        f'DTEND:{format_datetime(end)}'.encode('ascii'),
+    ]
+    if dtstamp is not None:
+        lines.append(f'DTSTAMP:{dtstamp}'.encode('ascii'))
+    lines += [
+        fold_line(f'UID:{uid}'),
+        f"RRULE:FREQ=WEEKLY;UNTIL={format_datetime(datetime.combine(until, UNTIL_TIME))};BYDAY={','.join(days)}".encode('ascii'),
+    ]
+    if exdates:
+        # Each skipped day at the time of DTSTART
+        time_of_day = start.strftime('T%H%M%S')
+        lines.append(fold_line('EXDATE:' + ','.join(f'{day:%Y%m%d}{time_of_day}' for day in exdates)))
+    lines += [
+        fold_line(f'LOCATION:{escape_text(location)}'),
+        b'END:VEVENT',
+        b'',
+    ]
+    return CRLF.join(lines)
+
+
+def iter_ics(meetings, first_dates, stamp=None):
+    # Yields the calendar as byte chunks, one per VEVENT plus the wrapper lines.
+    # stamp is every event's DTSTAMP, the time of the export (now unless given).
+    dtstamp = format_stamp(stamp or datetime.now(timezone.utc))
+    yield b'BEGIN:VCALENDAR\r\n'
+    for meeting, first_date in zip(meetings.records(), first_dates):
+        if np.isnat(first_date):
+            continue
+        first_date = first_date.astype(object)
+        yield vevent(
+            meeting.section,
+            meeting.location,
+            datetime.combine(first_date, meeting.start_time),
+            datetime.combine(first_date, meeting.end_time),
+            meeting.end_date,
+            meeting.days,
+            meeting.uid,
+            meeting.exdates,
+            dtstamp,
+        )
+    yield b'END:VCALENDAR\r\n'
@@ -0,0 +1,183 @@
+# Lightweight per-stage timing for the conversion pipeline.
+#
+# process_excel and create_ics_file call Stopwatch.lap() at the end of each stage.
+# Every lap becomes a structured log record, is added to a process-wide aggregate
+# (rendered in Prometheus text format by render_prometheus / serve_metrics) and,
+# inside collect_spans(), is also kept for the per-upload breakdown.
+import contextvars
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_current_spans = contextvars.ContextVar('current_spans', default=None)
+
+
+def peak_rss_kb():
+    # Peak resident set size of this process so far (kilobytes on Linux); a
+    # lifetime high-water mark, so it only says something about the process
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def current_rss_kb():
+    # Resident set size right now, from /proc (Linux); None elsewhere
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StageMetrics:
+    # Running totals per (pipeline, stage), shared by every thread in the process
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add(self, span):
+        key = (span['pipeline'], span['stage'])
+        with self._lock:
+            stats = self._stages.setdefault(key, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0})
+            stats['count'] += 1
+            stats['seconds'] += span['seconds']
+            stats['max_seconds'] = max(stats['max_seconds'], span['seconds'])
+            stats['rows'] += span['rows'] or 0
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+metrics = StageMetrics()
+
+
+def record_span(pipeline, stage, seconds, rows=None, rss_before_kb=None):
+    # rss_kb is the resident size when the stage ended and rss_growth_kb how much
+    # it grew during the stage (negative when memory was given back). RSS is per
+    # process, so stages running at the same time on other threads count too.
+    rss = current_rss_kb()
+    span = {
+        'pipeline': pipeline,
+        'stage': stage,
+        'seconds': seconds,
+        'rows': rows,
+        'rss_kb': rss,
+        'rss_growth_kb': None if rss is None or rss_before_kb is None else rss - rss_before_kb,
+    }
+    # Only measured when someone has started tracemalloc; it is too slow to leave on
+    if tracemalloc.is_tracing():
+        span['peak_traced_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.reset_peak()
+
+    metrics.add(span)
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.append(span)
+    logger.info(
+        "stage=%s.%s seconds=%.6f rows=%s rss_kb=%s rss_growth_kb=%s",
+        pipeline, stage, seconds, rows, rss, span['rss_growth_kb'],
+        extra={'span': span},
+    )
+    return span
+
+
+class Stopwatch:
+    # Times consecutive stages: each lap() covers the time since the previous one
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self._last = time.perf_counter()
+        self._last_rss = current_rss_kb()
+
+    def lap(self, stage, rows=None):
+        now = time.perf_counter()
+        span = record_span(self.pipeline, stage, now - self._last, rows, self._last_rss)
+        self._last = now
+        self._last_rss = span['rss_kb']
+        return span
+
+
+@contextmanager
+def collect_spans():
+    # Collect the spans recorded by this thread, e.g. for one upload
+    spans = []
+    token = _current_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_spans.reset(token)
+
+
+def render_prometheus(stage_metrics=metrics):
+    snapshot = stage_metrics.snapshot()
+    lines = []
+    series = [
+        ('calendar_stage_calls_total', 'counter', 'Number of times the stage ran', 'count'),
+        ('calendar_stage_seconds_total', 'counter', 'Total time spent in the stage', 'seconds'),
+        ('calendar_stage_seconds_max', 'gauge', 'Slowest single run of the stage', 'max_seconds'),
+        ('calendar_stage_rows_total', 'counter', 'Rows handled by the stage', 'rows'),
+    ]
+    for name, kind, help_text, field in series:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (pipeline, stage), stats in sorted(snapshot.items()):
+            lines.append(f'{name}{{pipeline="{pipeline}",stage="{stage}"}} {stats[field]}')
+    # Sheet layout cache; a jump in misses means a new export format. Imported
+    # here so the app's cold start doesn't pay for NumPy (layout_cache needs it)
+    from layout_cache import layouts
+    layout_stats = layouts.stats(top=0)
+    lines.append("# HELP calendar_layout_lookups_total Sheet layout lookups by result")
+    lines.append("# TYPE calendar_layout_lookups_total counter")
+    lines.append(f'calendar_layout_lookups_total{{result="hit"}} {layout_stats["hits"]}')
+    lines.append(f'calendar_layout_lookups_total{{result="miss"}} {layout_stats["misses"]}')
+    lines.append(f'calendar_layout_lookups_total{{result="uncached"}} {layout_stats["uncached"]}')
+    lines.append("# HELP calendar_layouts_cached Distinct sheet layouts in the cache")
+    lines.append("# TYPE calendar_layouts_cached gauge")
+    lines.append(f"calendar_layouts_cached {layout_stats['layouts']}")
+    rss = peak_rss_kb()
+    if rss is not None:
+        lines.append("# HELP calendar_peak_rss_kilobytes Peak resident set size of the process")
+        lines.append("# TYPE calendar_peak_rss_kilobytes gauge")
+        lines.append(f"calendar_peak_rss_kilobytes {rss}")
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    # Expose /metrics for Prometheus on a background thread; returns the server
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return server
@@ -0,0 +1,102 @@
+# Bounded, first-come-first-served job queue shared by every Streamlit session.
+#
+# At most `workers` conversions run at once and up to `queue_size` more wait in
+# arrival order; past that, submit() raises QueueFull so the app can ask the
+# student to retry instead of slowing every session down. Jobs are keyed by the
+# upload hash, so a rerun (or a second tab) with the same file joins the job
+# that is already queued instead of converting it twice.
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        # (message, fraction done); set from the worker thread
+        self.progress = ("Waiting in line", 0.0)
+
+    def report(self, message, fraction):
+        self.progress = (message, fraction)
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout):
+        # True once the job has finished
+        done, _ = wait_for([self.future], timeout=timeout)
+        return bool(done)
+
+    def result(self):
+        return self.future.result()
+
+
+class JobQueue:
+
+    def __init__(self, workers=2, queue_size=8):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='conversion')
+        self.rejected = 0
+        self.completed = 0
+        # Unfinished jobs by key, oldest first; the first `workers` of them are running
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        # fn(job, *args) runs on a worker and can call job.report(message, fraction)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            if len(self._jobs) >= self.capacity:
+                self.rejected += 1
+                raise QueueFull(f"{len(self._jobs)} conversions already queued")
+            job = Job(key)
+            self._jobs[key] = job
+            job.future = self.executor.submit(self._run, job, fn, args)
+            return job
+
+    def _run(self, job, fn, args):
+        job.started_at = time.monotonic()
+        job.report("Starting", 0.0)
+        try:
+            return fn(job, *args)
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._jobs.pop(job.key, None)
+                self.completed += 1
+
+    def position(self, job):
+        # 0 while the job is running (or done), otherwise its place in line
+        with self._lock:
+            if job.started_at is not None or job.key not in self._jobs:
+                return 0
+            waiting = [j for j in self._jobs.values() if j.started_at is None]
+        return waiting.index(job) + 1 if job in waiting else 0
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.started_at is not None)
+            return {
+                'running': running,
+                'waiting': len(self._jobs) - running,
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
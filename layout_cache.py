@@ -0,0 +1,160 @@
+# Cache of Workday sheet layouts, so repeat layouts skip header detection.
+#
+# A layout is fingerprinted by where its header row sits after the
+# "My Enrolled Courses" banner and by the header cells as read. Nearly every
+# export shares one of a handful of layouts, each mapped here to its column plan
+# (the positions of the section, meeting pattern, start and end date and
+# academic period columns).
+# Only a new layout's header is normalized and searched; a known one costs a
+# tuple hash, which is cheaper than the substring checks it replaces.
+# Sheets whose header row was not found are resolved without the cache: their
+# stand-in header is a data row, different on every upload, and would only push
+# real layouts out.
+# Hit rates and the layouts seen are exposed through stats(), /healthz and
+# /metrics, so a new Workday format shows up as a run of misses.
+#
+#   python layout_cache.py exports/*.xlsx
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PLAN_FIELDS = ('section', 'meeting_pattern', 'start_date', 'end_date', 'term')
+
+
+def normalize_header(header_row):
+    # Lower-cased, whitespace-collapsed header cells, without trailing blanks
+    cells = ['' if value is None else ' '.join(str(value).lower().split()) for value in header_row]
+    while cells and cells[-1] == '':
+        cells.pop()
+    return tuple(cells)
+
+
+def layout_fingerprint(header_offset, header_row):
+    # Workday writes a layout's header the same way every time, so the cells
+    # themselves are the key; they are str, numbers, dates or None
+    return header_offset, tuple(header_row)
+
+
+def resolve_columns(header):
+    # Column plan for a normalized header in one pass over all cells: a cell is
+    # the first of the fields below that it names, and the last such cell wins.
+    # Fields no cell names are None.
+    cells = np.array(header, dtype=str) if header else np.empty(0, dtype=str)
+
+    def names(*words):
+        found = np.ones(len(cells), dtype=bool)
+        for word in words:
+            found &= np.char.find(cells, word) >= 0
+        return found
+
+    section = names('section') | names('course')
+    meeting_pattern = ~section & names('meeting', 'pattern')
+    start_date = ~section & ~meeting_pattern & names('start', 'date')
+    end_date = ~section & ~meeting_pattern & ~start_date & names('end', 'date')
+    term = ~section & ~meeting_pattern & ~start_date & ~end_date & names('academic', 'period')
+
+    plan = []
+    for found in (section, meeting_pattern, start_date, end_date, term):
+        columns = np.flatnonzero(found)
+        plan.append(int(columns[-1]) if len(columns) else None)
+    return tuple(plan)
+
+
+class LayoutCache:
+    # Bounded LRU of fingerprint -> column plan, shared by every thread in the process
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncached = 0
+        self._plans = OrderedDict()
+        # Uploads per layout since it was first seen
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def plan(self, header_offset, header_row, cache=True):
+        # (section, meeting pattern, start date, end date, academic period)
+        # columns, None where the header names no such column. cache=False works
+        # the plan out without looking it up or keeping it.
+        if not cache:
+            with self._lock:
+                self.uncached += 1
+            return resolve_columns(normalize_header(header_row))
+        key = layout_fingerprint(header_offset, header_row)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                self._uses[key] += 1
+                return plan
+            self.misses += 1
+
+        header = normalize_header(header_row)
+        plan = resolve_columns(header)
+        logger.info("New sheet layout: header %d row(s) after the banner, columns %s -> plan %s",
+                    header_offset + 1, list(header), dict(zip(PLAN_FIELDS, plan)))
+        with self._lock:
+            self._plans[key] = plan
+            self._uses[key] = self._uses.get(key, 0) + 1
+            while len(self._plans) > self.max_entries:
+                evicted, _ = self._plans.popitem(last=False)
+                self._uses.pop(evicted, None)
+                self.evictions += 1
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self._uses.clear()
+
+    def __len__(self):
+        return len(self._plans)
+
+    def stats(self, top=5):
+        # Counters plus the most used layouts, for /healthz and the command line
+        with self._lock:
+            lookups = self.hits + self.misses
+            common = sorted(self._uses.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {
+                'layouts': len(self._plans),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'uncached': self.uncached,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'common': [
+                    {'header_offset': offset, 'header': list(normalize_header(header)), 'uploads': uses,
+                     'plan': dict(zip(PLAN_FIELDS, self._plans[(offset, header)]))}
+                    for (offset, header), uses in common
+                ],
+            }
+
+
+layouts = LayoutCache()
+
+
+def main(argv=None):
+    # Parse the given workbooks and print the layouts they use and the hit rate
+    from converter import process_excel
+    from result_cache import MessageLog
+    # The cache converter uses; run as a script, this module is __main__
+    from layout_cache import layouts as shared
+
+    paths = sys.argv[1:] if argv is None else argv
+    for path in paths:
+        process_excel(path, ui=MessageLog())
+    print(json.dumps(shared.stats(top=len(shared)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# Reads the Workday "View My Courses" PDF printout into the same course table
+# process_excel returns, so create_ics_file can be used unchanged.
+#
+# Pages are parsed in parallel worker processes (pdfminer is pure Python), a few
+# at a time and in order. The rows feed converter.extract_courses, which stops
+# reading at the end of the enrolled section, so later pages of a long
+# multi-term printout are never parsed. preflight.preflight_pdf holds the upload
+# to the size and page limits before any page reaches the pool.
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from converter import LogReporter, extract_courses, row_has_marker
+from instrumentation import Stopwatch
+from preflight import preflight_pdf
+
+
+def _inside(obj, bbox):
+    x0, top, x1, bottom = bbox
+    return obj['x0'] >= x0 and obj['x1'] <= x1 and obj['top'] >= top and obj['bottom'] <= bottom
+
+
+def page_rows(pdf_bytes, page_number):
+    # Rows of one page in reading order: each table row becomes a row of cells and
+    # each line of text outside the tables (section titles) a single-cell row
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page = pdf.pages[page_number]
+        tables = page.find_tables()
+        items = []
+        for table in tables:
+            for cells, row in zip(table.extract(), table.rows):
+                items.append((row.bbox[1], tuple(cell if cell else None for cell in cells)))
+        bboxes = [table.bbox for table in tables]
+        text_only = page.filter(lambda obj: not any(_inside(obj, bbox) for bbox in bboxes))
+        for line in text_only.extract_text_lines():
+            items.append((line['top'], (line['text'],)))
+        items.sort(key=lambda item: item[0])
+        return [row for _, row in items]
+
+
+def iter_pdf_rows(pdf_bytes, executor, window, page_count):
+    # Keep up to `window` pages in flight and hand their rows out in page order.
+    # Closing the generator cancels the pages that have not started yet.
+    # Without an executor pages are parsed one by one in this process.
+    if executor is None:
+        for page_number in range(page_count):
+            yield from page_rows(pdf_bytes, page_number)
+        return
+    pages = iter(range(page_count))
+    in_flight = deque()
+    try:
+        for page_number in pages:
+            in_flight.append(executor.submit(page_rows, pdf_bytes, page_number))
+            if len(in_flight) >= window:
+                break
+        while in_flight:
+            rows = in_flight.popleft().result()
+            next_page = next(pages, None)
+            if next_page is not None:
+                in_flight.append(executor.submit(page_rows, pdf_bytes, next_page))
+            yield from rows
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def drop_repeated_headers(rows):
+    # Tables that continue onto the next page repeat their header row; keep only
+    # the first copy of the header that follows the enrolled-courses banner
+    header = None
+    after_banner = False
+    for row in rows:
+        if header is None:
+            if after_banner and sum(cell is not None for cell in row) >= 3:
+                header = row
+            elif row_has_marker(row, ["Enrolled Courses"]):
+                after_banner = True
+        elif row == header:
+            continue
+        yield row
+
+
+def process_pdf(file, ui=None, workers=4, executor=None, limits=None):
+    # file is a path, bytes or binary file object. Pass a shared executor to avoid
+    # starting worker processes for every document, or workers=1 to parse inline.
+    # limits overrides preflight.DEFAULT_LIMITS (upload size, pages).
+    ui = ui or LogReporter()
+    stopwatch = Stopwatch('process_pdf')
+    page_count = preflight_pdf(file, ui, limits)
+    if page_count is None:
+        return None
+    stopwatch.lap('preflight')
+    own_executor = executor is None and workers > 1
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    rows = None
+    try:
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                pdf_bytes = f.read()
+        elif isinstance(file, bytes):
+            pdf_bytes = file
+        else:
+            pdf_bytes = file.read()
+        rows = iter_pdf_rows(pdf_bytes, executor, workers, page_count)
+        stopwatch.lap('read_pdf')
+        return extract_courses(drop_repeated_headers(rows), 0, ui, stopwatch)
+    except Exception as e:
+        ui.error(f"Error processing PDF file: {str(e)}")
+        ui.info("Make sure you're uploading the PDF printout of 'View My Courses' from Workday.")
+        return None
+    finally:
+        if rows is not None:
+            rows.close()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
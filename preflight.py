@@ -0,0 +1,428 @@
+# Cheap checks on an uploaded .xlsx before openpyxl parses any of it, and on a
+# .pdf printout before its pages are handed to the parsing pool.
+#
+# An .xlsx is a zip of XML parts. The zip directory alone gives the upload's
+# uncompressed size and compression ratio (zip bombs inflate hundreds of times),
+# each sheet's <dimension> gives its declared rows and columns, and the first
+# rows tell whether this is a Workday "View My Courses" export at all. Only the
+# start of each sheet and of the shared strings table is ever decompressed.
+# banner_counts() reads whole sheets, a piece at a time and only for uploads that
+# passed the checks.
+#
+# A PDF is held to the same upload size, and its page count is read from the
+# page tree without parsing any page.
+#
+#   python preflight.py schedule.xlsx printout.pdf
+import io
+import json
+import os
+import posixpath
+import re
+import sys
+import zipfile
+from bisect import bisect_right
+from xml.etree.ElementTree import iterparse
+
+DEFAULT_LIMITS = {
+    'max_bytes': 10 * 1024 * 1024,               # the upload itself
+    'max_uncompressed_bytes': 64 * 1024 * 1024,  # all zip members together
+    'max_compression_ratio': 100,                # uncompressed / compressed, per member
+    'max_entries': 200,                          # zip members
+    'max_rows': 5000,
+    'max_columns': 100,
+    'max_sheets': 50,                            # combined workbooks have one per term or student
+    'sniff_rows': 200,                           # rows read per sheet to find the banner
+    'max_pages': 50,                             # PDF printouts; a full year is a handful of pages
+}
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+CELL_REF_RE = re.compile(r'^([A-Z]+)(\d+)$')
+# Start and end of each <si> entry of the shared strings table, and the end of a
+# sheet row, with any namespace prefix
+SHARED_STRING_RE = re.compile(rb'<(?:\w+:)?si[\s/>]')
+SHARED_STRING_END_RE = re.compile(rb'</(?:\w+:)?si>')
+ROW_END_RE = re.compile(rb'</(?:\w+:)?row>')
+RICH_TEXT_RE = re.compile(rb'<(?:\w+:)?r>')
+# Bytes of a zip member held at once while counting banners
+CHUNK_BYTES = 1024 * 1024
+# Text of the banner row above the enrolled courses (see converter.extract_courses)
+BANNER = 'Enrolled Courses'
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+def limits_with(overrides=None):
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(overrides or {})
+    return limits
+
+
+def upload_size(file):
+    # Size of a path or seekable file object, leaving the position where it was
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+def column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def dimension_size(ref):
+    # "A1:M40" -> (40 rows, 13 columns); None for refs we can't read
+    last = ref.split(':')[-1]
+    match = CELL_REF_RE.match(last.replace('$', ''))
+    if match is None:
+        return None
+    return int(match.group(2)), column_number(match.group(1))
+
+
+def sheet_parts(archive):
+    # (name, zip member) of the workbook's sheets in workbook order, found through
+    # workbook.xml and its relationships; the member is None for a sheet with no target
+    with archive.open('xl/workbook.xml') as f:
+        sheets = [(element.get('name'), element.get(REL_NS + 'id'))
+                  for _, element in iterparse(f) if element.tag == MAIN_NS + 'sheet']
+    targets = {}
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        for _, element in iterparse(f):
+            if element.tag == PKG_REL_NS + 'Relationship':
+                target = element.get('Target')
+                if target.startswith('/'):
+                    targets[element.get('Id')] = target.lstrip('/')
+                else:
+                    targets[element.get('Id')] = posixpath.normpath(posixpath.join('xl', target))
+    return [(name, targets.get(rel_id)) for name, rel_id in sheets]
+
+
+def sniff_sheet(archive, sheet_path, sniff_rows):
+    # Declared dimension plus the text of the first few rows; shared strings are
+    # kept as indices and resolved afterwards. Stops a few rows past an inline
+    # banner, since nothing after the header row changes the verdict. The flag
+    # says whether rows were left unread because sniff_rows ran out.
+    dimension = None
+    banner_row = None
+    truncated = False
+    rows = []
+    with archive.open(sheet_path) as f:
+        cells = None
+        for event, element in iterparse(f, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if tag == MAIN_NS + 'row':
+                    if len(rows) >= sniff_rows:
+                        truncated = True
+                        break
+                    cells = []
+                continue
+            if tag == MAIN_NS + 'dimension':
+                dimension = dimension_size(element.get('ref', ''))
+            elif tag == MAIN_NS + 'c' and cells is not None:
+                kind = element.get('t')
+                if kind == 's':
+                    value = element.find(MAIN_NS + 'v')
+                    cells.append(('shared', int(value.text)) if value is not None and value.text else None)
+                elif kind == 'inlineStr':
+                    cells.append(''.join(t.text or '' for t in element.iter(MAIN_NS + 't')))
+                else:
+                    value = element.find(MAIN_NS + 'v')
+                    cells.append(value.text if value is not None else None)
+                element.clear()
+            elif tag == MAIN_NS + 'row':
+                rows.append(cells)
+                if banner_row is None and any(isinstance(value, str) and BANNER in value for value in cells):
+                    banner_row = len(rows)
+                cells = None
+                element.clear()
+                if banner_row is not None and len(rows) >= banner_row + 3:
+                    break
+    return dimension, rows, truncated
+
+
+def shared_strings(archive, wanted):
+    # Only the shared strings the sniffed rows refer to, reading no further than the last one
+    if not wanted or 'xl/sharedStrings.xml' not in archive.namelist():
+        return {}
+    last = max(wanted)
+    found = {}
+    index = 0
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, element in iterparse(f):
+            if element.tag != MAIN_NS + 'si':
+                continue
+            if index in wanted:
+                found[index] = ''.join(t.text or '' for t in element.iter(MAIN_NS + 't'))
+            element.clear()
+            if index >= last:
+                break
+            index += 1
+    return found
+
+
+def xml_pieces(f, end_re):
+    # A zip member's XML as (piece, ends) pairs, each piece cut just after the
+    # last end_re match in what has been read so far and ends the number of matches
+    # in it. Read CHUNK_BYTES at a time, so no more than that plus one element
+    # is held at once and no element is split between pieces.
+    rest = b''
+    for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+        buffer = rest + chunk
+        ends = 0
+        cut = 0
+        for match in end_re.finditer(buffer):
+            ends += 1
+            cut = match.end()
+        if cut:
+            yield buffer[:cut], ends
+        rest = buffer[cut:]
+    if rest:
+        yield rest, 0
+
+
+def banner_string_indices(archive):
+    # Indices of the shared strings that contain the banner, by locating the
+    # banner text among the <si> entries without parsing the table; None when the
+    # table has rich text
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    indices = set()
+    offset = 0
+    with archive.open('xl/sharedStrings.xml') as f:
+        # Pieces end after an entry, so every entry is whole in one of them; counted by
+        # their starts, as an empty entry may have no end tag
+        for piece, _ in xml_pieces(f, SHARED_STRING_END_RE):
+            if RICH_TEXT_RE.search(piece):
+                # The banner could be split across formatting runs; can't count it this way
+                return None
+            starts = [match.start() for match in SHARED_STRING_RE.finditer(piece)]
+            hits = [match.start() for match in re.finditer(re.escape(BANNER.encode()), piece)]
+            indices.update(offset + bisect_right(starts, hit) - 1 for hit in hits)
+            offset += len(starts)
+    return sorted(indices)
+
+
+def banner_counts(file, limits=None):
+    # {sheet name: cells that mention the banner, or None if unknown}, from a regex
+    # pass over each sheet's XML, so the parser can stop after a sheet's last block
+    # and skip sheets that have none. A count can be too high (any cell counts),
+    # never too low. Sheets are streamed a piece at a time and left after max_rows
+    # rows, where capped_rows rejects them anyway; None when the archive can't be
+    # read this way.
+    limits = limits_with(limits)
+    counts = {}
+    try:
+        archive = zipfile.ZipFile(file)
+    except (zipfile.BadZipFile, OSError):
+        return None
+    with archive:
+        indices = banner_string_indices(archive)
+        if indices is None:
+            return None
+        shared_cell = None
+        if indices:
+            values = b'|'.join(str(index).encode() for index in indices)
+            shared_cell = re.compile(rb'<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>(?:' + values + rb')</')
+        names = set(archive.namelist())
+        for name, path in sheet_parts(archive):
+            if path is None or path not in names:
+                continue
+            count = 0
+            rows = 0
+            with archive.open(path) as f:
+                for piece, ends in xml_pieces(f, ROW_END_RE):
+                    if RICH_TEXT_RE.search(piece):
+                        # Inline rich text, as in the shared strings: count unknown
+                        count = None
+                        break
+                    # Inline strings and cached formula results hold the text itself
+                    count += piece.count(BANNER.encode())
+                    if shared_cell is not None:
+                        count += len(shared_cell.findall(piece))
+                    rows += ends
+                    if rows >= limits['max_rows']:
+                        break
+            counts[name] = count
+    return counts
+
+
+def inspect_xlsx(file, limits=None):
+    # Report on an .xlsx upload; raises UploadRejected at the first limit it breaks
+    limits = limits_with(limits)
+    report = {'bytes': upload_size(file)}
+    if report['bytes'] > limits['max_bytes']:
+        raise UploadRejected(f"The file is {report['bytes'] / 2 ** 20:.1f} MB; uploads are limited to "
+                             f"{limits['max_bytes'] / 2 ** 20:.0f} MB.")
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise UploadRejected("This is not an Excel .xlsx file.")
+
+    with archive:
+        members = archive.infolist()
+        compressed = sum(m.compress_size for m in members)
+        report['entries'] = len(members)
+        report['uncompressed_bytes'] = sum(m.file_size for m in members)
+        report['compression_ratio'] = round(report['uncompressed_bytes'] / compressed, 1) if compressed else 0.0
+        if len(members) > limits['max_entries']:
+            raise UploadRejected(f"The file contains {len(members)} parts, more than any Workday export.")
+        if report['uncompressed_bytes'] > limits['max_uncompressed_bytes']:
+            raise UploadRejected(f"The file unpacks to {report['uncompressed_bytes'] / 2 ** 20:.0f} MB, "
+                                 f"more than the {limits['max_uncompressed_bytes'] / 2 ** 20:.0f} MB limit.")
+        for member in members:
+            if member.compress_size and member.file_size / member.compress_size > limits['max_compression_ratio']:
+                raise UploadRejected(f"'{member.filename}' is compressed {member.file_size // member.compress_size}:1, "
+                                     "which only happens with deliberately crafted files.")
+
+        names = set(archive.namelist())
+        if 'xl/workbook.xml' not in names or 'xl/_rels/workbook.xml.rels' not in names:
+            raise UploadRejected("This is not an Excel .xlsx file.")
+        paths = [path for _, path in sheet_parts(archive) if path in names]
+        if not paths:
+            raise UploadRejected("The workbook has no worksheet.")
+        if len(paths) > limits['max_sheets']:
+            raise UploadRejected(f"The workbook has {len(paths)} sheets (limit {limits['max_sheets']}).")
+        report['sheets'] = len(paths)
+
+        # Every sheet is read, so every sheet is held to the caps
+        rows = []
+        truncated = False
+        report['dimensions'] = []
+        for sheet_path in paths:
+            dimension, sheet_rows, sheet_truncated = sniff_sheet(archive, sheet_path, limits['sniff_rows'])
+            report['dimensions'].append(dimension)
+            if dimension is not None:
+                declared_rows, declared_columns = dimension
+                if declared_rows > limits['max_rows']:
+                    raise UploadRejected(f"The sheet has {declared_rows} rows; a 'View My Courses' export has "
+                                         f"far fewer (limit {limits['max_rows']}).")
+                if declared_columns > limits['max_columns']:
+                    raise UploadRejected(f"The sheet has {declared_columns} columns (limit {limits['max_columns']}).")
+            rows.extend(sheet_rows)
+            truncated = truncated or sheet_truncated
+
+        wanted = {cell[1] for row in rows for cell in row if isinstance(cell, tuple)}
+        strings = shared_strings(archive, wanted)
+        texts = [
+            [strings.get(cell[1]) if isinstance(cell, tuple) else cell for cell in row]
+            for row in rows
+        ]
+
+    report['sniffed_rows'] = len(texts)
+    report['sniff_truncated'] = truncated
+    report['has_banner'] = any(
+        isinstance(value, str) and BANNER in value for row in texts for value in row
+    )
+    report['non_empty_cells'] = sum(value not in (None, '') for row in texts for value in row)
+    return report
+
+
+def preflight_xlsx(file, ui, limits=None):
+    # True when the upload is worth handing to openpyxl; otherwise the reason is
+    # reported through ui the same way process_excel reports its errors
+    try:
+        report = inspect_xlsx(file, limits)
+    except UploadRejected as e:
+        ui.error(str(e))
+        ui.info("Make sure you're uploading the Excel file from 'View My Courses' in Workday.")
+        return False
+    finally:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+    # A banner further down than the sniffed rows is left to the full parse
+    if not report['has_banner'] and not report['sniff_truncated']:
+        if report['non_empty_cells'] <= 2:
+            ui.error("The Excel file appears to only contain the name 'View My Courses' without actual course data.")
+            ui.info("Please make sure you're exporting the full data from Workday → Academics and Registration → Registration Planning → View My Courses")
+        else:
+            ui.error("Could not find 'My Enrolled Courses' in the file.")
+            ui.info("Please ensure you're using the correct Excel file from 'View My Courses' in Workday.")
+        return False
+    return True
+
+
+def inspect_pdf(file, limits=None):
+    # Report on a .pdf upload (path, bytes or binary file object); raises
+    # UploadRejected at the first limit it breaks
+    import pdfplumber
+    limits = limits_with(limits)
+    if isinstance(file, bytes):
+        file = io.BytesIO(file)
+    report = {'bytes': upload_size(file)}
+    if report['bytes'] > limits['max_bytes']:
+        raise UploadRejected(f"The file is {report['bytes'] / 2 ** 20:.1f} MB; uploads are limited to "
+                             f"{limits['max_bytes'] / 2 ** 20:.0f} MB.")
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            head = f.read(1024)
+    else:
+        position = file.tell()
+        head = file.read(1024)
+        file.seek(position)
+    # The header may follow a little junk, but must be in the first 1024 bytes
+    if b'%PDF-' not in head:
+        raise UploadRejected("This is not a PDF file.")
+    try:
+        with pdfplumber.open(file) as pdf:
+            report['pages'] = len(pdf.pages)
+    except Exception:
+        raise UploadRejected("The PDF could not be read.")
+    if report['pages'] > limits['max_pages']:
+        raise UploadRejected(f"The PDF has {report['pages']} pages; a 'View My Courses' printout has "
+                             f"far fewer (limit {limits['max_pages']}).")
+    return report
+
+
+def preflight_pdf(file, ui, limits=None):
+    # The page count when the printout is worth parsing; otherwise None, with the
+    # reason reported through ui
+    try:
+        return inspect_pdf(file, limits)['pages']
+    except UploadRejected as e:
+        ui.error(str(e))
+        ui.info("Make sure you're uploading the PDF printout of 'View My Courses' from Workday.")
+        return None
+    finally:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+
+def capped_rows(rows, limits=None):
+    # Passes sheet rows through, failing as soon as the sheet turns out bigger than
+    # the limits; the declared dimension can be missing or wrong
+    limits = limits_with(limits)
+    for count, row in enumerate(rows, start=1):
+        if count > limits['max_rows']:
+            raise UploadRejected(f"The sheet has more than {limits['max_rows']} rows.")
+        if len(row) > limits['max_columns']:
+            raise UploadRejected(f"The sheet has more than {limits['max_columns']} columns.")
+        yield row
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    status = 0
+    for path in paths:
+        try:
+            report = inspect_pdf(path) if path.lower().endswith('.pdf') else inspect_xlsx(path)
+        except UploadRejected as e:
+            report = {'rejected': str(e)}
+            status = 1
+        print(json.dumps({'file': path, **report}))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
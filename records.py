@@ -0,0 +1,229 @@
+# Compact in-memory model of a schedule between parsing and serialization.
+#
+# Courses and meetings are stored column by column in NumPy arrays inside
+# __slots__ classes rather than as DataFrames: dates are datetime64, meeting
+# times are minutes since midnight, and the strings are shared with the cells
+# they came from. The serializers walk the meetings as slotted Meeting records
+# built one at a time. DataFrames are only built for display (to_frame).
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+COURSE_COLUMNS = ['Section', 'Meeting Patterns', 'Start Date', 'End Date']
+MEETING_FIELDS = ['section', 'days', 'start_time', 'end_time', 'location', 'start_date', 'end_date', 'pattern', 'uid']
+
+# One shared time object per minute of the day
+MINUTE_TIMES = [time(minute // 60, minute % 60) for minute in range(24 * 60)]
+
+
+def object_array(values):
+    # 1-d object array, even when the values are tuples NumPy would unpack
+    if isinstance(values, np.ndarray) and values.dtype == object and values.ndim == 1:
+        return values
+    values = list(values)
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+class CourseTable:
+    # The enrolled courses process_excel/process_pdf found, one entry per sheet row.
+    # term optionally names each course's academic term, e.g. '2025 Spring Term'.
+
+    __slots__ = ('section', 'pattern', 'start_date', 'end_date', 'row', 'term')
+
+    def __init__(self, section, pattern, start_date, end_date, row, term=None):
+        self.section = np.asarray(section, dtype=object)
+        self.pattern = np.asarray(pattern, dtype=object)
+        self.start_date = np.asarray(start_date, dtype='datetime64[ns]')
+        self.end_date = np.asarray(end_date, dtype='datetime64[ns]')
+        # Row of the sheet each course came from
+        self.row = np.asarray(row, dtype='int64')
+        self.term = None if term is None else object_array(term)
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls(
+            frame['Section'].to_numpy(dtype=object),
+            frame['Meeting Patterns'].to_numpy(dtype=object),
+            frame['Start Date'].to_numpy(dtype='datetime64[ns]'),
+            frame['End Date'].to_numpy(dtype='datetime64[ns]'),
+            frame.index.to_numpy(dtype='int64'),
+            frame['Term'].to_numpy(dtype=object) if 'Term' in frame else None,
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        # One table from several; courses of a table without terms get None
+        tables = list(tables)
+        if not tables:
+            return cls([], [], [], [], [])
+        terms = None
+        if any(t.term is not None for t in tables):
+            terms = np.concatenate([t.term if t.term is not None else np.full(len(t), None, dtype=object)
+                                    for t in tables])
+        return cls(*(np.concatenate([getattr(t, name) for t in tables])
+                     for name in ('section', 'pattern', 'start_date', 'end_date', 'row')), term=terms)
+
+    def to_frame(self):
+        # The table as process_excel used to return it, for st.write and exports
+        columns = {
+            'Section': self.section,
+            'Meeting Patterns': self.pattern,
+            'Start Date': self.start_date,
+            'End Date': self.end_date,
+        }
+        if self.term is not None:
+            columns['Term'] = self.term
+        return pd.DataFrame(columns, index=pd.Index(self.row), columns=list(columns))
+
+    def terms(self):
+        # Distinct terms in order of first appearance; None for untagged courses
+        if self.term is None:
+            return [None] if len(self) else []
+        return list(dict.fromkeys(self.term))
+
+    def by_term(self):
+        # {term: CourseTable of that term's courses}, in order of first appearance
+        if self.term is None:
+            return {None: self} if len(self) else {}
+        return {term: self.take(np.flatnonzero([value == term for value in self.term]))
+                for term in self.terms()}
+
+    def __len__(self):
+        return len(self.row)
+
+    @property
+    def empty(self):
+        return len(self.row) == 0
+
+    def take(self, positions):
+        return CourseTable(self.section[positions], self.pattern[positions], self.start_date[positions],
+                           self.end_date[positions], self.row[positions],
+                           None if self.term is None else self.term[positions])
+
+    def __repr__(self):
+        return f"<CourseTable {len(self)} courses>"
+
+
+class Meeting:
+    # One weekly meeting, as handed to the serializers
+
+    __slots__ = MEETING_FIELDS + ['exdates']
+
+    def __init__(self, section, days, start_time, end_time, location, start_date, end_date, pattern, uid,
+                 exdates=()):
+        self.section = section
+        self.days = days
+        self.start_time = start_time
+        self.end_time = end_time
+        self.location = location
+        self.start_date = start_date
+        self.end_date = end_date
+        self.pattern = pattern
+        self.uid = uid
+        # datetime.date of each week the meeting skips (breaks and holidays)
+        self.exdates = exdates
+
+
+class MeetingTable:
+    # Every weekly meeting of every course, from converter.parse_meeting_patterns.
+    # days holds tuples of RRULE day codes, shared between meetings with the same
+    # day code; schedule optionally names the schedule each meeting belongs to;
+    # exdates optionally holds a datetime64[D] array per meeting of the days it
+    # skips (see academic_calendar).
+
+    __slots__ = ('section', 'days', 'start_minute', 'end_minute', 'location', 'start_date', 'end_date',
+                 'pattern', 'uid', 'schedule', 'exdates')
+
+    def __init__(self, section, days, start_minute, end_minute, location, start_date, end_date,
+                 pattern, uid=None, schedule=None, exdates=None):
+        # Object columns are copied: a view into a pandas block would keep the
+        # whole block (every regex group of every line) alive with the table
+        self.section = np.array(section, dtype=object)
+        self.days = object_array(days).copy()
+        self.start_minute = np.asarray(start_minute, dtype='int16')
+        self.end_minute = np.asarray(end_minute, dtype='int16')
+        self.location = np.array(location, dtype=object)
+        self.start_date = np.asarray(start_date, dtype='datetime64[D]')
+        self.end_date = np.asarray(end_date, dtype='datetime64[D]')
+        self.pattern = np.array(pattern, dtype=object)
+        self.uid = np.array(uid if uid is not None else [None] * len(self.section), dtype=object)
+        self.schedule = None if schedule is None else np.asarray(schedule, dtype=object)
+        self.exdates = None if exdates is None else object_array(exdates)
+
+    @classmethod
+    def empty_table(cls):
+        return cls([], [], [], [], [], [], [], [])
+
+    @classmethod
+    def concat(cls, tables, schedules):
+        # One table from several, with schedules[i] naming the meetings of tables[i]
+        tables = list(tables)
+        if not tables:
+            table = cls.empty_table()
+            table.schedule = np.empty(0, dtype=object)
+            return table
+        joined = cls(*(np.concatenate([getattr(t, name) for t in tables])
+                       for name in ('section', 'days', 'start_minute', 'end_minute', 'location',
+                                    'start_date', 'end_date', 'pattern', 'uid')))
+        joined.schedule = np.repeat(np.asarray(list(schedules), dtype=object), [len(t) for t in tables])
+        if all(t.exdates is not None for t in tables):
+            joined.exdates = np.concatenate([t.exdates for t in tables])
+        return joined
+
+    def __len__(self):
+        return len(self.section)
+
+    @property
+    def empty(self):
+        return len(self.section) == 0
+
+    def take(self, positions):
+        return MeetingTable(
+            self.section[positions], self.days[positions], self.start_minute[positions],
+            self.end_minute[positions], self.location[positions], self.start_date[positions],
+            self.end_date[positions], self.pattern[positions], self.uid[positions],
+            None if self.schedule is None else self.schedule[positions],
+            None if self.exdates is None else self.exdates[positions],
+        )
+
+    def start_times(self):
+        return [MINUTE_TIMES[minute] for minute in self.start_minute.tolist()]
+
+    def end_times(self):
+        return [MINUTE_TIMES[minute] for minute in self.end_minute.tolist()]
+
+    def records(self):
+        # Meeting records one at a time, in table order; nothing is boxed ahead
+        # of the record that needs it
+        columns = [self.section, self.days,
+                   map(MINUTE_TIMES.__getitem__, self.start_minute), map(MINUTE_TIMES.__getitem__, self.end_minute),
+                   self.location, map(np.datetime64.item, self.start_date), map(np.datetime64.item, self.end_date),
+                   self.pattern, self.uid]
+        if self.exdates is not None:
+            columns.append(map(np.ndarray.tolist, self.exdates))
+        return map(Meeting, *columns)
+
+    def to_frame(self):
+        frame = pd.DataFrame({
+            'section': self.section,
+            'days': self.days,
+            'start_time': self.start_times(),
+            'end_time': self.end_times(),
+            'location': self.location,
+            'start_date': self.start_date.astype('datetime64[ns]'),
+            'end_date': self.end_date.astype('datetime64[ns]'),
+            'pattern': self.pattern,
+            'uid': self.uid,
+        }, columns=MEETING_FIELDS)
+        if self.schedule is not None:
+            frame.insert(0, 'schedule', self.schedule)
+        if self.exdates is not None:
+            frame['exdates'] = self.exdates
+        return frame
+
+    def __repr__(self):
+        return f"<MeetingTable {len(self)} meetings>"
@@ -0,0 +1,138 @@
+# Weekday arithmetic for the WEEKLY;BYDAY=..;UNTIL=.. rules create_ics_file emits.
+# Works on the MeetingTable from converter.parse_meeting_patterns.
+import numpy as np
+import pandas as pd
+
+from records import object_array
+
+WEEKDAY_INDEX = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+
+def weekday_mask(days):
+    # ('MO', 'WE', 'FR') -> 0b0010101, bit n set for weekday n (Monday = 0)
+    mask = 0
+    for day in days:
+        mask |= 1 << WEEKDAY_INDEX[day]
+    return mask
+
+
+def _minute_offsets(minutes):
+    # Minutes since midnight -> timedelta64 seconds
+    return (minutes.astype('int64') * 60).astype('timedelta64[s]')
+
+
+def _weekdays(dates):
+    # 1970-01-01 was a Thursday
+    return (dates.astype('int64') + 3) % 7
+
+
+def first_occurrence_dates(meetings):
+    # First date on or after each meeting's start date falling on one of its
+    # days, for the whole table at once; NaT where the meeting never falls
+    # inside its date range
+    start = meetings.start_date
+    until = meetings.end_date
+    masks = np.fromiter(map(weekday_mask, meetings.days), dtype='int64', count=len(meetings))
+    start_weekday = _weekdays(start)
+
+    # Smallest offset k in 0..6 whose weekday is in the mask
+    offsets = np.full(len(meetings), 7, dtype='int64')
+    for k in range(6, -1, -1):
+        hit = (masks >> ((start_weekday + k) % 7)) & 1 == 1
+        offsets[hit] = k
+
+    first = start + offsets * ONE_DAY
+    first[(offsets == 7) | (first > until)] = np.datetime64('NaT')
+    return first
+
+
+def excluded_dates(meetings, closed_days):
+    # For each meeting, the sorted closed days (datetime64[D]) that fall on one of
+    # its weekdays inside its date range, i.e. its EXDATEs. One (meetings x days)
+    # mask for the whole table; the meetings that lose no day share one empty array.
+    n = len(meetings)
+    closed_days = np.asarray(closed_days, dtype='datetime64[D]')
+    none = closed_days[:0]
+    if n == 0 or len(closed_days) == 0:
+        return object_array([none] * n)
+    masks = np.fromiter(map(weekday_mask, meetings.days), dtype='int64', count=n)
+    day_bits = 1 << _weekdays(closed_days)
+    hit = ((masks[:, None] & day_bits[None, :]) != 0) \
+        & (closed_days[None, :] >= meetings.start_date[:, None]) \
+        & (closed_days[None, :] <= meetings.end_date[:, None])
+    # Row-major, so each meeting's days come out together and in order
+    meeting, day = np.nonzero(hit)
+    counts = np.bincount(meeting, minlength=n)
+    return object_array(np.split(closed_days[day], np.cumsum(counts)[:-1]) if len(meeting) else [none] * n)
+
+
+def weekday_weeks(meetings, meeting, weekday):
+    # For (meeting, weekday) pairs given as parallel arrays of row positions and
+    # weekdays: how many times the meeting falls on that weekday inside its date
+    # range, and how many of those its EXDATEs skip
+    first = meetings.start_date[meeting]
+    first = first + ((weekday - _weekdays(first)) % 7) * ONE_DAY
+    until = meetings.end_date[meeting]
+    weeks = np.where(first <= until, (until - first) // np.timedelta64(7, 'D') + 1, 0)
+    skipped = np.zeros(len(meeting), dtype='int64')
+    if meetings.exdates is not None and len(meetings):
+        counts = np.fromiter(map(len, meetings.exdates), dtype='int64', count=len(meetings))
+        if counts.any():
+            days = np.concatenate(list(meetings.exdates)).astype('datetime64[D]')
+            per_weekday = np.zeros((len(meetings), 7), dtype='int64')
+            np.add.at(per_weekday, (np.repeat(np.arange(len(meetings)), counts), _weekdays(days)), 1)
+            skipped = per_weekday[meeting, weekday]
+    return weeks, skipped
+
+
+def expand_occurrences(meetings):
+    # Every occurrence of every meeting in one vectorized call. Returns a frame
+    # with the meeting's row position and datetime64 start/end of each occurrence.
+    n = len(meetings)
+    if n == 0:
+        return pd.DataFrame({
+            'meeting': np.empty(0, dtype='int64'),
+            'start': np.empty(0, dtype='datetime64[s]'),
+            'end': np.empty(0, dtype='datetime64[s]'),
+        })
+    start = meetings.start_date
+    until = meetings.end_date
+    masks = np.fromiter(map(weekday_mask, meetings.days), dtype='int64', count=n)
+
+    # One (meeting, weekday) pair per BYDAY entry, each repeating every 7 days
+    weekdays = np.arange(7)
+    offsets = (weekdays[None, :] - _weekdays(start)[:, None]) % 7
+    firsts = start[:, None] + offsets * ONE_DAY
+    active = ((masks[:, None] >> weekdays[None, :]) & 1 == 1) & (firsts <= until[:, None])
+    counts = np.where(active, (until[:, None] - firsts) // np.timedelta64(7, 'D') + 1, 0).ravel()
+
+    pair_meeting = np.repeat(np.arange(n), 7)
+    total = counts.sum()
+    meeting = np.repeat(pair_meeting, counts)
+    # Position of each occurrence within its own (meeting, weekday) run
+    run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    week = np.arange(total) - run_starts
+    dates = np.repeat(firsts.ravel(), counts) + week * np.timedelta64(7, 'D')
+
+    if meetings.exdates is not None:
+        # An occurrence is excluded when its day is one of its own meeting's EXDATEs.
+        # Tables joined from different calendars, or with EXDATEs set by hand, give
+        # meetings different ones, so match (meeting, day) pairs packed into one key.
+        skipped_counts = np.fromiter(map(len, meetings.exdates), dtype='int64', count=n)
+        if skipped_counts.any():
+            skipped = np.concatenate(list(meetings.exdates)).astype('datetime64[D]').astype('int64')
+            days = dates.astype('int64')
+            every_day = np.concatenate([skipped, days])
+            lo = every_day.min()
+            span = every_day.max() - lo + 1
+            skipped_keys = np.repeat(np.arange(n), skipped_counts) * span + (skipped - lo)
+            kept = ~np.isin(meeting * span + (days - lo), skipped_keys)
+            meeting = meeting[kept]
+            dates = dates[kept]
+
+    starts = dates.astype('datetime64[s]') + _minute_offsets(meetings.start_minute)[meeting]
+    ends = dates.astype('datetime64[s]') + _minute_offsets(meetings.end_minute)[meeting]
+    order = np.lexsort((starts, meeting))
+    return pd.DataFrame({'meeting': meeting[order], 'start': starts[order], 'end': ends[order]})
@@ -0,0 +1,90 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def upload_key(data):
+    # Content hash of the uploaded bytes, so the same export maps to the same entry
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    # Bounded LRU cache with a time-to-live, shared by every session in the process
+
+    def __init__(self, max_entries=256, ttl=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or self.clock() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # Expired entries are dropped on access
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class MessageLog:
+    # Stands in for `st` while converting so the messages can be stored with the
+    # cached result and shown again on later reruns
+
+    def __init__(self):
+        self.messages = []
+
+    def error(self, body):
+        self.messages.append(('error', body))
+
+    def warning(self, body):
+        self.messages.append(('warning', body))
+
+    def info(self, body):
+        self.messages.append(('info', body))
+
+    def success(self, body):
+        self.messages.append(('success', body))
+
+    def replay(self, ui):
+        for level, body in self.messages:
+            getattr(ui, level)(body)
@@ -0,0 +1,204 @@
+# Cross-row analysis of MeetingTables from converter.parse_meeting_patterns:
+# overlapping meetings in each student's schedule, and how busy every room is
+# across a whole cohort.
+#
+# Meetings are split into (meeting, weekday) slots and swept in start-time order
+# within each group, so the cost is a sort plus the number of overlaps found,
+# never a comparison of every pair of meetings.
+import numpy as np
+import pandas as pd
+
+from records import MINUTE_TIMES, MeetingTable
+from recurrence import WEEKDAY_INDEX, weekday_weeks
+
+WEEKDAY_CODES = sorted(WEEKDAY_INDEX, key=WEEKDAY_INDEX.get)
+# Packs (group, minute of day) into one sortable integer; minutes never reach it
+MINUTE_BASE = 2048
+# Bookable hours per room and week used for utilization: Monday-Friday, 8:00-22:00
+AVAILABLE_HOURS = 5 * 14
+
+CONFLICT_COLUMNS = ['schedule', 'section', 'other_section', 'days', 'start_time', 'end_time',
+                    'location', 'other_location']
+CLASH_COLUMNS = ['location', 'section', 'other_section', 'days', 'start_time', 'end_time']
+OCCUPANCY_COLUMNS = ['location', 'sections', 'enrolments', 'weekly_hours', 'utilization', 'peak_headcount']
+
+
+def combine_schedules(tables):
+    # {schedule name: MeetingTable} -> one MeetingTable with `schedule` set
+    return MeetingTable.concat(tables.values(), tables.keys())
+
+
+def meeting_slots(meetings):
+    # One entry per (meeting, weekday): row position, weekday, start/end minute
+    # and the meeting's date range as datetime64[D]
+    counts = np.fromiter(map(len, meetings.days), dtype='int64', count=len(meetings))
+    meeting = np.repeat(np.arange(len(meetings)), counts)
+    weekday = np.fromiter((WEEKDAY_INDEX[day] for days in meetings.days for day in days),
+                          dtype='int64', count=counts.sum())
+    return {
+        'meeting': meeting,
+        'weekday': weekday,
+        'start': meetings.start_minute.astype('int64')[meeting],
+        'end': meetings.end_minute.astype('int64')[meeting],
+        'first': meetings.start_date[meeting],
+        'last': meetings.end_date[meeting],
+    }
+
+
+def overlapping_slots(slots, groups):
+    # Sort-and-sweep over slots. Within each (group, weekday), sorted by start,
+    # a slot overlaps exactly the slots after it that start before it ends,
+    # found with one searchsorted. Returns index pairs (a, b) into the slots
+    # whose times and date ranges overlap; meetings that only touch do not count.
+    key = groups[slots['meeting']] * 7 + slots['weekday']
+    order = np.lexsort((slots['start'], key))
+    packed = key[order] * MINUTE_BASE + slots['start'][order]
+    stop = np.searchsorted(packed, key[order] * MINUTE_BASE + slots['end'][order], side='left')
+    position = np.arange(len(order))
+    counts = np.maximum(stop - position - 1, 0)
+
+    a = np.repeat(position, counts)
+    run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    b = a + 1 + (np.arange(counts.sum()) - run_starts)
+    a, b = order[a], order[b]
+
+    same_dates = (slots['first'][a] <= slots['last'][b]) & (slots['first'][b] <= slots['last'][a])
+    return a[same_dates], b[same_dates]
+
+
+def _pair_frame(slots, a, b):
+    # One row per pair of overlapping meetings, with the weekdays they share
+    first, second = slots['meeting'][a], slots['meeting'][b]
+    swap = first > second
+    first, second = np.where(swap, second, first), np.where(swap, first, second)
+    start = np.maximum(slots['start'][a], slots['start'][b])
+    end = np.minimum(slots['end'][a], slots['end'][b])
+    pairs = pd.DataFrame({'a': first, 'b': second, 'weekday': slots['weekday'][a], 'start': start, 'end': end})
+    pairs = pairs.sort_values(['a', 'b', 'weekday'])
+    grouped = pairs.groupby(['a', 'b'], sort=False)
+    pairs = grouped.agg(weekdays=('weekday', tuple), start=('start', 'min'), end=('end', 'max')).reset_index()
+    pairs['days'] = [tuple(WEEKDAY_CODES[w] for w in weekdays) for weekdays in pairs['weekdays']]
+    pairs['start_time'] = [MINUTE_TIMES[minute] for minute in pairs['start']]
+    pairs['end_time'] = [MINUTE_TIMES[minute] for minute in pairs['end']]
+    return pairs
+
+
+def schedule_conflicts(meetings):
+    # Overlapping meetings within each schedule. Without schedule names the
+    # whole table is treated as one student's schedule.
+    if meetings.empty:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    if meetings.schedule is not None:
+        groups = pd.factorize(meetings.schedule)[0].astype('int64')
+        schedules = meetings.schedule
+    else:
+        groups = np.zeros(len(meetings), dtype='int64')
+        schedules = np.full(len(meetings), None, dtype=object)
+    slots = meeting_slots(meetings)
+    a, b = overlapping_slots(slots, groups)
+    if len(a) == 0:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    pairs = _pair_frame(slots, a, b)
+    section = meetings.section
+    location = meetings.location
+    return pd.DataFrame({
+        'schedule': schedules[pairs['a']],
+        'section': section[pairs['a']],
+        'other_section': section[pairs['b']],
+        'days': pairs['days'],
+        'start_time': pairs['start_time'],
+        'end_time': pairs['end_time'],
+        'location': location[pairs['a']],
+        'other_location': location[pairs['b']],
+    }, columns=CONFLICT_COLUMNS)
+
+
+def room_meetings(meetings):
+    # Each distinct section meeting that has a room, as (MeetingTable, headcount)
+    # where headcount is the number of schedules the meeting appears in
+    keys = pd.DataFrame({
+        'section': meetings.section,
+        'days': meetings.days,
+        'start': meetings.start_minute,
+        'end': meetings.end_minute,
+        'location': meetings.location,
+        'first': meetings.start_date,
+        'last': meetings.end_date,
+    })
+    in_room = np.flatnonzero(keys['location'].astype(str).str.strip() != '')
+    codes = keys.iloc[in_room].groupby(list(keys.columns), sort=False).ngroup().to_numpy()
+    _, first = np.unique(codes, return_index=True)
+    if meetings.schedule is not None:
+        per_schedule = pd.DataFrame({'code': codes, 'schedule': meetings.schedule[in_room]}).drop_duplicates()
+        headcount = np.bincount(per_schedule['code'], minlength=len(first))
+    else:
+        headcount = np.bincount(codes, minlength=len(first))
+    return meetings.take(in_room[first]), headcount
+
+
+def room_clashes(meetings):
+    # Different sections booked into the same room at the same time
+    rooms, _ = room_meetings(meetings)
+    if rooms.empty:
+        return pd.DataFrame(columns=CLASH_COLUMNS)
+    slots = meeting_slots(rooms)
+    a, b = overlapping_slots(slots, pd.factorize(rooms.location)[0].astype('int64'))
+    if len(a) == 0:
+        return pd.DataFrame(columns=CLASH_COLUMNS)
+    pairs = _pair_frame(slots, a, b)
+    section = rooms.section
+    pairs = pairs[section[pairs['a']] != section[pairs['b']]]
+    return pd.DataFrame({
+        'location': rooms.location[pairs['a']],
+        'section': section[pairs['a']],
+        'other_section': section[pairs['b']],
+        'days': pairs['days'].to_numpy(),
+        'start_time': pairs['start_time'].to_numpy(),
+        'end_time': pairs['end_time'].to_numpy(),
+    }, columns=CLASH_COLUMNS)
+
+
+def room_occupancy(meetings, available_hours=AVAILABLE_HOURS):
+    # Per room: distinct sections, enrolments (students x sections), booked hours
+    # per week, share of the bookable week, and the most students in the room at
+    # once. Meant for one term's schedules at a time. A meeting with EXDATEs
+    # (breaks and holidays) counts only for the share of its weeks it is held,
+    # so weekly hours are the average over the term.
+    rooms, headcount = room_meetings(meetings)
+    if rooms.empty:
+        return pd.DataFrame(columns=OCCUPANCY_COLUMNS)
+    slots = meeting_slots(rooms)
+    location = pd.factorize(rooms.location)[0].astype('int64')
+
+    # Sweep +headcount at each start and -headcount at each end, ends first on
+    # ties; every (room, weekday) run sums back to zero, so one global cumsum
+    # gives the running headcount inside each run
+    key = np.concatenate([location[slots['meeting']] * 7 + slots['weekday']] * 2)
+    time = np.concatenate([slots['start'], slots['end']])
+    delta = np.concatenate([headcount[slots['meeting']], -headcount[slots['meeting']]])
+    order = np.lexsort((delta, time, key))
+    running = np.cumsum(delta[order])
+    peak = pd.Series(running).groupby(key[order] // 7).max()
+
+    weeks, skipped = weekday_weeks(rooms, slots['meeting'], slots['weekday'])
+    held = np.divide(weeks - skipped, weeks, out=np.ones(len(weeks)), where=weeks > 0)
+    minutes = (slots['end'] - slots['start']).clip(min=0) * held
+    booked = np.bincount(location[slots['meeting']], weights=minutes, minlength=location.max() + 1) / 60
+    summary = pd.DataFrame({
+        'location': rooms.location, 'section': rooms.section, 'headcount': headcount,
+    }).groupby(location, sort=True).agg(
+        location=('location', 'first'),
+        sections=('section', 'nunique'),
+        enrolments=('headcount', 'sum'),
+    )
+    summary['weekly_hours'] = booked[summary.index]
+    summary['utilization'] = summary['weekly_hours'] / available_hours
+    summary['peak_headcount'] = peak.reindex(summary.index).fillna(0).astype('int64')
+    return summary.sort_values('weekly_hours', ascending=False).reset_index(drop=True)[OCCUPANCY_COLUMNS]
+
+
+def describe_conflict(conflict):
+    # One line for a schedule_conflicts row, as shown in the app
+    days = ', '.join(conflict.days)
+    return (f"{conflict.section} overlaps {conflict.other_section} on {days} "
+            f"({conflict.start_time:%H:%M}-{conflict.end_time:%H:%M}).")
@@ -0,0 +1,88 @@
+# Simulates many Streamlit sessions uploading at once, to compare converting
+# inside each session (every session competes for the CPU) with the shared
+# JobQueue the app uses (a few workers, a bounded line, rejections past it).
+#
+#   python session_simulation.py --sessions 120 --rate 8 20 40 --workers 2 --queue-size 8
+#
+# Each session uploads a different synthetic workbook, so no result is reused.
+import argparse
+import random
+import threading
+import time
+
+from api import convert_bytes
+from api_loadtest import percentile
+from job_queue import JobQueue, QueueFull
+from workday_fixtures import workbook_bytes
+
+
+def simulate(uploads, rate, mode, workers=2, queue_size=8, seed=0):
+    # Sessions arrive as a Poisson process at `rate` per second. Latency is
+    # measured from the scheduled arrival, so time spent waiting for the GIL
+    # before a session even starts counts too. Returns the latency of every
+    # finished conversion, the number of rejected sessions and the wall time.
+    latencies = []
+    rejected = 0
+    lock = threading.Lock()
+    queue = JobQueue(workers, queue_size) if mode == 'queue' else None
+
+    def session(index, upload, started):
+        nonlocal rejected
+        if queue is None:
+            convert_bytes(upload)
+        else:
+            try:
+                job = queue.submit(index, lambda job, data: convert_bytes(data), upload)
+            except QueueFull:
+                with lock:
+                    rejected += 1
+                return
+            job.result()
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    rng = random.Random(seed)
+    threads = []
+    started = time.perf_counter()
+    arrival = started
+    for index, upload in enumerate(uploads):
+        time.sleep(max(0.0, arrival - time.perf_counter()))
+        thread = threading.Thread(target=session, args=(index, upload, arrival))
+        thread.start()
+        threads.append(thread)
+        arrival += rng.expovariate(rate)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    if queue is not None:
+        queue.shutdown()
+    return latencies, rejected, wall
+
+
+def fmt_ms(seconds):
+    return f"{seconds * 1000:8.0f}" if seconds is not None else '       -'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-session and queued conversions under load.")
+    parser.add_argument('--sessions', type=int, default=120, help="Sessions uploading during the run")
+    parser.add_argument('--rate', type=float, nargs='+', default=[8, 20, 40], help="Arrivals per second (one run per rate)")
+    parser.add_argument('--sections', type=int, default=40, help="Sections per generated workbook")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    uploads = [workbook_bytes(sections=args.sections, seed=seed) for seed in range(args.sessions)]
+    convert_bytes(uploads[0])  # import and warm up outside the timings
+
+    print(f"{'mode':>8} {'rate/s':>7} {'done':>5} {'reject':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'wall s':>7}")
+    for rate in args.rate:
+        for mode in ('direct', 'queue'):
+            latencies, rejected, wall = simulate(uploads, rate, mode, args.workers, args.queue_size)
+            print(f"{mode:>8} {rate:7.1f} {len(latencies):5d} {rejected:6d} {fmt_ms(percentile(latencies, 50))} "
+                  f"{fmt_ms(percentile(latencies, 95))} {fmt_ms(percentile(latencies, 99))} "
+                  f"{fmt_ms(max(latencies) if latencies else None)} {wall:7.2f}")
+
+
+if __name__ == '__main__':
+    main()
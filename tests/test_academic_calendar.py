@@ -0,0 +1,96 @@
+# Missing dates are only taken from a term that is in progress or still to come
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import academic_calendar
+import app
+import converter
+from academic_calendar import AcademicCalendar, default_calendar
+from result_cache import MessageLog
+from workday_fixtures import workbook_bytes
+
+TERMS = [
+    ('term', '2025 Winter Term', '2025-01-06', '2025-03-17'),
+    ('term', '2025 Spring Term', '2025-03-31', '2025-06-09'),
+]
+
+
+def test_current_term():
+    calendar = AcademicCalendar(TERMS)
+    assert calendar.current_term('2024-12-01') == '2025 Winter Term'
+    assert calendar.current_term('2025-02-01') == '2025 Winter Term'
+    assert calendar.current_term('2025-03-20') == '2025 Spring Term'
+    assert calendar.current_term('2025-06-09') == '2025 Spring Term'
+    # Past the last term the calendar is out of date; no past term is picked
+    assert calendar.current_term('2025-06-10') is None
+    assert AcademicCalendar([]).current_term('2025-02-01') is None
+
+
+def test_built_in_calendar_covers_today():
+    # Fails once the registrar's next academic year needs adding to CARLETON_CALENDAR
+    assert not default_calendar.out_of_date()
+    assert default_calendar.current_term(date.today()) is not None
+
+
+def test_out_of_date_calendar_is_shown_with_the_result(monkeypatch):
+    class FakeJob:
+        key = 'upload-key'
+
+        def report(self, message, fraction):
+            pass
+
+    stale = AcademicCalendar(TERMS)
+    assert stale.out_of_date('2025-06-10') and not stale.out_of_date('2025-06-09')
+    monkeypatch.setattr(academic_calendar, 'default_calendar', stale)
+    result = app.run_conversion(FakeJob(), 'schedule.xlsx', workbook_bytes(sections=3), app.ResultCache())
+    parse_log = result[2]
+    assert parse_log.messages[0][0] == 'warning'
+    assert 'ends with the 2025 Spring Term' in parse_log.messages[0][1]
+
+
+def undated_courses(term=None):
+    return pd.DataFrame({
+        'Section': ['CS 201-00', 'MATH 232-01'],
+        'Meeting Patterns': ['M | 8:30 AM - 9:40 AM | Olin 310'] * 2,
+        'Start Date': pd.to_datetime([None, None]),
+        'End Date': pd.to_datetime([None, None]),
+        'Term': [term, None],
+    })
+
+
+def test_missing_dates_stay_missing_once_the_calendar_runs_out(monkeypatch):
+    monkeypatch.setattr(converter, 'default_calendar', AcademicCalendar([
+        ('term', '2001 Fall Term', '2001-09-10', '2001-11-20'),
+    ]))
+    courses = undated_courses()
+    log = MessageLog()
+    converter.fill_term_dates(courses, log)
+    assert courses['Start Date'].isna().all() and courses['End Date'].isna().all()
+    assert [level for level, _ in log.messages] == ['warning']
+    assert 'no current or upcoming term' in log.messages[0][1]
+
+
+def test_named_terms_are_still_used_once_the_calendar_runs_out(monkeypatch):
+    monkeypatch.setattr(converter, 'default_calendar', AcademicCalendar([
+        ('term', '2001 Fall Term', '2001-09-10', '2001-11-20'),
+    ]))
+    courses = undated_courses(term='2001 Fall Term')
+    log = MessageLog()
+    converter.fill_term_dates(courses, log)
+    assert courses.loc[0, 'Start Date'] == pd.Timestamp('2001-09-10')
+    assert courses.loc[0, 'End Date'] == pd.Timestamp('2001-11-20')
+    assert pd.isna(courses.loc[1, 'Start Date'])
+    assert len(log.messages) == 2
+
+
+def test_missing_dates_come_from_the_next_term(monkeypatch):
+    monkeypatch.setattr(converter, 'default_calendar', AcademicCalendar([
+        ('term', '2199 Fall Term', '2199-09-10', '2199-11-20'),
+    ]))
+    courses = undated_courses()
+    log = MessageLog()
+    converter.fill_term_dates(courses, log)
+    assert (courses['Start Date'] == np.datetime64('2199-09-10')).all()
+    assert log.messages == [('warning', 'Some date fields are missing. Using the dates of the 2199 Fall Term.')]
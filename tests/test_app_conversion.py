@@ -0,0 +1,38 @@
+# A conversion that raises is reported to the student and cached like a bad file
+import app
+import converter
+import exports
+from result_cache import ResultCache
+from workday_fixtures import workbook_bytes
+
+
+class FakeJob:
+    key = 'upload-key'
+
+    def report(self, message, fraction):
+        pass
+
+
+def fail(*args, **kwargs):
+    raise TypeError("boom")
+
+
+def test_parse_failure_is_logged_and_cached(monkeypatch):
+    monkeypatch.setattr(converter, 'process_excel', fail)
+    cache = ResultCache(max_entries=4, ttl=60)
+    result = app.run_conversion(FakeJob(), 'schedule.xlsx', b'not read', cache)
+    data, ics_bytes, parse_log, ics_log, spans, conflicts, formats, bundle = result
+    assert data is None and ics_bytes is None and bundle is None
+    assert ('error', "Something went wrong while converting your schedule: boom") in parse_log.messages
+    assert ics_log.messages == []
+    assert cache.get(FakeJob.key) is result
+
+
+def test_export_failure_keeps_the_courses(monkeypatch):
+    monkeypatch.setattr(exports, 'export_schedule', fail)
+    cache = ResultCache(max_entries=4, ttl=60)
+    result = app.run_conversion(FakeJob(), 'schedule.xlsx', workbook_bytes(sections=3), cache)
+    data, ics_bytes, parse_log, ics_log, spans, conflicts, formats, bundle = result
+    assert len(data) == 3 and ics_bytes is None and formats == {}
+    assert ics_log.messages[0][0] == 'error'
+    assert cache.get(FakeJob.key) is result
@@ -0,0 +1,45 @@
+# Batch output names never overwrite one another or the run's own files
+import json
+
+import batch
+from batch import output_names
+from workday_fixtures import workbook_bytes
+
+
+def test_clashing_stems_get_a_suffix():
+    names = output_names(['a/x.xlsx', 'b/x.xlsx', 'c/x.pdf', 'y.xlsx'])
+    assert list(names.values()) == ['x.ics', 'x-2.ics', 'x-3.ics', 'y.ics']
+    # As on a case-insensitive disk
+    assert list(output_names(['a/X.xlsx', 'b/x.xlsx']).values()) == ['X.ics', 'x-2.ics']
+
+
+def test_run_files_are_reserved():
+    names = output_names(['summary.xlsx', 'conflicts.xlsx', 'Room_Occupancy.pdf'], formats=['ics', 'json', 'csv'])
+    assert list(names.values()) == ['summary-2.ics', 'conflicts-2.ics', 'Room_Occupancy-2.ics']
+    # Only the formats written count
+    assert output_names(['summary.xlsx'])['summary.xlsx'] == 'summary.ics'
+
+
+def test_every_format_of_a_stem_is_checked():
+    # x.jcal.xlsx as json is x.jcal.json, the jcal output of x.xlsx
+    names = output_names(['x.xlsx', 'x.jcal.xlsx'], formats=['jcal', 'json'])
+    assert list(names.values()) == ['x.ics', 'x.jcal-2.ics']
+
+
+def test_a_batch_keeps_its_summary_and_analysis(tmp_path):
+    inputs = tmp_path / 'exports'
+    inputs.mkdir()
+    for seed, name in enumerate(['summary', 'conflicts', 'room_clashes']):
+        (inputs / f'{name}.xlsx').write_bytes(workbook_bytes(sections=3, seed=seed))
+    output = tmp_path / 'calendars'
+    assert batch.main([str(inputs), '-o', str(output), '-j', '1', '--formats', 'ics', 'json', 'csv', '--analysis']) == 0
+
+    summary = json.loads((output / 'summary.json').read_text())
+    assert summary['succeeded'] == 3 and 'analysis' in summary
+    assert (output / 'conflicts.csv').read_text().startswith('schedule,')
+    assert (output / 'room_clashes.csv').read_text().startswith('location,')
+    assert sorted(path.name for path in output.iterdir() if path.stem.endswith('-2')) == [
+        'conflicts-2.csv', 'conflicts-2.ics', 'conflicts-2.json',
+        'room_clashes-2.csv', 'room_clashes-2.ics', 'room_clashes-2.json',
+        'summary-2.csv', 'summary-2.ics', 'summary-2.json',
+    ]
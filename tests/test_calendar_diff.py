@@ -0,0 +1,72 @@
+# Re-conversions of the same schedule update events instead of replacing them
+import numpy as np
+from icalendar import Calendar
+
+import calendar_diff
+from academic_calendar import AcademicCalendar
+from converter import create_ics_file, parse_meeting_patterns
+from records import CourseTable
+from result_cache import MessageLog
+
+CALENDAR = AcademicCalendar([
+    ('term', '2025 Spring Term', '2025-03-31', '2025-06-09'),
+])
+
+
+def courses(start='2025-03-31', end='2025-06-09', location='Olin 310'):
+    return CourseTable(
+        ['CS 201-00 - Data Structures', 'MATH 232-01 - Linear Algebra'],
+        [f'MWF | 8:30 AM - 9:40 AM | {location}', 'TTH | 1:15 PM - 3:00 PM | Weitz Center 236'],
+        np.full(2, start, dtype='datetime64[ns]'),
+        np.full(2, end, dtype='datetime64[ns]'),
+        np.arange(2),
+    )
+
+
+def uids(table):
+    return list(parse_meeting_patterns(table, MessageLog(), CALENDAR).uid)
+
+
+def test_moving_a_term_date_keeps_the_uids():
+    assert uids(courses(start='2025-04-01')) == uids(courses())
+    assert uids(courses(end='2025-06-06')) == uids(courses())
+
+
+def test_dates_outside_every_term_still_key_the_uid():
+    assert uids(courses(start='2030-04-01', end='2030-06-01')) != uids(courses(start='2030-04-02', end='2030-06-01'))
+
+
+def test_a_moved_date_is_a_change_not_a_new_event(monkeypatch):
+    monkeypatch.setattr(calendar_diff, 'parse_meeting_patterns',
+                        lambda table, ui: parse_meeting_patterns(table, ui, CALENDAR))
+    previous = {uid: (0, event) for uid, event in calendar_diff.current_events(courses(), MessageLog()).items()}
+    diff = calendar_diff.diff_events(previous, calendar_diff.current_events(courses(start='2025-04-01'), MessageLog()))
+    # The Tuesday/Thursday class meets first on April 1 either way
+    assert [len(diff[kind]) for kind in ('added', 'changed', 'unchanged', 'cancelled')] == [0, 1, 1, 0]
+    assert str(diff['changed'][0][1]['SUMMARY']).startswith('CS 201-00')
+
+
+def test_sequence_counts_up_across_revisions(monkeypatch):
+    monkeypatch.setattr(calendar_diff, 'parse_meeting_patterns',
+                        lambda table, ui: parse_meeting_patterns(table, ui, CALENDAR))
+    download = create_ics_file(courses(), ui=MessageLog(), calendar=CALENDAR)
+    sent = [download]
+    for revision, room in enumerate(['Olin 141', 'Olin 149', 'Anderson 329'], start=1):
+        previous = calendar_diff.previous_from_ics(*sent)
+        diff = calendar_diff.diff_events(previous, calendar_diff.current_events(courses(location=room), MessageLog()))
+        assert [sequence for sequence, _ in diff['changed']] == [revision]
+        assert [sequence for sequence, _ in diff['unchanged']] == [0]
+        update = calendar_diff.render_update(diff)
+        assert Calendar.from_ical(update).walk('VEVENT')[0]['DTSTAMP']
+        sent.append(update)
+
+
+def test_a_cancellation_stays_cancelled():
+    download = create_ics_file(courses(), ui=MessageLog(), calendar=CALENDAR)
+    previous = calendar_diff.previous_from_ics(download)
+    cancelled = {'added': [], 'changed': [], 'unchanged': [],
+                 'cancelled': [(1, event) for _, event in list(previous.values())[:1]]}
+    update = calendar_diff.render_update(cancelled)
+    assert len(calendar_diff.previous_from_ics(download, update)) == 1
+    # Order of the files does not matter
+    assert len(calendar_diff.previous_from_ics(update, download)) == 1
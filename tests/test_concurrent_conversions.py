@@ -0,0 +1,39 @@
+# Simultaneous conversions must each get their own calendar, built in memory
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from icalendar import Calendar
+
+from converter import create_ics_file, process_excel
+from result_cache import MessageLog
+from workday_fixtures import workbook_bytes
+
+UPLOADS = 12
+
+
+def convert(data):
+    courses = process_excel(io.BytesIO(data), ui=MessageLog())
+    return courses, create_ics_file(courses, ui=MessageLog())
+
+
+def summaries(ics_bytes):
+    return {str(event['SUMMARY']) for event in Calendar.from_ical(ics_bytes).walk('VEVENT')}
+
+
+def test_simultaneous_conversions_get_their_own_calendar(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    uploads = [workbook_bytes(sections=3 + i, seed=i) for i in range(UPLOADS)]
+    expected = [set(map(str, process_excel(io.BytesIO(data), ui=MessageLog()).section)) for data in uploads]
+    # Every upload has different sections, so a calendar handed to the wrong session shows
+    assert len({frozenset(sections) for sections in expected}) == UPLOADS
+
+    with ThreadPoolExecutor(max_workers=UPLOADS) as pool:
+        # Each upload twice, all in flight at once
+        results = list(pool.map(convert, uploads * 2))
+
+    for i, (courses, ics_bytes) in enumerate(results):
+        assert ics_bytes is not None
+        assert summaries(ics_bytes) == expected[i % UPLOADS]
+    assert os.listdir(tmp_path) == []
+    assert not os.path.exists('schedule.ics')
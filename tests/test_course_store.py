@@ -0,0 +1,105 @@
+# Parsed course tables kept on disk, and rebuilt from their sources when the
+# parser or the stored schema changes
+import io
+
+import numpy as np
+
+import course_store
+from converter import process_excel
+from course_store import CourseStore
+from records import CourseTable
+from result_cache import MessageLog, upload_key
+from workday_fixtures import combined_workbook_bytes, printout_bytes, workbook_bytes
+
+
+def counting_parses(monkeypatch):
+    parsed = []
+    parse_source = course_store.parse_source
+
+    def counting(data, suffix, ui=None):
+        parsed.append(suffix)
+        return parse_source(data, suffix, ui)
+
+    monkeypatch.setattr(course_store, 'parse_source', counting)
+    return parsed
+
+
+def test_a_stored_table_is_the_parsed_one(tmp_path):
+    raw = combined_workbook_bytes(terms=2, per='block', sections=4)
+    store = CourseStore(str(tmp_path))
+    key, courses = store.load_or_parse(raw, ui=MessageLog())
+    assert key == upload_key(raw)
+    assert store.keys() == [key]
+    expected = process_excel(io.BytesIO(raw), ui=MessageLog()).to_frame()
+    assert courses.to_frame().equals(expected)
+    assert store.get(key).to_frame().equals(expected)
+    assert store.metadata(key) == {'schema_version': course_store.SCHEMA_VERSION,
+                                   'parser_version': course_store.PARSER_VERSION, 'source_suffix': '.xlsx'}
+    assert (tmp_path / f'{key}.source.xlsx').read_bytes() == raw
+
+
+def test_an_upload_is_parsed_once(tmp_path, monkeypatch):
+    parsed = counting_parses(monkeypatch)
+    raw = workbook_bytes(sections=3)
+    first = CourseStore(str(tmp_path)).load_or_parse(raw)
+    second = CourseStore(str(tmp_path)).load_or_parse(raw)
+    assert parsed == ['.xlsx']
+    assert first[0] == second[0]
+    assert second[1].to_frame().equals(first[1].to_frame())
+
+
+def test_missing_patterns_and_terms_are_stored_as_nulls(tmp_path):
+    store = CourseStore(str(tmp_path))
+    table = CourseTable(['CS 201-00', 'MATH 232-01'], ['MWF | 8:30 AM - 9:40 AM | Olin 310', np.nan],
+                        np.array(['2025-03-31'] * 2, dtype='datetime64[ns]'),
+                        np.array(['2025-06-09'] * 2, dtype='datetime64[ns]'), [3, 4])
+    store.put('k', table)
+    stored = store.get('k')
+    assert list(stored.pattern) == ['MWF | 8:30 AM - 9:40 AM | Olin 310', None]
+    assert list(stored.term) == [None, None]
+    assert list(stored.row) == [3, 4]
+    assert store.get('missing') is None and store.stamp('missing') is None
+
+
+def test_a_table_from_another_parser_is_parsed_again(tmp_path, monkeypatch):
+    store = CourseStore(str(tmp_path))
+    key, _ = store.load_or_parse(workbook_bytes(sections=3))
+    monkeypatch.setattr(course_store, 'PARSER_VERSION', course_store.PARSER_VERSION + 1)
+    assert not store.is_current(key)
+    assert store.get(key) is None
+    parsed = counting_parses(monkeypatch)
+    store.load_or_parse(workbook_bytes(sections=3))
+    assert parsed == ['.xlsx']
+    assert store.is_current(key)
+
+
+def test_rebuild_reparses_outdated_entries(tmp_path, monkeypatch):
+    store = CourseStore(str(tmp_path))
+    xlsx_key, _ = store.load_or_parse(workbook_bytes(sections=3))
+    pdf_key, pdf_courses = store.load_or_parse(printout_bytes(sections=4, trailer_pages=1), suffix='.pdf')
+    assert len(pdf_courses) == 4
+    assert store.rebuild() == ([], [])
+
+    # A new schema makes every entry outdated
+    monkeypatch.setattr(course_store, 'SCHEMA_VERSION', course_store.SCHEMA_VERSION + 1)
+    stamps = {key: store.stamp(key) for key in store.keys()}
+    parsed = counting_parses(monkeypatch)
+    rebuilt, failed = store.rebuild()
+    assert sorted(rebuilt) == sorted([xlsx_key, pdf_key]) and failed == []
+    assert sorted(parsed) == ['.pdf', '.xlsx']
+    assert all(store.is_current(key) and store.stamp(key) != stamps[key] for key in rebuilt)
+    assert store.metadata(pdf_key)['source_suffix'] == '.pdf'
+    assert len(store.get(pdf_key)) == 4
+
+    # Nothing is left to do, unless forced
+    assert store.rebuild() == ([], [])
+    assert sorted(store.rebuild(force=True)[0]) == sorted([xlsx_key, pdf_key])
+
+
+def test_an_entry_without_its_source_cannot_be_rebuilt(tmp_path, monkeypatch):
+    store = CourseStore(str(tmp_path))
+    store.put('orphan', process_excel(io.BytesIO(workbook_bytes(sections=2)), ui=MessageLog()))
+    key, _ = store.load_or_parse(workbook_bytes(sections=3))
+    monkeypatch.setattr(course_store, 'PARSER_VERSION', course_store.PARSER_VERSION + 1)
+    assert store.rebuild(ui=MessageLog()) == ([key], ['orphan'])
+    assert course_store.main([str(tmp_path)]) == 1
@@ -0,0 +1,131 @@
+# Every download format agrees with the .ics, written from one parse
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import numpy as np
+from icalendar import Calendar
+
+import exports
+from academic_calendar import AcademicCalendar
+from converter import create_ics_file
+from exports import CSV_COLUMNS, FORMATS, bundle_bytes, export_schedule
+from records import CourseTable
+from recurrence import expand_occurrences
+from result_cache import MessageLog
+
+CALENDAR = AcademicCalendar([
+    ('term', '2025 Spring Term', '2025-03-31', '2025-06-06'),
+    ('break', 'Spring Midterm Break', '2025-05-02', '2025-05-05'),
+])
+STAMP = datetime(2025, 3, 20, 14, 5, 9, tzinfo=timezone.utc)
+
+
+def courses():
+    return CourseTable(
+        ['CS 201-00 - Data Structures', 'MATH 232-01 - Linear Algebra', 'ART 110-00 - Drawing'],
+        ['MWF | 8:30 AM - 9:40 AM | Olin 310, Lab',
+         'TTH | 1:15 PM - 3:00 PM | Weitz Center 236\nM | 7:00 PM - 9:00 PM | Olin 141',
+         # Only meets on Fridays, which its two-day range below never reaches
+         'F | 10:00 AM - 11:00 AM | Boliou 104'],
+        np.array(['2025-03-31', '2025-03-31', '2025-03-31'], dtype='datetime64[ns]'),
+        np.array(['2025-06-06', '2025-06-06', '2025-04-01'], dtype='datetime64[ns]'),
+        np.arange(3),
+    )
+
+
+def export(formats=None, **kwargs):
+    log = MessageLog()
+    meetings, files = export_schedule(courses(), ui=log, formats=formats, calendar=CALENDAR, stamp=STAMP, **kwargs)
+    return meetings, files, log
+
+
+def test_the_ics_is_the_one_create_ics_file_writes():
+    for backend in ('icalendar', 'stream'):
+        _, files, _ = export(['ics'], ics_backend=backend)
+        assert files['ics'] == create_ics_file(courses(), ui=MessageLog(), backend=backend, calendar=CALENDAR,
+                                               stamp=STAMP)
+
+
+def test_jcal_matches_the_ics():
+    meetings, files, _ = export(['ics', 'jcal'])
+    name, properties, events = json.loads(files['jcal'])
+    assert name == 'vcalendar'
+    assert ['version', {}, 'text', '2.0'] in properties
+
+    ics_events = {str(event['UID']): event for event in Calendar.from_ical(files['ics']).walk('VEVENT')}
+    # The drawing class never meets, so neither calendar has it
+    assert len(events) == len(ics_events) == len(meetings) - 1
+    for _, props, components in events:
+        values = {prop[0]: prop[3:] for prop in props}
+        event = ics_events[values['uid'][0]]
+        assert values['summary'] == [str(event['SUMMARY'])]
+        assert values['dtstart'] == [event['DTSTART'].dt.isoformat()]
+        assert values['dtstamp'] == ['2025-03-20T14:05:09Z']
+        assert values['rrule'][0]['until'] == '2025-06-06T23:59:59'
+        assert values['rrule'][0]['byday'] == event['RRULE']['BYDAY']
+        assert components == []
+    exdates = [prop[3:] for _, props, _ in events for prop in props if prop[0] == 'exdate']
+    # Monday May 5 and Friday May 2 are in the break
+    assert ['2025-05-02T08:30:00', '2025-05-05T08:30:00'] in exdates
+    assert ['2025-05-05T19:00:00'] in exdates
+
+
+def test_csv_has_a_row_per_class_held():
+    meetings, files, _ = export(['csv'])
+    data = files['csv']
+    assert data.startswith(b'\xef\xbb\xbf')
+    assert b'\r\n' in data
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+    assert rows[0] == CSV_COLUMNS
+    assert len(rows) - 1 == len(expand_occurrences(meetings))
+    held = [row for row in rows[1:] if row[0].startswith('CS 201-00')]
+    # Ten weeks of MWF, less the Friday and Monday of the break
+    assert len(held) == 28
+    assert held[0] == ['CS 201-00 - Data Structures', '03/31/2025', '08:30 AM', '03/31/2025', '09:40 AM', 'False',
+                       'Olin 310, Lab', 'MWF | 8:30 AM - 9:40 AM | Olin 310, Lab']
+    assert not {'05/02/2025', '05/05/2025'} & {row[1] for row in held}
+
+
+def test_json_lists_every_weekly_meeting():
+    meetings, files, _ = export(['json'])
+    records = json.loads(files['json'])['meetings']
+    assert [record['uid'] for record in records] == list(meetings.uid)
+    by_section = {(record['section'], record['start_time']): record for record in records}
+    cs = by_section[('CS 201-00 - Data Structures', '08:30')]
+    assert cs['days'] == ['MO', 'WE', 'FR'] and cs['end_time'] == '09:40'
+    assert (cs['start_date'], cs['end_date'], cs['first_date']) == ('2025-03-31', '2025-06-06', '2025-03-31')
+    assert cs['skipped_dates'] == ['2025-05-02', '2025-05-05']
+    assert by_section[('MATH 232-01 - Linear Algebra', '19:00')]['skipped_dates'] == ['2025-05-05']
+    assert by_section[('ART 110-00 - Drawing', '10:00')]['first_date'] is None
+
+
+def test_a_failing_format_is_reported_and_left_out(monkeypatch):
+    def write_broken(meetings, first_dates, stamp):
+        raise ValueError("no room left")
+        yield b''
+
+    monkeypatch.setitem(FORMATS, 'broken', {'extension': '.txt', 'mime': 'text/plain', 'label': 'Broken',
+                                            'write': write_broken})
+    _, files, log = export(['ics', 'broken', 'json'])
+    assert list(files) == ['ics', 'json']
+    assert ('error', "Failed to create the Broken file: no room left") in log.messages
+    assert ('success', "Calendar file created successfully!") in log.messages
+
+
+def test_every_format_is_registered_in_order():
+    assert list(FORMATS) == ['ics', 'jcal', 'csv', 'json']
+    assert exports.file_name('jcal') == 'myCarletonSchedule.jcal.json'
+    _, files, _ = export()
+    assert list(files) == list(FORMATS)
+
+
+def test_the_bundle_holds_each_export():
+    _, files, _ = export()
+    with zipfile.ZipFile(io.BytesIO(bundle_bytes(files, basename='spring'))) as archive:
+        assert archive.namelist() == ['spring.ics', 'spring.jcal.json', 'spring.csv', 'spring.json']
+        for name, data in files.items():
+            assert archive.read(f'spring{FORMATS[name]["extension"]}') == data
+        assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in archive.infolist())
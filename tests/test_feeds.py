@@ -0,0 +1,79 @@
+# The /feeds handler: conditional polls, gzip and its own ETag
+import gzip
+import tempfile
+
+from tornado.testing import AsyncHTTPTestCase
+
+from api import ConversionQueue, accepts_gzip, make_app
+from course_store import CourseStore
+from feeds import FeedCache, feed_path
+from result_cache import MessageLog
+from workday_fixtures import workbook_bytes
+
+
+def test_accepts_gzip_reads_the_q_values():
+    assert accepts_gzip('gzip')
+    assert accepts_gzip('br, gzip;q=0.5, deflate')
+    assert accepts_gzip('GZIP ; Q=1')
+    assert accepts_gzip('*')
+    assert not accepts_gzip('')
+    assert not accepts_gzip('identity')
+    assert not accepts_gzip('gzip;q=0')
+    assert not accepts_gzip('gzip; q=0.000, deflate')
+    # An explicit entry wins over the wildcard
+    assert not accepts_gzip('*, gzip;q=0')
+    assert not accepts_gzip('*;q=0')
+
+
+class FeedHandlerTest(AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        store = CourseStore(self.root.name)
+        self.key, _ = store.load_or_parse(workbook_bytes(sections=4), ui=MessageLog())
+        self.feeds = FeedCache(store)
+        self.queue = ConversionQueue(workers=1, queue_size=0)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.queue.shutdown()
+        self.root.cleanup()
+
+    def get_app(self):
+        return make_app(self.queue, feeds=self.feeds)
+
+    def poll(self, **headers):
+        # Tornado's client asks for gzip and unpacks it unless told not to
+        return self.fetch(feed_path(self.key), headers=headers, decompress_response=False)
+
+    def test_a_matching_etag_gets_304(self):
+        first = self.poll(**{'Accept-Encoding': 'identity'})
+        assert first.code == 200
+        assert first.body.startswith(b'BEGIN:VCALENDAR')
+        again = self.poll(**{'Accept-Encoding': 'identity', 'If-None-Match': first.headers['Etag']})
+        assert again.code == 304
+        assert again.body == b''
+        assert self.feeds.stats()['renders'] == 1
+
+    def test_gzip_has_its_own_etag(self):
+        plain = self.poll(**{'Accept-Encoding': 'identity'})
+        packed = self.poll(**{'Accept-Encoding': 'gzip'})
+        assert packed.code == 200
+        assert packed.headers['Content-Encoding'] == 'gzip'
+        assert packed.headers['Vary'] == 'Accept-Encoding'
+        assert gzip.decompress(packed.body) == plain.body
+        assert packed.headers['Etag'] != plain.headers['Etag']
+        # Each ETag only validates its own representation
+        assert self.poll(**{'Accept-Encoding': 'gzip', 'If-None-Match': packed.headers['Etag']}).code == 304
+        assert self.poll(**{'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['Etag']}).code == 200
+
+    def test_gzip_refused_with_q_zero_is_not_sent(self):
+        response = self.poll(**{'Accept-Encoding': 'gzip;q=0, identity'})
+        assert response.code == 200
+        assert 'Content-Encoding' not in response.headers
+        assert response.body.startswith(b'BEGIN:VCALENDAR')
+
+    def test_an_unknown_key_is_404(self):
+        response = self.fetch(feed_path('0' * 64))
+        assert response.code == 404
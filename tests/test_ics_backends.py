@@ -0,0 +1,81 @@
+# The streaming writer must produce the icalendar backend's bytes exactly
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from icalendar import Calendar
+
+from converter import create_ics_file
+from records import CourseTable
+from result_cache import MessageLog
+
+SECTIONS = [
+    'CS 111-00 - Intro, Part 1; Lab',
+    'MATH 232-01 - Linear Algebra \\ Proofs',
+    'FREN 204-00 - Français intermédiaire: café, crème & naïveté',
+    'HIST 398-02 - ' + 'A Very Long Seminar Title About Historiography ' * 3,
+    'JAPN 101-00 - 日本語の入門コース、初級クラスです。長いタイトルのテスト用の文字列',
+]
+PATTERNS = [
+    'MWF | 8:30 AM - 9:40 AM | Hulings Hall 120, Lab; Room \\ B',
+    'TTH | 1:15 PM - 3:00 PM | Weitz Center 236\nM | 7:00 PM - 9:00 PM | Olin 141',
+    'MTWTHF | 12:00 PM - 12:50 PM | Café Boliou — Salle à manger ' + 'très longue ' * 6,
+    'W | 3:10 PM - 4:55 PM | Leighton 304\nW | 3:10 PM - 4:55 PM | Leighton 304',
+    'TH | 10:10 AM - 11:55 AM | 図書館 ' + 'セミナー室' * 12,
+]
+
+
+def courses():
+    size = len(SECTIONS)
+    # Spring 2025, so the midterm break adds EXDATEs
+    return CourseTable(SECTIONS, PATTERNS,
+                       np.full(size, '2025-03-31', dtype='datetime64[ns]'),
+                       np.full(size, '2025-06-04', dtype='datetime64[ns]'),
+                       np.arange(size))
+
+
+STAMP = datetime(2025, 3, 20, 14, 5, 9, 123456, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope='module')
+def calendars():
+    table = courses()
+    return (create_ics_file(table, ui=MessageLog(), backend='icalendar', stamp=STAMP),
+            create_ics_file(table, ui=MessageLog(), backend='stream', stamp=STAMP))
+
+
+def test_stream_backend_writes_the_same_bytes(calendars):
+    icalendar_bytes, stream_bytes = calendars
+    assert stream_bytes == icalendar_bytes
+
+
+def test_output_covers_the_awkward_cases(calendars):
+    text = calendars[1]
+    assert b'\\,' in text and b'\\;' in text and b'\\\\' in text
+    assert b'EXDATE:' in text
+    lines = text.split(b'\r\n')
+    assert any(line.startswith(b' ') for line in lines)
+    assert max(map(len, lines)) <= 75
+    # Folding never splits a multi-byte character
+    for line in lines:
+        line.decode('utf-8')
+
+
+def test_stream_output_round_trips(calendars):
+    icalendar_bytes, stream_bytes = calendars
+    events = [{name: event[name].to_ical() for name in event} for event in Calendar.from_ical(stream_bytes).walk('VEVENT')]
+    expected = [{name: event[name].to_ical() for name in event} for event in Calendar.from_ical(icalendar_bytes).walk('VEVENT')]
+    assert events == expected
+    summaries = {str(event['SUMMARY']) for event in Calendar.from_ical(stream_bytes).walk('VEVENT')}
+    assert summaries == set(SECTIONS)
+    locations = {str(event['LOCATION']) for event in Calendar.from_ical(stream_bytes).walk('VEVENT')}
+    assert 'Hulings Hall 120, Lab; Room \\ B' in locations
+    # The repeated Leighton line is one meeting; distinct UIDs throughout
+    uids = [str(event['UID']) for event in Calendar.from_ical(stream_bytes).walk('VEVENT')]
+    assert len(uids) == len(set(uids)) == 6
+
+
+def test_every_event_has_a_dtstamp(calendars):
+    for ics_bytes in calendars:
+        events = Calendar.from_ical(ics_bytes).walk('VEVENT')
+        assert events and all(event['DTSTAMP'].to_ical() == b'20250320T140509Z' for event in events)
@@ -0,0 +1,86 @@
+# Sheet layouts are resolved once and then looked up; rows standing in for a
+# header that was not found never take a place in the cache
+import io
+
+from openpyxl import Workbook
+
+import converter
+from converter import process_excel
+from layout_cache import LayoutCache, normalize_header, resolve_columns
+from result_cache import MessageLog
+from workday_fixtures import HEADER, workbook_bytes
+
+
+def renamed(header, index, name):
+    return tuple(name if i == index else cell for i, cell in enumerate(header))
+
+
+def test_a_known_layout_is_a_hit():
+    cache = LayoutCache()
+    plan = cache.plan(0, tuple(HEADER))
+    assert plan == (5, 9, 11, 12, 10)
+    assert cache.plan(0, tuple(HEADER)) == plan
+    assert cache.plan(0, list(HEADER)) == plan
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['layouts']) == (2, 1, 1)
+    assert stats['common'][0]['uploads'] == 3
+
+
+def test_another_offset_or_header_is_a_miss():
+    cache = LayoutCache()
+    cache.plan(0, tuple(HEADER))
+    cache.plan(1, tuple(HEADER))
+    # Trailing blanks read from a wider sheet make another fingerprint but the same plan
+    assert cache.plan(0, tuple(HEADER) + (None,)) == cache.plan(0, tuple(HEADER))
+    assert cache.plan(0, renamed(HEADER, 5, 'Course Section')) == (5, 9, 11, 12, 10)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 4, 4)
+
+
+def test_the_least_recently_used_layout_is_evicted():
+    cache = LayoutCache(max_entries=2)
+    first, second, third = (renamed(HEADER, 0, f'Listing {n}') for n in range(3))
+    cache.plan(0, first)
+    cache.plan(0, second)
+    cache.plan(0, first)
+    cache.plan(0, third)
+    assert cache.evictions == 1
+    assert [entry['header'][0] for entry in cache.stats()['common']] == ['listing 0', 'listing 2']
+    # The evicted layout is worked out again
+    cache.plan(0, second)
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 4, 2)
+
+
+def test_uncached_plans_leave_the_cache_alone():
+    cache = LayoutCache(max_entries=1)
+    plan = cache.plan(0, tuple(HEADER))
+    row = ('CS 111-00', 'MWF | 8:30 AM - 9:40 AM | Olin 310')
+    assert cache.plan(0, row, cache=False) == resolve_columns(normalize_header(row))
+    assert cache.plan(0, tuple(HEADER)) == plan
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['uncached']) == (1, 1, 0, 1)
+
+
+def headerless_workbook(section):
+    # Two-cell rows after the banner, so no row looks like a header
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['View My Courses'])
+    sheet.append(['My Enrolled Courses'])
+    sheet.append([f'CS {section}-00', 'MWF | 8:30 AM - 9:40 AM | Olin 310'])
+    sheet.append(['MATH 232-01', 'TTH | 1:15 PM - 3:00 PM | Olin 141'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_sheets_without_a_header_do_not_evict_layouts(monkeypatch):
+    cache = LayoutCache(max_entries=1)
+    monkeypatch.setattr(converter, 'layouts', cache)
+    process_excel(io.BytesIO(workbook_bytes(sections=3)), ui=MessageLog())
+    for section in range(100, 110):
+        log = MessageLog()
+        process_excel(io.BytesIO(headerless_workbook(section)), ui=log)
+        assert ('warning', "Could not identify header row. Using row after 'My Enrolled Courses'.") in log.messages
+    process_excel(io.BytesIO(workbook_bytes(sections=4, seed=1)), ui=MessageLog())
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['uncached']) == (1, 1, 0, 10)
@@ -0,0 +1,86 @@
+# The line-by-line parser for small uploads must match the pandas one exactly
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import converter
+from converter import SMALL_TABLE_COURSES, parse_meeting_frame, parse_meeting_lines, parse_meeting_patterns
+from records import CourseTable
+from result_cache import MessageLog
+
+DAY_CODES = ['M', 'TTH', 'MWF', 'MTWTHF', 'W', 'th', ' F ', 'XYZ', 'MX', '']
+TIMES = ['8:30 AM', '08:30 am', '1:10 PM', '12:00 AM', '12:00 PM', '13:30 PM', '8:30AM', '8:5 AM',
+         '8:30  AM', ' 9:40 AM ', '9:40', 'noon']
+LOCATIONS = ['Hulings Hall 120', 'Weitz Center 236, Lab', 'Online; Zoom', 'Café 1', '']
+ODD_LINES = ['MWF 8:30 AM - 9:40 AM Hulings', 'TBA', 'M | 8:30 AM to 9:40 AM | Boliou 104', '   ']
+
+
+def random_line(rng):
+    if rng.random() < 0.1:
+        return rng.choice(ODD_LINES)
+    return f"{rng.choice(DAY_CODES)} | {rng.choice(TIMES)} - {rng.choice(TIMES)} | {rng.choice(LOCATIONS)}"
+
+
+def random_courses(rng, size):
+    patterns = []
+    for _ in range(size):
+        if rng.random() < 0.1:
+            patterns.append(rng.choice([None, np.nan, '', 42]))
+            continue
+        lines = [random_line(rng) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.2:
+            # Workday sometimes repeats a line
+            lines.append(lines[0])
+        patterns.append('\n'.join(lines))
+    return CourseTable(
+        [f"CS {100 + i}-0{i % 3} - Course {i % 7}" for i in range(size)],
+        patterns,
+        np.full(size, '2025-03-31', dtype='datetime64[ns]'),
+        np.full(size, '2025-06-09', dtype='datetime64[ns]'),
+        np.arange(size),
+    )
+
+
+def parse_with(parse, courses):
+    log = MessageLog()
+    table = parse(courses, log)
+    return (None if table is None else table.to_frame()), log.messages
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_small_table_parser_matches_pandas(seed):
+    courses = random_courses(random.Random(seed), 1 + seed % 12)
+    lines_frame, lines_messages = parse_with(parse_meeting_lines, courses)
+    pandas_frame, pandas_messages = parse_with(parse_meeting_frame, courses)
+    assert lines_messages == pandas_messages
+    if pandas_frame is None:
+        assert lines_frame is None
+    else:
+        pd.testing.assert_frame_equal(lines_frame, pandas_frame)
+
+
+def test_threshold_does_not_change_the_table(monkeypatch):
+    courses = random_courses(random.Random(7), SMALL_TABLE_COURSES + 20)
+    tables = []
+    for threshold in (0, len(courses) + 1):
+        monkeypatch.setattr(converter, 'SMALL_TABLE_COURSES', threshold)
+        tables.append(parse_meeting_patterns(courses, MessageLog()).to_frame())
+    pd.testing.assert_frame_equal(*tables)
+
+
+def test_undated_meetings_are_skipped():
+    frame = pd.DataFrame({
+        'Section': ['CS 111-00 - Undated', 'CS 112-00 - No end', 'CS 113-00 - Dated'],
+        'Meeting Patterns': ['M | 8:30 AM - 9:40 AM | Olin 141', 'T | 8:30 AM - 9:40 AM | Olin 141',
+                             'W | 8:30 AM - 9:40 AM | Olin 141'],
+        'Start Date': [pd.NaT, pd.Timestamp('2025-04-01'), pd.Timestamp('2025-04-01')],
+        'End Date': [pd.Timestamp('2025-06-01'), pd.NaT, pd.Timestamp('2025-06-01')],
+    })
+    log = MessageLog()
+    for backend in ('icalendar', 'stream'):
+        ics_bytes = converter.create_ics_file(frame, ui=log, backend=backend)
+        assert b'CS 113-00' in ics_bytes
+        assert b'CS 111-00' not in ics_bytes and b'CS 112-00' not in ics_bytes
+    assert sum('no start or end date' in body for _, body in log.messages) == 4
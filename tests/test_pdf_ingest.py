@@ -0,0 +1,89 @@
+# The PDF printout reads into the same table as the workbook, and stops at the
+# end of the enrolled courses
+import io
+from concurrent.futures import Future
+
+import pytest
+
+import pdf_ingest
+from converter import process_excel
+from pdf_ingest import process_pdf
+from result_cache import MessageLog
+from workday_fixtures import TRAILERS, printout_bytes, workbook_bytes
+
+
+class LazyExecutor:
+    # Runs a page only when its result is asked for, so the pages that were
+    # submitted but never needed are the ones left to cancel
+
+    def __init__(self):
+        self.submitted = []
+        self.parsed = []
+        self.futures = []
+
+    def submit(self, fn, pdf_bytes, page_number):
+        executor = self
+        self.submitted.append(page_number)
+
+        class PageFuture(Future):
+            def result(self, timeout=None):
+                if not self.done():
+                    executor.parsed.append(page_number)
+                    self.set_result(fn(pdf_bytes, page_number))
+                return super().result(timeout)
+
+        self.futures.append(PageFuture())
+        return self.futures[-1]
+
+
+def columns(courses):
+    return list(courses.section), list(courses.pattern), list(courses.start_date), list(courses.end_date)
+
+
+def test_the_printout_reads_like_the_workbook():
+    # The enrolled table runs onto a second page and repeats its header there
+    log = MessageLog()
+    courses = process_pdf(printout_bytes(sections=40, trailer_pages=1), ui=log, workers=1)
+    workbook = process_excel(io.BytesIO(workbook_bytes(sections=40, trailers=TRAILERS[:1])), ui=MessageLog())
+    assert columns(courses) == columns(workbook)
+    assert log.messages == []
+
+
+def test_paths_and_file_objects_are_read(tmp_path):
+    raw = printout_bytes(sections=5, trailer_pages=0)
+    path = tmp_path / 'printout.pdf'
+    path.write_bytes(raw)
+    assert len(process_pdf(str(path), ui=MessageLog(), workers=1)) == 5
+    assert len(process_pdf(io.BytesIO(raw), ui=MessageLog(), workers=1)) == 5
+
+
+def test_pages_after_the_end_marker_are_not_parsed(monkeypatch):
+    parsed = []
+    page_rows = pdf_ingest.page_rows
+
+    def recording(pdf_bytes, page_number):
+        parsed.append(page_number)
+        return page_rows(pdf_bytes, page_number)
+
+    monkeypatch.setattr(pdf_ingest, 'page_rows', recording)
+    # Enrolled courses on pages 0 and 1, then eight pages of waitlist
+    courses = process_pdf(printout_bytes(sections=40, trailer_pages=8), ui=MessageLog(), workers=1)
+    assert len(courses) == 40
+    assert parsed == [0, 1]
+
+
+def test_pages_in_flight_past_the_end_marker_are_cancelled():
+    executor = LazyExecutor()
+    courses = process_pdf(printout_bytes(sections=40, trailer_pages=8), ui=MessageLog(), workers=3, executor=executor)
+    assert len(courses) == 40
+    assert executor.parsed == [0, 1]
+    # Three pages are kept in flight, so two more went out before the marker turned up
+    assert executor.submitted == [0, 1, 2, 3, 4]
+    assert [future.cancelled() for future in executor.futures] == [False, False, True, True, True]
+
+
+def test_a_printout_over_the_page_limit_is_rejected_before_parsing(monkeypatch):
+    monkeypatch.setattr(pdf_ingest, 'page_rows', lambda *args: pytest.fail("a page was parsed"))
+    log = MessageLog()
+    assert process_pdf(printout_bytes(sections=5, trailer_pages=6), ui=log, workers=1, limits={'max_pages': 5}) is None
+    assert log.messages[0] == ('error', "The PDF has 7 pages; a 'View My Courses' printout has far fewer (limit 5).")
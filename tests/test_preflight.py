@@ -0,0 +1,153 @@
+# Uploads that preflight must turn away before openpyxl or pdfplumber parses
+# them, and the banner counts the parser relies on
+import io
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+import preflight
+from preflight import (UploadRejected, banner_counts, capped_rows, inspect_pdf, inspect_xlsx, preflight_pdf,
+                       preflight_xlsx)
+from result_cache import MessageLog
+from workday_fixtures import combined_workbook_bytes, printout_bytes, workbook_bytes
+
+
+def with_members(raw, members):
+    # The workbook with extra zip members added
+    buffer = io.BytesIO(raw)
+    with zipfile.ZipFile(buffer, 'a', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def sheet_bytes(*sheets):
+    # A workbook with one sheet per list of rows
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for index, rows in enumerate(sheets):
+        sheet = workbook.create_sheet(f'Sheet {index + 1}')
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def rejection(raw, **limits):
+    with pytest.raises(UploadRejected) as excinfo:
+        inspect_xlsx(io.BytesIO(raw), limits)
+    return str(excinfo.value)
+
+
+def test_a_workday_export_passes():
+    report = inspect_xlsx(io.BytesIO(workbook_bytes(sections=5)))
+    assert report['has_banner'] and report['sheets'] == 1
+    assert preflight_xlsx(io.BytesIO(workbook_bytes(sections=5)), MessageLog())
+
+
+def test_zip_bomb_is_rejected():
+    raw = with_members(workbook_bytes(sections=3), {'xl/media/padding.bin': b'\0' * (4 * 1024 * 1024)})
+    assert 'compressed' in rejection(raw)
+
+
+def test_too_many_entries_are_rejected():
+    raw = with_members(workbook_bytes(sections=3), {f'xl/media/image{i}.bin': b'x' for i in range(30)})
+    assert 'parts' in rejection(raw, max_entries=20)
+
+
+def test_a_renamed_file_is_not_an_xlsx():
+    assert rejection(b'Section,Meeting Patterns\nCS 111-00,MWF\n') == "This is not an Excel .xlsx file."
+    # A zip that isn't a workbook
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('notes.txt', 'hello')
+    assert rejection(buffer.getvalue()) == "This is not an Excel .xlsx file."
+
+
+def test_too_many_sheets_are_rejected():
+    raw = sheet_bytes(*([['My Enrolled Courses']] for _ in range(4)))
+    assert '4 sheets' in rejection(raw, max_sheets=3)
+
+
+def test_declared_size_over_the_caps_is_rejected():
+    raw = sheet_bytes([[f'row {i}'] for i in range(30)])
+    assert '30 rows' in rejection(raw, max_rows=20)
+    raw = sheet_bytes([list(range(12))])
+    assert '12 columns' in rejection(raw, max_columns=10)
+
+
+def test_capped_rows_stops_at_the_caps():
+    rows = [('a', 'b')] * 3
+    assert list(capped_rows(iter(rows), {'max_rows': 3})) == rows
+    with pytest.raises(UploadRejected, match='more than 2 rows'):
+        list(capped_rows(iter(rows), {'max_rows': 2}))
+    with pytest.raises(UploadRejected, match='more than 1 columns'):
+        list(capped_rows(iter(rows), {'max_columns': 1}))
+
+
+def test_missing_banner_is_reported():
+    log = MessageLog()
+    raw = sheet_bytes([['Section', 'Meeting Patterns'], ['CS 111-00', 'MWF | 8:30 AM - 9:40 AM | Olin 310']])
+    assert not preflight_xlsx(io.BytesIO(raw), log)
+    assert log.messages[0] == ('error', "Could not find 'My Enrolled Courses' in the file.")
+
+    log = MessageLog()
+    assert not preflight_xlsx(io.BytesIO(sheet_bytes([['View My Courses']])), log)
+    assert 'only contain the name' in log.messages[0][1]
+
+
+def test_banner_past_the_sniffed_rows_is_left_to_the_parse():
+    raw = sheet_bytes([[f'note {i}'] for i in range(20)] + [['My Enrolled Courses']])
+    assert not inspect_xlsx(io.BytesIO(raw), {'sniff_rows': 10})['has_banner']
+    assert preflight_xlsx(io.BytesIO(raw), MessageLog(), {'sniff_rows': 10})
+
+
+def test_banner_counts(monkeypatch):
+    assert banner_counts(io.BytesIO(workbook_bytes(sections=3))) == {'View My Courses': 1}
+    blocks = combined_workbook_bytes(terms=3, per='block', sections=5)
+    assert banner_counts(io.BytesIO(blocks)) == {'View My Courses': 3}
+    sheets = combined_workbook_bytes(terms=2, per='sheet', sections=5)
+    assert list(banner_counts(io.BytesIO(sheets)).values()) == [1, 1]
+    assert banner_counts(io.BytesIO(b'not a zip')) is None
+
+    # Read in pieces far smaller than a row, the counts are the same
+    monkeypatch.setattr(preflight, 'CHUNK_BYTES', 37)
+    assert banner_counts(io.BytesIO(blocks)) == {'View My Courses': 3}
+
+
+def test_banner_counts_stop_at_the_row_cap(monkeypatch):
+    raw = sheet_bytes([['My Enrolled Courses']] + [['filler']] * 10 + [['My Enrolled Courses']])
+    assert banner_counts(io.BytesIO(raw)) == {'Sheet 1': 2}
+    # The cap is checked once per piece read, here about a row each
+    monkeypatch.setattr(preflight, 'CHUNK_BYTES', 16)
+    assert banner_counts(io.BytesIO(raw), {'max_rows': 5}) == {'Sheet 1': 1}
+
+
+def pdf_rejection(data, **limits):
+    with pytest.raises(UploadRejected) as excinfo:
+        inspect_pdf(data, limits)
+    return str(excinfo.value)
+
+
+def test_a_printout_passes():
+    raw = printout_bytes(sections=5, trailer_pages=2)
+    assert inspect_pdf(raw) == {'bytes': len(raw), 'pages': 3}
+    upload = io.BytesIO(raw)
+    assert preflight_pdf(upload, MessageLog()) == 3
+    assert upload.tell() == 0
+
+
+def test_printouts_over_the_caps_are_rejected():
+    raw = printout_bytes(sections=5, trailer_pages=2)
+    assert 'limit 2' in pdf_rejection(raw, max_pages=2)
+    assert 'uploads are limited' in pdf_rejection(raw, max_bytes=1024)
+
+
+def test_a_renamed_file_is_not_a_pdf():
+    assert pdf_rejection(workbook_bytes(sections=3)) == "This is not a PDF file."
+    assert pdf_rejection(b'%PDF-1.4\nnot really') == "The PDF could not be read."
+    log = MessageLog()
+    assert preflight_pdf(b'hello', log) is None
+    assert log.messages[0] == ('error', "This is not a PDF file.")
@@ -0,0 +1,139 @@
+# The column tables a schedule is held in between parsing and serialization
+from datetime import date, time
+
+import numpy as np
+import pandas as pd
+
+from records import MINUTE_TIMES, CourseTable, MeetingTable, object_array
+
+
+def courses(sections, term=None, first_row=0):
+    return CourseTable(
+        sections,
+        [f'MWF | 8:30 AM - 9:40 AM | Olin {100 + i}' for i in range(len(sections))],
+        np.full(len(sections), '2025-03-31', dtype='datetime64[ns]'),
+        np.full(len(sections), '2025-06-09', dtype='datetime64[ns]'),
+        np.arange(first_row, first_row + len(sections)),
+        term,
+    )
+
+
+def meetings(sections, exdates=None):
+    n = len(sections)
+    return MeetingTable(
+        sections,
+        [('MO', 'WE', 'FR')] * n,
+        [510] * n, [580] * n,
+        ['Olin 310'] * n,
+        ['2025-03-31'] * n, ['2025-06-09'] * n,
+        ['MWF | 8:30 AM - 9:40 AM | Olin 310'] * n,
+        [f'uid-{section}' for section in sections],
+        exdates=exdates,
+    )
+
+
+def test_object_array_keeps_tuples_whole():
+    days = object_array([('MO', 'WE'), ('TU',)])
+    assert days.shape == (2,) and days[0] == ('MO', 'WE')
+    # Already a 1-d object array: returned as is
+    assert object_array(days) is days
+
+
+def test_course_table_round_trips_through_a_frame():
+    table = courses(['CS 201-00', 'MATH 232-01'], term=['2025 Spring Term', None], first_row=7)
+    frame = table.to_frame()
+    assert list(frame.columns) == ['Section', 'Meeting Patterns', 'Start Date', 'End Date', 'Term']
+    assert list(frame.index) == [7, 8]
+    assert frame['Start Date'].dtype == 'datetime64[ns]'
+    assert CourseTable.from_frame(frame).to_frame().equals(frame)
+    # Without terms there is no Term column
+    assert 'Term' not in courses(['CS 201-00']).to_frame()
+
+
+def test_course_table_concat_fills_missing_terms():
+    tagged = courses(['CS 201-00'], term=['2025 Spring Term'])
+    joined = CourseTable.concat([tagged, courses(['MATH 232-01'], first_row=5)])
+    assert list(joined.section) == ['CS 201-00', 'MATH 232-01']
+    assert list(joined.row) == [0, 5]
+    assert list(joined.term) == ['2025 Spring Term', None]
+    assert CourseTable.concat([courses(['CS 201-00']), courses(['MATH 232-01'])]).term is None
+    assert CourseTable.concat([]).empty
+
+
+def test_course_table_by_term_keeps_the_order_of_first_appearance():
+    table = courses(['A', 'B', 'C', 'D'], term=['2025 Winter Term', '2024 Fall Term', '2025 Winter Term', None])
+    assert table.terms() == ['2025 Winter Term', '2024 Fall Term', None]
+    groups = table.by_term()
+    assert list(groups) == ['2025 Winter Term', '2024 Fall Term', None]
+    assert [list(group.section) for group in groups.values()] == [['A', 'C'], ['B'], ['D']]
+    assert list(groups['2025 Winter Term'].term) == ['2025 Winter Term'] * 2
+
+    untagged = courses(['A', 'B'])
+    assert untagged.terms() == [None]
+    assert untagged.by_term() == {None: untagged}
+    assert courses([]).terms() == [] and courses([]).by_term() == {}
+
+
+def test_course_table_take():
+    table = courses(['A', 'B', 'C'], term=['x', 'y', 'z'])
+    taken = table.take(np.array([2, 0]))
+    assert list(taken.section) == ['C', 'A'] and list(taken.term) == ['z', 'x'] and list(taken.row) == [2, 0]
+    assert len(taken) == 2 and not taken.empty
+
+
+def test_meeting_table_copies_its_object_columns():
+    block = pd.DataFrame({'section': ['CS 201-00', 'MATH 232-01'], 'other': ['a', 'b']})
+    sections = block['section'].to_numpy()
+    table = meetings(sections)
+    assert not np.shares_memory(table.section, sections)
+    assert table.start_minute.dtype == np.int16
+    assert table.start_date.dtype == 'datetime64[D]'
+    assert list(table.uid) == ['uid-CS 201-00', 'uid-MATH 232-01']
+    assert list(MeetingTable(['A'], [('MO',)], [0], [60], [''], ['2025-03-31'], ['2025-03-31'], ['']).uid) == [None]
+
+
+def test_meeting_table_concat_names_each_schedule():
+    skipped = np.array(['2025-05-02'], dtype='datetime64[D]')
+    first = meetings(['A', 'B'], exdates=[skipped, skipped[:0]])
+    second = meetings(['C'], exdates=[skipped[:0]])
+    joined = MeetingTable.concat([first, second], ['alice', 'bob'])
+    assert list(joined.section) == ['A', 'B', 'C']
+    assert list(joined.schedule) == ['alice', 'alice', 'bob']
+    assert [len(days) for days in joined.exdates] == [1, 0, 0]
+    # Exdates are only kept when every table has them
+    assert MeetingTable.concat([first, meetings(['C'])], ['alice', 'bob']).exdates is None
+    empty = MeetingTable.concat([], [])
+    assert empty.empty and len(empty.schedule) == 0
+
+
+def test_meeting_table_take_keeps_schedule_and_exdates():
+    skipped = np.array(['2025-05-02'], dtype='datetime64[D]')
+    joined = MeetingTable.concat([meetings(['A', 'B'], exdates=[skipped, skipped[:0]])], ['alice'])
+    taken = joined.take(np.array([1, 0]))
+    assert list(taken.section) == ['B', 'A']
+    assert list(taken.schedule) == ['alice', 'alice']
+    assert [len(days) for days in taken.exdates] == [0, 1]
+
+
+def test_meeting_records_box_one_meeting_at_a_time():
+    skipped = np.array(['2025-05-02'], dtype='datetime64[D]')
+    table = meetings(['A', 'B'], exdates=[skipped, skipped[:0]])
+    records = list(table.records())
+    first = records[0]
+    assert (first.section, first.days, first.location, first.uid) == ('A', ('MO', 'WE', 'FR'), 'Olin 310', 'uid-A')
+    assert first.start_time == time(8, 30) and first.end_time == time(9, 40)
+    # Meetings at the same minute share one time object
+    assert first.start_time is records[1].start_time is MINUTE_TIMES[510]
+    assert (first.start_date, first.end_date) == (date(2025, 3, 31), date(2025, 6, 9))
+    assert first.exdates == [date(2025, 5, 2)] and records[1].exdates == []
+    assert list(meetings(['A']).records())[0].exdates == ()
+
+
+def test_meeting_table_frame():
+    table = MeetingTable.concat([meetings(['A'], exdates=[np.array([], dtype='datetime64[D]')])], ['alice'])
+    frame = table.to_frame()
+    assert list(frame.columns) == ['schedule', 'section', 'days', 'start_time', 'end_time', 'location',
+                                   'start_date', 'end_date', 'pattern', 'uid', 'exdates']
+    assert frame.loc[0, 'start_time'] == time(8, 30)
+    assert frame['start_date'].dtype == 'datetime64[ns]'
+    assert list(meetings(['A']).to_frame().columns)[0] == 'section'
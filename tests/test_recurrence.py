@@ -0,0 +1,83 @@
+# Occurrence expansion against the rules the .ics states
+import numpy as np
+from dateutil.rrule import rrulestr
+from icalendar import Calendar
+
+from academic_calendar import AcademicCalendar
+from converter import create_ics_file, parse_meeting_patterns
+from records import CourseTable, MeetingTable
+from recurrence import expand_occurrences
+from result_cache import MessageLog
+
+CALENDAR = AcademicCalendar([
+    ('term', '2025 Spring Term', '2025-03-31', '2025-06-09'),
+    ('break', 'Spring Midterm Break', '2025-05-02', '2025-05-05'),
+])
+
+
+def monday_meetings(exdates=None):
+    return MeetingTable(
+        ['CS 201-00', 'MATH 232-01'],
+        [('MO',), ('MO',)],
+        [510, 600], [580, 670],
+        ['Olin 310', 'Olin 310'],
+        ['2025-03-31'] * 2, ['2025-06-09'] * 2,
+        ['', ''],
+        exdates=exdates,
+    )
+
+
+def occurrence_days(occurrences, meeting):
+    return list(occurrences.loc[occurrences['meeting'] == meeting, 'start'].dt.strftime('%Y-%m-%d'))
+
+
+def test_each_meeting_skips_only_its_own_exdates():
+    every = occurrence_days(expand_occurrences(monday_meetings()), 0)
+    occurrences = expand_occurrences(monday_meetings([
+        np.array(['2025-04-07'], dtype='datetime64[D]'),
+        np.array(['2025-04-14', '2025-05-26'], dtype='datetime64[D]'),
+    ]))
+    assert occurrence_days(occurrences, 0) == [day for day in every if day != '2025-04-07']
+    assert occurrence_days(occurrences, 1) == [day for day in every if day not in ('2025-04-14', '2025-05-26')]
+
+
+def test_exdates_of_joined_tables_stay_with_their_meetings():
+    first = monday_meetings([np.array(['2025-04-07'], dtype='datetime64[D]'), np.array([], dtype='datetime64[D]')])
+    second = monday_meetings([np.array([], dtype='datetime64[D]'), np.array(['2025-04-07'], dtype='datetime64[D]')])
+    joined = MeetingTable.concat([first, second], ['a', 'b'])
+    occurrences = expand_occurrences(joined)
+    assert [len(occurrence_days(occurrences, meeting)) for meeting in range(4)] == [10, 11, 11, 10]
+
+
+def rule_occurrences(ics_bytes):
+    # {uid: [start, ...]} as dateutil reads each event's RRULE and EXDATEs
+    occurrences = {}
+    for event in Calendar.from_ical(ics_bytes).walk('VEVENT'):
+        rule = rrulestr(event['RRULE'].to_ical().decode('ascii'), dtstart=event['DTSTART'].dt)
+        exdates = event.get('EXDATE', [])
+        exdates = exdates if isinstance(exdates, list) else [exdates]
+        skipped = {day.dt for exdate in exdates for day in exdate.dts}
+        occurrences[str(event['UID'])] = [when for when in rule if when not in skipped]
+    return occurrences
+
+
+def test_the_rule_keeps_a_class_on_the_last_day():
+    # Both meetings end on a day they meet; dateutil read UNTIL=<DATE> as midnight
+    # and dropped that class while expand_occurrences kept it
+    courses = CourseTable(
+        ['CS 201-00', 'MATH 232-01'],
+        ['M | 8:30 AM - 9:40 AM | Olin 310', 'MWF | 1:10 PM - 2:20 PM | Olin 141'],
+        np.array(['2025-03-31', '2025-03-31'], dtype='datetime64[ns]'),
+        np.array(['2025-06-09', '2025-06-09'], dtype='datetime64[ns]'),
+        np.arange(2),
+    )
+    meetings = parse_meeting_patterns(courses, MessageLog(), CALENDAR)
+    expanded = expand_occurrences(meetings)
+    for backend in ('icalendar', 'stream'):
+        rules = rule_occurrences(create_ics_file(courses, ui=MessageLog(), backend=backend, calendar=CALENDAR))
+        for position, uid in enumerate(meetings.uid):
+            starts = [when.to_pydatetime() for when in expanded.loc[expanded['meeting'] == position, 'start']]
+            assert rules[uid] == starts
+            assert rules[uid][-1].date().isoformat() == '2025-06-09'
+        # 11 Mondays less the one in the midterm break
+        assert len(rules[meetings.uid[0]]) == 10
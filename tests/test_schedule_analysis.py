@@ -0,0 +1,162 @@
+# Overlaps within each schedule, room clashes across schedules, and room
+# occupancy that only counts the weeks a meeting is actually held
+import random
+from datetime import time
+
+import numpy as np
+import pytest
+
+from academic_calendar import AcademicCalendar
+from records import MeetingTable
+from recurrence import WEEKDAY_INDEX, expand_occurrences
+from schedule_analysis import (CLASH_COLUMNS, CONFLICT_COLUMNS, OCCUPANCY_COLUMNS, combine_schedules,
+                               describe_conflict, room_clashes, room_occupancy, schedule_conflicts)
+
+CALENDAR = AcademicCalendar([
+    ('term', 'Spring Term', '2025-03-31', '2025-06-06'),
+    ('break', 'Midterm Break', '2025-05-02', '2025-05-05'),
+    ('holiday', 'Memorial Day', '2025-05-26', '2025-05-26'),
+])
+
+
+def meetings():
+    table = MeetingTable(
+        ['CS 201-00', 'MATH 232-01', 'ART 110-00'],
+        [('MO', 'WE', 'FR'), ('TU', 'TH'), ('WE',)],
+        [510, 600, 780], [580, 710, 900],
+        ['Olin 310', 'Olin 310', 'Boliou 104'],
+        ['2025-03-31'] * 3, ['2025-06-06'] * 3,
+        ['', '', ''],
+    )
+    table.exdates = CALENDAR.exdates(table)
+    return table
+
+
+def test_occupancy_leaves_out_skipped_weeks():
+    table = meetings()
+    occupancy = room_occupancy(table).set_index('location')
+
+    # Booked hours over the term, from every occurrence that is held, spread
+    # over the term's weeks
+    occurrences = expand_occurrences(table)
+    hours = (occurrences['end'] - occurrences['start']).dt.total_seconds() / 3600
+    booked = hours.groupby(table.location[occurrences['meeting']]).sum()
+    assert occupancy.loc['Olin 310', 'weekly_hours'] == pytest.approx(booked['Olin 310'] / 10)
+    assert occupancy.loc['Olin 310', 'weekly_hours'] < (3 * 70 + 2 * 110) / 60
+    # No break or holiday falls on a Wednesday
+    assert occupancy.loc['Boliou 104', 'weekly_hours'] == pytest.approx(2)
+    assert occupancy.loc['Olin 310', 'peak_headcount'] == 1
+
+
+def test_occupancy_without_exdates_counts_every_week():
+    table = meetings()
+    table.exdates = None
+    occupancy = room_occupancy(table).set_index('location')
+    assert occupancy.loc['Olin 310', 'weekly_hours'] == pytest.approx((3 * 70 + 2 * 110) / 60)
+    assert np.allclose(occupancy['utilization'], occupancy['weekly_hours'] / 70)
+
+
+def table(rows):
+    # rows of (section, days, start minute, end minute, location[, start date, end date])
+    rows = [row + ('2025-03-31', '2025-06-06') if len(row) == 5 else row for row in rows]
+    section, days, start, end, location, first, last = zip(*rows)
+    return MeetingTable(section, days, start, end, location, first, last, [''] * len(rows))
+
+
+def test_overlapping_meetings_in_a_schedule_conflict():
+    conflicts = schedule_conflicts(table([
+        ('CS 201-00', ('MO', 'WE', 'FR'), 510, 580, 'Olin 310'),
+        ('MATH 232-01', ('MO', 'TU', 'WE'), 540, 600, 'Olin 141'),
+        # Starts as MATH 232 ends: no overlap
+        ('ART 110-00', ('MO',), 600, 660, 'Boliou 104'),
+        # Same time, but a different part of the term
+        ('PE 101-00', ('MO',), 510, 580, 'Rec Center', '2025-06-09', '2025-06-20'),
+    ]))
+    assert list(conflicts.columns) == CONFLICT_COLUMNS
+    assert len(conflicts) == 1
+    conflict = conflicts.iloc[0]
+    assert (conflict.section, conflict.other_section) == ('CS 201-00', 'MATH 232-01')
+    assert conflict.days == ('MO', 'WE')
+    assert (conflict.start_time, conflict.end_time) == (time(9, 0), time(9, 40))
+    assert (conflict.location, conflict.other_location) == ('Olin 310', 'Olin 141')
+    assert conflict.schedule is None
+    assert describe_conflict(conflict) == "CS 201-00 overlaps MATH 232-01 on MO, WE (09:00-09:40)."
+
+
+def test_conflicts_stay_within_each_schedule():
+    alice = table([('CS 201-00', ('MO',), 510, 580, 'Olin 310'), ('MATH 232-01', ('MO',), 540, 600, 'Olin 141')])
+    bob = table([('ECON 110-00', ('MO',), 510, 580, 'Willis 203')])
+    conflicts = schedule_conflicts(combine_schedules({'alice': alice, 'bob': bob}))
+    assert list(conflicts.schedule) == ['alice']
+    assert schedule_conflicts(combine_schedules({'alice': bob, 'bob': bob})).empty
+
+
+def brute_force_conflicts(meetings):
+    # Every pair of meetings in the same schedule compared directly
+    found = set()
+    for i in range(len(meetings)):
+        for j in range(i + 1, len(meetings)):
+            if meetings.schedule[i] != meetings.schedule[j]:
+                continue
+            if not (meetings.start_date[i] <= meetings.end_date[j] and meetings.start_date[j] <= meetings.end_date[i]):
+                continue
+            shared = set(meetings.days[i]) & set(meetings.days[j])
+            if shared and meetings.start_minute[i] < meetings.end_minute[j] \
+                    and meetings.start_minute[j] < meetings.end_minute[i]:
+                found.add((meetings.schedule[i], meetings.section[i], meetings.section[j],
+                           tuple(sorted(shared, key=WEEKDAY_INDEX.get))))
+    return found
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_the_sweep_finds_every_overlapping_pair(seed):
+    rng = random.Random(seed)
+    schedules = {}
+    for student in range(4):
+        rows = []
+        for index in range(rng.randint(2, 12)):
+            start = rng.randrange(480, 1200, 10)
+            days = tuple(sorted(rng.sample(list(WEEKDAY_INDEX)[:5], rng.randint(1, 3)), key=WEEKDAY_INDEX.get))
+            first, last = rng.choice([('2025-03-31', '2025-06-06'), ('2025-03-31', '2025-04-30'),
+                                      ('2025-05-01', '2025-06-06')])
+            rows.append((f'S{student} C{index}', days, start, start + rng.choice([50, 70, 110]), 'Room', first, last))
+        schedules[f'student {student}'] = table(rows)
+    meetings = combine_schedules(schedules)
+    conflicts = schedule_conflicts(meetings)
+    assert {(row.schedule, row.section, row.other_section, row.days) for row in conflicts.itertuples()} \
+        == brute_force_conflicts(meetings)
+
+
+def test_different_sections_in_one_room_clash():
+    alice = table([('CS 201-00', ('MO', 'WE'), 510, 580, 'Olin 310'),
+                   ('MATH 232-01', ('TU',), 600, 710, '')])
+    bob = table([('CS 201-00', ('MO', 'WE'), 510, 580, 'Olin 310'),
+                 ('PHYS 131-00', ('WE', 'FR'), 540, 610, 'Olin 310'),
+                 ('CHEM 123-00', ('TU',), 600, 710, '')])
+    clashes = room_clashes(combine_schedules({'alice': alice, 'bob': bob}))
+    assert list(clashes.columns) == CLASH_COLUMNS
+    # The shared section is one booking, and meetings without a room never clash
+    assert len(clashes) == 1
+    clash = clashes.iloc[0]
+    assert (clash.location, clash.section, clash.other_section) == ('Olin 310', 'CS 201-00', 'PHYS 131-00')
+    assert clash.days == ('WE',)
+    assert (clash.start_time, clash.end_time) == (time(9, 0), time(9, 40))
+
+
+def test_occupancy_counts_each_student_once_per_section():
+    shared = [('CS 201-00', ('MO',), 510, 580, 'Olin 310')]
+    meetings = combine_schedules({name: table(shared) for name in ('alice', 'bob', 'carol')})
+    occupancy = room_occupancy(meetings).set_index('location')
+    assert occupancy.loc['Olin 310', 'sections'] == 1
+    assert occupancy.loc['Olin 310', 'enrolments'] == 3
+    assert occupancy.loc['Olin 310', 'peak_headcount'] == 3
+    assert occupancy.loc['Olin 310', 'weekly_hours'] == pytest.approx(70 / 60)
+
+
+def test_empty_tables_give_empty_frames():
+    empty = MeetingTable.empty_table()
+    assert list(schedule_conflicts(empty).columns) == CONFLICT_COLUMNS
+    assert list(room_clashes(empty).columns) == CLASH_COLUMNS
+    assert list(room_occupancy(empty).columns) == OCCUPANCY_COLUMNS
+    # Meetings without rooms leave nothing to book
+    assert room_occupancy(table([('CS 201-00', ('MO',), 510, 580, '  ')])).empty
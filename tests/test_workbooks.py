@@ -0,0 +1,97 @@
+# Workbooks with several sheets or several "Enrolled Courses" blocks read into
+# one term-tagged table
+import io
+import random
+
+import numpy as np
+from icalendar import Calendar
+from openpyxl import Workbook
+
+import converter
+from converter import create_ics_file, process_excel, tag_terms
+from records import CourseTable
+from result_cache import MessageLog
+from workday_fixtures import TERMS, append_block, combined_workbook_bytes, start_sheet
+
+
+def read(raw, **kwargs):
+    log = MessageLog()
+    return process_excel(io.BytesIO(raw), ui=log, **kwargs), log
+
+
+def summaries(ics_bytes):
+    return {str(event['SUMMARY']) for event in Calendar.from_ical(ics_bytes).walk('VEVENT')}
+
+
+def test_one_sheet_per_term():
+    courses, log = read(combined_workbook_bytes(terms=2, per='sheet', sections=4, seed=1))
+    assert len(courses) == 8
+    assert courses.terms() == ['2024 Fall Term', '2025 Winter Term']
+    assert [len(table) for table in courses.by_term().values()] == [4, 4]
+    # The waitlisted and dropped sections after each block are left out
+    assert all(int(section.split(' - Course ')[1]) % 100 < 4 for section in courses.section)
+    assert not [message for level, message in log.messages if level == 'error']
+
+
+def test_one_block_per_term_on_one_sheet():
+    courses, _ = read(combined_workbook_bytes(terms=3, per='block', sections=3, seed=2))
+    assert len(courses) == 9
+    assert courses.terms() == [period for period, _ in TERMS[:3]]
+
+
+def test_sheets_read_in_parallel_give_the_same_table():
+    raw = combined_workbook_bytes(terms=3, per='sheet', sections=5, seed=3)
+    serial, _ = read(raw)
+    parallel, _ = read(raw, workers=2)
+    assert serial.to_frame().equals(parallel.to_frame())
+
+
+def test_merged_rows_are_numbered_afresh():
+    courses, _ = read(combined_workbook_bytes(terms=3, per='sheet', sections=4, seed=4))
+    assert list(courses.row) == list(range(len(courses)))
+    frame = courses.to_frame()
+    assert frame.index.is_unique
+    assert CourseTable.from_frame(frame).to_frame().equals(frame)
+
+
+def two_students_workbook(shared_seed=5):
+    # Two advisees' exports, one per sheet, enrolled in the same courses
+    workbook = Workbook()
+    for index in range(2):
+        sheet = workbook.active if index == 0 else workbook.create_sheet()
+        rng = random.Random(shared_seed)
+        start_sheet(sheet, rng, f'Student {index + 1}', 0)
+        append_block(sheet, rng, 4, 0, ['My Dropped/Withdrawn Courses'], 2, TERMS[2][1], TERMS[2][0])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_a_course_on_two_sheets_is_kept_once():
+    courses, _ = read(two_students_workbook())
+    assert len(courses) == 4
+    assert len(set(courses.section)) == 4
+    assert list(courses.row) == [0, 1, 2, 3]
+
+
+def test_by_term_writes_one_calendar_per_term():
+    courses, _ = read(combined_workbook_bytes(terms=3, per='block', sections=3, seed=6))
+    calendars = create_ics_file(courses, ui=MessageLog(), by_term=True)
+    assert list(calendars) == [period for period, _ in TERMS[:3]]
+    for term, ics_bytes in calendars.items():
+        sections = {section for section, value in zip(courses.section, courses.term) if value == term}
+        assert summaries(ics_bytes) == sections
+    # Together they hold every course exactly once
+    assert sum(len(summaries(ics_bytes)) for ics_bytes in calendars.values()) == len(courses)
+
+
+def test_untagged_courses_take_the_term_of_the_banner_or_sheet():
+    def untagged(start):
+        return CourseTable(['CS 111-00'], ['M | 8:30 AM - 9:40 AM | Olin 310'],
+                           np.array([start], dtype='datetime64[ns]'), np.array([start], dtype='datetime64[ns]'), [0])
+
+    assert list(tag_terms(untagged('2025-04-01'), 'My Enrolled Courses', 'Winter 2026').term) == ['2026 Winter Term']
+    assert list(tag_terms(untagged('2025-04-01'), 'My Enrolled Courses', 'Sheet1').term) == ['2025 Spring Term']
+    # Outside the academic calendar, the season comes from the month
+    assert list(tag_terms(untagged('2031-09-20'), 'My Enrolled Courses', 'Sheet1').term) == ['2031 Fall Term']
+    assert converter.term_label('2025 Fall Term (09/15/2025-11/25/2025)') == '2025 Fall Term'
@@ -0,0 +1,264 @@
+# Synthetic Workday "View My Courses" exports for benchmarks and local experiments.
+#
+#   python workday_fixtures.py schedule.xlsx --sections 200 --noise-rows 50
+#   python workday_fixtures.py advisees.xlsx --terms 3 --per sheet
+#   python workday_fixtures.py printout.pdf --sections 40
+import argparse
+import io
+import random
+from datetime import datetime
+
+from openpyxl import Workbook
+
+# Same layout as a real export: Section, Meeting Patterns, Start Date and End Date
+# sit in the columns process_excel falls back to (5, 9, 11, 12)
+HEADER = [
+    'Course Listing', 'Credits', 'Grading Basis', 'Instructional Format', 'Delivery Mode',
+    'Section', 'Registration Status', 'Instructor', 'Enrolled/Capacity', 'Meeting Patterns',
+    'Academic Period', 'Start Date', 'End Date',
+]
+
+SUBJECTS = ['CS', 'MATH', 'ECON', 'BIOL', 'CHEM', 'ENGL', 'HIST', 'PHYS', 'PSYC', 'MUSC']
+BUILDINGS = [
+    'Anderson Hall', 'Center for Mathematics and Computing', 'Hulings Hall', 'Laird Hall',
+    'Leighton Hall', 'Olin Hall of Science', 'Weitz Center for Creativity', 'Willis Hall',
+]
+# Carleton class periods
+TIME_SLOTS = [
+    '8:30 AM - 9:40 AM', '9:50 AM - 11:00 AM', '11:10 AM - 12:20 PM', '12:30 PM - 1:40 PM',
+    '1:50 PM - 3:00 PM', '3:10 PM - 4:20 PM', '8:15 AM - 10:00 AM', '10:10 AM - 11:55 AM',
+    '1:15 PM - 3:00 PM', '3:10 PM - 4:55 PM',
+]
+DAY_CODES = ['MW', 'MWF', 'TTH', 'M', 'T', 'W', 'TH', 'F', 'MTWTHF', 'WF']
+TRAILERS = ['My Waitlisted Courses', 'My Dropped/Withdrawn Courses']
+TERM = (datetime(2025, 3, 31), datetime(2025, 6, 9))
+# (Academic Period, (first day, last day)) of consecutive Carleton terms
+TERMS = [
+    ('2024 Fall Term', (datetime(2024, 9, 16), datetime(2024, 11, 20))),
+    ('2025 Winter Term', (datetime(2025, 1, 6), datetime(2025, 3, 12))),
+    ('2025 Spring Term', TERM),
+    ('2025 Fall Term', (datetime(2025, 9, 15), datetime(2025, 11, 19))),
+]
+
+
+def meeting_patterns(rng, section):
+    # One or two meetings per course; Workday sometimes repeats the same line
+    building = rng.choice(BUILDINGS)
+    room = rng.randint(100, 450)
+    lines = [f"{rng.choice(DAY_CODES)} | {rng.choice(TIME_SLOTS)} | {building} {room}"]
+    if rng.random() < 0.25:
+        lines.append(f"{rng.choice(['T', 'TH', 'W'])} | {rng.choice(TIME_SLOTS)} | {rng.choice(BUILDINGS)} {rng.randint(100, 450)}")
+    if rng.random() < 0.15:
+        lines.append(lines[0])
+    return '\n'.join(lines)
+
+
+def course_row(rng, section, term=TERM, period='2025 Spring Term'):
+    subject = rng.choice(SUBJECTS)
+    number = rng.randint(100, 399)
+    return [
+        f"{subject} {number} - Course {section}", 6, 'Graded', 'Lecture', 'In-Person',
+        f"{subject} {number}-{section % 10:02d} - Course {section}", 'Registered', 'Instructor Name',
+        f"{rng.randint(5, 35)}/35", meeting_patterns(rng, section),
+        period, term[0], term[1],
+    ]
+
+
+def noise_row(rng):
+    return [f"note {rng.randint(0, 10**6)}"] + [None] * rng.randint(0, len(HEADER) - 1)
+
+
+def append_block(sheet, rng, sections, noise_rows, trailers, trailer_sections, term, period, first_section=0):
+    # One "My Enrolled Courses" block and its trailer sections
+    sheet.append([])
+    sheet.append(['My Enrolled Courses'])
+    sheet.append(HEADER)
+    for section in range(first_section, first_section + sections):
+        sheet.append(course_row(rng, section, term, period))
+    for trailer in trailers:
+        sheet.append([])
+        sheet.append([trailer])
+        sheet.append(HEADER)
+        for section in range(trailer_sections):
+            sheet.append(course_row(rng, first_section + sections + section, term, period))
+        for _ in range(noise_rows):
+            sheet.append(noise_row(rng))
+
+
+def start_sheet(sheet, rng, title, noise_rows):
+    sheet.title = title
+    sheet.append(['View My Courses'])
+    for _ in range(noise_rows):
+        sheet.append(noise_row(rng))
+
+
+def make_workbook(target, sections=20, noise_rows=0, trailers=TRAILERS, trailer_sections=5,
+                  term=TERM, seed=0):
+    # Write a "View My Courses" export to a path or binary file object.
+    # noise_rows go above the banner and into each trailer section.
+    rng = random.Random(seed)
+    workbook = Workbook()
+    sheet = workbook.active
+    start_sheet(sheet, rng, 'View My Courses', noise_rows)
+    append_block(sheet, rng, sections, noise_rows, trailers, trailer_sections, term, '2025 Spring Term')
+    workbook.save(target)
+    return target
+
+
+def make_combined_workbook(target, terms=3, per='sheet', sections=20, noise_rows=0, trailers=TRAILERS,
+                           trailer_sections=5, seed=0):
+    # A workbook an advisor puts together: the first `terms` of TERMS, either one
+    # export per sheet (per='sheet') or one block per term on a single sheet (per='block')
+    rng = random.Random(seed)
+    workbook = Workbook()
+    sheet = workbook.active
+    if per == 'block':
+        start_sheet(sheet, rng, 'View My Courses', noise_rows)
+    for index, (period, term) in enumerate(TERMS[:terms]):
+        if per == 'sheet':
+            if index:
+                sheet = workbook.create_sheet()
+            start_sheet(sheet, rng, period, noise_rows)
+        append_block(sheet, rng, sections, noise_rows, trailers, trailer_sections, term, period,
+                     first_section=index * 100)
+    workbook.save(target)
+    return target
+
+
+# The columns of the PDF printout, with their widths in points
+PDF_COLUMNS = [('Section', 230), ('Meeting Patterns', 330), ('Start Date', 75), ('End Date', 75)]
+PDF_PAGE = (792, 612)  # US Letter, landscape
+PDF_MARGIN = 36
+PDF_LINE = 9           # points per line of 7pt text
+
+
+def _pdf_text(x, y, text, size=7):
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f"BT /F1 {size} Tf {x} {y} Td ({escaped}) Tj ET"
+
+
+def _pdf_document(pages):
+    # A PDF of the given content streams, one per page, set in Helvetica
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for content in pages:
+        stream = '\n'.join(content).encode('latin-1')
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode('latin-1') + stream + b"\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PDF_PAGE[0]} {PDF_PAGE[1]}] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        body = body if isinstance(body, bytes) else body.encode('latin-1')
+        out += f"{number} 0 obj\n".encode('latin-1') + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    out += b''.join(f"{offset:010d} 00000 n \n".encode('latin-1') for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    return bytes(out)
+
+
+def make_printout(target, sections=20, trailer_pages=2, trailer_sections=20, seed=0):
+    # Write the PDF printout of a "View My Courses" export to a path or binary file
+    # object: the enrolled courses as a ruled table that repeats its header on
+    # every page it runs onto, then a waitlist of `trailer_pages` further pages
+    rng = random.Random(seed)
+    pages = []
+    state = {}
+
+    def new_page():
+        pages.append([])
+        state['y'] = PDF_PAGE[1] - PDF_MARGIN
+
+    def heading(text, size):
+        state['y'] -= size + 6
+        pages[-1].append(_pdf_text(PDF_MARGIN, state['y'], text, size))
+        state['y'] -= 6
+
+    def table_row(cells):
+        lines = [cell.split('\n') for cell in cells]
+        height = PDF_LINE * max(map(len, lines)) + 4
+        if state['y'] - height < PDF_MARGIN:
+            new_page()
+            table_row([name for name, _ in PDF_COLUMNS])
+        top = state['y']
+        bottom = top - height
+        content = pages[-1]
+        x = PDF_MARGIN
+        for (_, width), cell_lines in zip(PDF_COLUMNS, lines):
+            # Each cell ruled as its own rectangle
+            content.append(f"{x} {bottom} {width} {height} re S")
+            for index, line in enumerate(cell_lines):
+                content.append(_pdf_text(x + 3, top - PDF_LINE * (index + 1), line))
+            x += width
+        state['y'] = bottom
+
+    def course_cells(section):
+        row = course_row(rng, section)
+        return [row[5], row[9], row[11].strftime('%m/%d/%Y'), row[12].strftime('%m/%d/%Y')]
+
+    new_page()
+    heading('View My Courses', 16)
+    heading('My Enrolled Courses', 11)
+    table_row([name for name, _ in PDF_COLUMNS])
+    for section in range(sections):
+        table_row(course_cells(section))
+    heading(TRAILERS[0], 11)
+    for page in range(trailer_pages):
+        new_page()
+        table_row([name for name, _ in PDF_COLUMNS])
+        for section in range(trailer_sections):
+            table_row(course_cells(sections + page * trailer_sections + section))
+
+    data = _pdf_document(pages)
+    if hasattr(target, 'write'):
+        target.write(data)
+    else:
+        with open(target, 'wb') as f:
+            f.write(data)
+    return target
+
+
+def workbook_bytes(**kwargs):
+    buffer = io.BytesIO()
+    make_workbook(buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def combined_workbook_bytes(**kwargs):
+    buffer = io.BytesIO()
+    make_combined_workbook(buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def printout_bytes(**kwargs):
+    buffer = io.BytesIO()
+    make_printout(buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic Workday 'View My Courses' export.")
+    parser.add_argument('output', help="Path of the .xlsx file to write, or a .pdf for the printout")
+    parser.add_argument('--sections', type=int, default=20, help="Enrolled sections (default: 20)")
+    parser.add_argument('--noise-rows', type=int, default=0, help="Filler rows above the banner and in each trailer")
+    parser.add_argument('--terms', type=int, default=1, choices=range(1, len(TERMS) + 1),
+                        help="Terms in the workbook (default: 1, a plain export)")
+    parser.add_argument('--per', choices=['sheet', 'block'], default='sheet',
+                        help="With several terms, one sheet or one enrolled block per term")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.output.lower().endswith('.pdf'):
+        make_printout(args.output, sections=args.sections, seed=args.seed)
+    elif args.terms > 1:
+        make_combined_workbook(args.output, terms=args.terms, per=args.per, sections=args.sections,
+                               noise_rows=args.noise_rows, seed=args.seed)
+    else:
+        make_workbook(args.output, sections=args.sections, noise_rows=args.noise_rows, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()